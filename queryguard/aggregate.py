@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from collections.abc import Callable
+from functools import partial
+from typing import Any
+
+from queryguard import rules
+from queryguard.exceptions import SNIPPET_LENGTH, RuleViolation
+from queryguard.logs import Record
+from queryguard.parser import SQLParser
+from queryguard.verdicts import get_shape
+
+# The number of shapes tracked per rule for each shape reported, which bounds the overestimate of their counts.
+CAPACITY_FACTOR = 10
+MIN_CAPACITY = 100
+
+
+class SpaceSaving:
+    """Counts the most frequent keys of a stream in fixed memory, with the Space-Saving algorithm.
+
+    At most capacity keys are tracked. A key that isn't tracked replaces the tracked key with the lowest count and
+    takes over its count, which is remembered as the error of the new key. Every key occurring more often than the
+    number of keys added divided by the capacity is tracked, and the count of a tracked key overestimates its true
+    count by at most its error.
+
+    Attributes:
+        capacity (int): The most keys tracked.
+        total (int): The number of keys added.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initializes the SpaceSaving class.
+
+        Args:
+            capacity (int): The most keys tracked.
+        """
+        self.capacity = capacity
+        self.total = 0
+        # The count, error and example of each tracked key.
+        self._entries: dict[bytes, list[Any]] = {}
+        # The counts of the tracked keys, with outdated counts removed lazily.
+        self._heap: list[tuple[int, bytes]] = []
+
+    def __repr__(self) -> str:
+        return f"SpaceSaving(capacity={self.capacity}, total={self.total}, tracked={len(self._entries)})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: bytes, example: Callable[[], Any]) -> None:
+        """Counts an occurrence of a key.
+
+        Args:
+            key (bytes): The key.
+            example (Callable[[], Any]): Makes what to report for the key, called if it isn't tracked yet.
+
+        Returns:
+            None
+        """
+        self.total += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] += 1
+        elif len(self._entries) < self.capacity:
+            entry = self._entries[key] = [1, 0, example()]
+        else:
+            while True:
+                count, victim = heapq.heappop(self._heap)
+                if self._entries.get(victim, (None,))[0] == count:
+                    break
+
+            del self._entries[victim]
+            entry = self._entries[key] = [count + 1, count, example()]
+
+        heapq.heappush(self._heap, (entry[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(entry[0], key) for key, entry in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, k: int) -> list[tuple[bytes, int, int, Any]]:
+        """The tracked keys with the highest counts.
+
+        Args:
+            k (int): The number of keys.
+
+        Returns:
+            list[tuple[bytes, int, int, Any]]: The key, count, error and example of each, highest count first.
+        """
+        entries = heapq.nlargest(k, self._entries.items(), key=lambda x: (x[1][0], -x[1][1]))
+        return [(key, count, error, example) for key, (count, error, example) in entries]
+
+
+class ViolationSummary:
+    """Aggregates the violations of a stream of query log records in fixed memory.
+
+    Violations are counted exactly per rule, and the query shapes violating each rule most often are counted
+    approximately, by the fingerprint of the shape of their record, see verdicts.get_shape. Each shape is reported
+    with the beginning of the statement that violated the rule, reduced to its shape so literals such as passwords
+    aren't reported, and the first record it was seen in while tracked.
+
+    Attributes:
+        rules (list[type[rules.BaseRule]]): The rule classes checked.
+        k (int): The number of shapes reported per rule.
+        records (int): The number of records with violations.
+        counts (Counter[tuple[str, str]]): The exact number of violations, by rule name and id, since rules may share
+            an id.
+    """
+
+    def __init__(self, rules: list[type[rules.BaseRule]], k: int) -> None:
+        """Initializes the ViolationSummary class.
+
+        Args:
+            rules (list[type[rules.BaseRule]]): The rule classes checked.
+            k (int): The number of shapes reported per rule.
+        """
+        self.rules = rules
+        self.k = k
+        self.records = 0
+        self.counts: Counter[tuple[str, str]] = Counter()
+        self._capacity = max(k * CAPACITY_FACTOR, MIN_CAPACITY)
+        self._shapes: dict[tuple[str, str], SpaceSaving] = {}
+
+    def __repr__(self) -> str:
+        return f"ViolationSummary(k={self.k}, records={self.records}, violations={sum(self.counts.values())})"
+
+    def add(self, record: Record, violations: list[RuleViolation]) -> None:
+        """Counts the violations of a record.
+
+        Args:
+            record (Record): The record.
+            violations (list[RuleViolation]): The violations found in the record.
+
+        Returns:
+            None
+        """
+        if not violations:
+            return
+
+        self.records += 1
+        fingerprint, _ = get_shape(record.text)
+        for violation in violations:
+            key = (violation.rule, violation.id)
+            self.counts[key] += 1
+            shapes = self._shapes.get(key)
+            if shapes is None:
+                shapes = self._shapes[key] = SpaceSaving(self._capacity)
+            shapes.add(fingerprint, partial(_get_example, record, violation))
+
+    def top(self) -> list[tuple[type[rules.BaseRule], int, list[dict[str, Any]]]]:
+        """The rules that were violated, with the shapes violating them most often.
+
+        Returns:
+            list[tuple[type[rules.BaseRule], int, list[dict[str, Any]]]]: Each violated rule, its exact number of
+                violations and its top shapes, with the fingerprint, the shape of the statement, the approximate
+                count, the most the count may be too high and the first record seen.
+        """
+        results = []
+        for rule in self.rules:
+            key = (str(rule.rule), str(rule.id))
+            shapes = self._shapes.get(key)
+            if shapes is None:
+                continue
+
+            top = [
+                {
+                    "fingerprint": fingerprint.hex(),
+                    "statement": statement,
+                    "count": count,
+                    "error": error,
+                    "example": example,
+                }
+                for fingerprint, count, error, (statement, example) in shapes.top(self.k)
+            ]
+            results.append((rule, self.counts[key], top))
+
+        return results
+
+    def to_dict(self) -> dict[str, Any]:
+        """Converts the summary to a JSON-serializable dictionary.
+
+        Returns:
+            dict[str, Any]: The number of records with violations and each violated rule with its top shapes.
+        """
+        return {
+            "records": self.records,
+            "rules": [
+                {"name": str(rule.rule), "id": str(rule.id), "violations": violations, "shapes": shapes}
+                for rule, violations, shapes in self.top()
+            ],
+        }
+
+
+def _get_example(record: Record, violation: RuleViolation) -> tuple[str, str]:
+    shape = SQLParser.normalize(record.text[violation.offset or 0 :]).text
+    return " ".join(shape.split())[:SNIPPET_LENGTH], f"{record.source}:{record.position}"
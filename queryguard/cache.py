@@ -0,0 +1,760 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections.abc import Iterable, Sequence
+from itertools import accumulate
+from pathlib import Path
+
+import sqlparse
+
+from queryguard import __version__, rules
+from queryguard.exceptions import RuleViolation
+from queryguard.parser import DEFAULT_LITERAL_LIMIT, SQLParser
+from queryguard.source import DEFAULT_ENCODINGS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".queryguard_cache"
+DEFAULT_CACHE_SIZE = 512 << 20
+PRUNE_INTERVAL = 3600
+FORMAT_VERSION = 3
+PARSER_VERSION = f"queryguard-{__version__}/sqlparse-{sqlparse.__version__}/format-{FORMAT_VERSION}"
+SEGMENT_TOKENS = 1 << 16
+
+_MAGIC = b"QGPC"
+_HEADER = struct.Struct("<4sI16s")
+_SEGMENT = struct.Struct("<IIIQ")
+_TTYPES: dict[str, sqlparse.tokens._TokenType] = {}
+
+
+def _to_bytes(values: array[int]) -> bytes:
+    if sys.byteorder == "big":  # pragma: no cover
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data: memoryview, position: int, count: int) -> tuple[array[int], int]:
+    values = array(typecode)
+    end = position + count * values.itemsize
+    if end > len(data):
+        raise ValueError("Truncated cache entry")
+
+    values.frombytes(data[position:end])
+    if sys.byteorder == "big":  # pragma: no cover
+        values.byteswap()
+
+    return values, end
+
+
+def _get_ttype(name: str) -> sqlparse.tokens._TokenType:
+    ttype = _TTYPES.get(name)
+    if ttype is None:
+        ttype = sqlparse.tokens.Token
+        for part in name.split(".")[1:]:
+            ttype = getattr(ttype, part)
+
+        _TTYPES[name] = ttype
+
+    return ttype
+
+
+class SegmentWriter:
+    """Encodes parsed statements into one segment of a cache entry.
+
+    A segment stores each distinct string once, followed by flat arrays of statement offsets, statement ends,
+    statement lengths and the token types and values of every token as indexes into the strings. Only the flattened
+    tokens are kept, which is all the rules look at.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the SegmentWriter class."""
+        self._strings: dict[str, int] = {}
+        self._offsets = array("q")
+        self._ends = array("q")
+        self._lengths = array("I")
+        self._ttypes = array("I")
+        self._values = array("I")
+
+    def __repr__(self) -> str:
+        return f"SegmentWriter(statements={len(self._offsets)}, tokens={len(self)})"
+
+    def __len__(self) -> int:
+        return len(self._ttypes)
+
+    def add(self, statements: Iterable[sqlparse.sql.Statement]) -> None:
+        """Appends parsed statements to the segment.
+
+        Args:
+            statements (Iterable[sqlparse.sql.Statement]): Statements annotated with their byte offsets.
+
+        Returns:
+            None
+        """
+        for statement in statements:
+            count = 0
+            for token in statement.flatten():
+                self._ttypes.append(self._intern(str(token.ttype)))
+                self._values.append(self._intern(token.value))
+                count += 1
+
+            offset = getattr(statement, "offset", None)
+            end = getattr(statement, "end", None)
+            self._offsets.append(-1 if offset is None else offset)
+            self._ends.append(-1 if end is None else end)
+            self._lengths.append(count)
+
+    def getvalue(self) -> bytes:
+        """Returns the encoded segment.
+
+        Returns:
+            bytes: The segment in its binary layout.
+        """
+        strings = list(self._strings)
+        blob = "".join(strings).encode("utf-8", "surrogatepass")
+        return b"".join(
+            (
+                _SEGMENT.pack(len(strings), len(self._offsets), len(self._ttypes), len(blob)),
+                _to_bytes(array("I", map(len, strings))),
+                blob,
+                _to_bytes(self._offsets),
+                _to_bytes(self._ends),
+                _to_bytes(self._lengths),
+                _to_bytes(self._ttypes),
+                _to_bytes(self._values),
+            )
+        )
+
+    def _intern(self, string: str) -> int:
+        index = self._strings.get(string)
+        if index is None:
+            index = self._strings[string] = len(self._strings)
+
+        return index
+
+
+def split_segments(data: bytes) -> tuple[str, list[memoryview]]:
+    """Splits a cache entry into its segments, validating the layout.
+
+    The segments of an entry are stored compressed after a fixed header.
+
+    Args:
+        data (bytes): The cache entry.
+
+    Returns:
+        tuple[str, list[memoryview]]: The encoding of the file contents and the encoded segments.
+
+    Raises:
+        ValueError: If the entry is not a valid cache entry.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated cache entry")
+
+    magic, count, encoding = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Not a cache entry")
+
+    try:
+        view = memoryview(zlib.decompress(memoryview(data)[_HEADER.size :]))
+    except zlib.error as e:
+        raise ValueError(f"Corrupt cache entry: {e}") from None
+
+    segments = []
+    position = 0
+    for _ in range(count):
+        if position + _SEGMENT.size > len(view):
+            raise ValueError("Truncated cache entry")
+
+        strings, statements, tokens, size = _SEGMENT.unpack_from(view, position)
+        end = position + _SEGMENT.size + strings * 4 + size + statements * 20 + tokens * 8
+        if end > len(view):
+            raise ValueError("Truncated cache entry")
+
+        segments.append(view[position:end])
+        position = end
+
+    if position != len(view):
+        raise ValueError("Trailing data in cache entry")
+
+    return encoding.rstrip(b"\0").decode("ascii"), segments
+
+
+def decode_segment(segment: memoryview) -> tuple[sqlparse.sql.Statement, ...]:
+    """Rebuilds the statements of an encoded segment.
+
+    Args:
+        segment (memoryview): A segment returned by split_segments.
+
+    Returns:
+        tuple[sqlparse.sql.Statement, ...]: Statements of flat tokens, annotated with their byte offsets and ends.
+    """
+    strings, position = _read_strings(segment)
+    _, statement_count, token_count, _ = _SEGMENT.unpack_from(segment)
+    offsets, position = _from_bytes("q", segment, position, statement_count)
+    ends, position = _from_bytes("q", segment, position, statement_count)
+    counts, position = _from_bytes("I", segment, position, statement_count)
+    ttypes, position = _from_bytes("I", segment, position, token_count)
+    values, position = _from_bytes("I", segment, position, token_count)
+
+    token_types = {index: _get_ttype(strings[index]) for index in set(ttypes)}
+    tokens = [sqlparse.sql.Token(token_types[ttype], strings[value]) for ttype, value in zip(ttypes, values)]
+
+    statements = []
+    start = 0
+    for offset, end, count in zip(offsets, ends, counts):
+        statement = sqlparse.sql.Statement(tokens[start : start + count])
+        statement.offset = None if offset < 0 else offset
+        statement.end = None if end < 0 else end
+        statements.append(statement)
+        start += count
+
+    return tuple(statements)
+
+
+def find_terms(segments: Iterable[memoryview], vocabulary: Iterable[str]) -> set[str]:
+    """Finds the trigger terms contained in the tokens of encoded segments.
+
+    Only the string tables of the segments are read, the statements aren't rebuilt.
+
+    Args:
+        segments (Iterable[memoryview]): Encoded segments.
+        vocabulary (Iterable[str]): The upper case trigger terms to look for.
+
+    Returns:
+        set[str]: The terms contained in at least one token.
+    """
+    text = "\0".join(string for segment in segments for string in _read_strings(segment)[0]).upper()
+    return {term for term in vocabulary if term in text}
+
+
+def find_text_terms(text: str, vocabulary: Iterable[str]) -> set[str]:
+    """Finds the trigger terms contained in decoded SQL text.
+
+    Every token is a piece of the text, so the terms found are a superset of those find_terms finds in its tokens.
+
+    Args:
+        text (str): The decoded SQL text.
+        vocabulary (Iterable[str]): The upper case trigger terms to look for.
+
+    Returns:
+        set[str]: The terms contained in the text.
+    """
+    text = text.upper()
+    return {term for term in vocabulary if term in text}
+
+
+def _read_strings(segment: memoryview) -> tuple[list[str], int]:
+    string_count, _, _, size = _SEGMENT.unpack_from(segment)
+    lengths, position = _from_bytes("I", segment, _SEGMENT.size, string_count)
+    blob = str(segment[position : position + size], "utf-8", "surrogatepass")
+    ends = list(accumulate(lengths))
+    return [blob[start:end] for start, end in zip([0, *ends], ends)], position + size
+
+
+@functools.cache
+def rule_fingerprint(rule: type[rules.BaseRule]) -> str:
+    """Hashes the implementation of a rule, so outcomes are only reused while the rule is unchanged.
+
+    Args:
+        rule (type[rules.BaseRule]): The rule class.
+
+    Returns:
+        str: The fingerprint of the rule.
+    """
+    try:
+        source = inspect.getsource(rule) + inspect.getsource(rules.BaseRule) + inspect.getsource(SQLParser)
+    except (OSError, TypeError):  # pragma: no cover
+        source = __version__
+
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (rule.__module__, rule.__qualname__, str(rule.rule), str(rule.id), *rule.triggers, source):
+        digest.update(part.encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def ruleset_fingerprint(rules: Iterable[type[rules.BaseRule]]) -> str:
+    """Hashes the implementations of a set of rules.
+
+    Args:
+        rules (Iterable[type[rules.BaseRule]]): The rule classes.
+
+    Returns:
+        str: The fingerprint of the rule set.
+    """
+    return hashlib.blake2b("|".join(sorted(map(rule_fingerprint, rules))).encode(), digest_size=16).hexdigest()
+
+
+def get_vocabulary() -> tuple[str, ...]:
+    """Collects the trigger terms of all known rules.
+
+    Returns:
+        tuple[str, ...]: The sorted upper case trigger terms.
+    """
+    return tuple(sorted({term.upper() for rule in rules.BaseRule.__subclasses__() for term in rule.triggers}))
+
+
+class RuleResults:
+    """The outcome of each rule evaluated against one file contents.
+
+    Attributes:
+        encoding (str): The encoding the file contents were decoded with.
+        vocabulary (str): The hash of the vocabulary the terms were looked up in.
+        terms (set[str]): The trigger terms contained in the file.
+        outcomes (dict[str, None | list[int]]): The offset and end of the statement violating the rule, or None if
+            the rule passed, by rule fingerprint.
+    """
+
+    def __init__(
+        self,
+        encoding: str = "utf-8",
+        vocabulary: str = "",
+        terms: Iterable[str] = (),
+        outcomes: None | dict[str, None | list[int]] = None,
+    ) -> None:
+        """Initializes the RuleResults class.
+
+        Args:
+            encoding (str): The encoding the file contents were decoded with.
+            vocabulary (str): The hash of the vocabulary the terms were looked up in.
+            terms (Iterable[str]): The trigger terms contained in the file.
+            outcomes (None | dict[str, None | list[int]]): The outcome of each rule by fingerprint.
+        """
+        self.encoding = encoding
+        self.vocabulary = vocabulary
+        self.terms = set(terms)
+        self.outcomes = outcomes or {}
+
+    def __repr__(self) -> str:
+        return f"RuleResults(terms={sorted(self.terms)}, outcomes={len(self.outcomes)})"
+
+    @classmethod
+    def loads(cls: type[RuleResults], data: bytes) -> RuleResults:
+        """Reads results stored with dumps.
+
+        Args:
+            data (bytes): The stored results.
+
+        Returns:
+            RuleResults: The results.
+
+        Raises:
+            ValueError: If the data isn't valid results.
+        """
+        try:
+            values = json.loads(data)
+            return cls(values["encoding"], values["vocabulary"], values["terms"], values["outcomes"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid rule results: {e}") from None
+
+    def dumps(self) -> bytes:
+        """Serializes the results.
+
+        Returns:
+            bytes: The results as JSON.
+        """
+        values = {
+            "encoding": self.encoding,
+            "vocabulary": self.vocabulary,
+            "terms": sorted(self.terms),
+            "outcomes": self.outcomes,
+        }
+        return json.dumps(values, separators=(",", ":")).encode()
+
+
+class Cache:
+    """A content-addressed on-disk cache of parsed statements and rule outcomes.
+
+    Entries are keyed by a hash of the raw file contents together with the parser version and the settings that
+    affect parsing, so a file is only parsed again when its contents or the parser change.
+
+    For each file the outcome of every evaluated rule is recorded by the fingerprint of the rule implementation,
+    together with the trigger terms the file contains. A rule that was added or modified is only evaluated against
+    files containing one of its trigger terms, and other rules aren't evaluated again.
+
+    The outcomes are also recorded per GO batch of the last contents seen at each path, keyed by a hash of the raw
+    batch, so after a file is edited only the batches that changed are parsed again.
+
+    Entries are touched when they are read, and once the entries outgrow the maximum size the least recently used
+    ones are removed, see prune.
+
+    Attributes:
+        root (Path): The cache directory.
+        directory (Path): The directory holding the parsed statements.
+        results (Path): The directory holding the rule outcomes.
+        batches (Path): The directory holding the rule outcomes of each batch, by file path.
+        max_size (int): The size in bytes the entries are pruned to, or 0 to keep them all.
+        salt (str): Identifies the parser version and the settings that affect parsing.
+        hits (int): The number of parsed statements found.
+        misses (int): The number of parsed statements missing or unreadable.
+        reused (int): The number of rule outcomes reused.
+        skipped (int): The number of rules skipped because the file doesn't contain their trigger terms.
+        evaluated (int): The number of rules evaluated.
+        batches_reused (int): The number of batches whose rule outcomes were reused.
+        batches_parsed (int): The number of batches parsed.
+        pruned (int): The number of entries removed by prune.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        literal_limit: int = DEFAULT_LITERAL_LIMIT,
+        encodings: Iterable[str] = DEFAULT_ENCODINGS,
+        max_size: int = DEFAULT_CACHE_SIZE,
+    ) -> None:
+        """Initializes the Cache class.
+
+        Args:
+            directory (Path): The cache directory.
+            literal_limit (int): The longest string literal that is lexed verbatim.
+            encodings (Iterable[str]): Fallback encodings for files that aren't valid UTF-8.
+            max_size (int): The size in bytes the entries are pruned to, or 0 to keep them all.
+        """
+        self.root = directory
+        self.directory = directory / "parse"
+        self.results = directory / "results"
+        self.batches = directory / "batches"
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+        self.skipped = 0
+        self.evaluated = 0
+        self.batches_reused = 0
+        self.batches_parsed = 0
+        self.pruned = 0
+        self.vocabulary = get_vocabulary()
+        self.fingerprints = {rule_fingerprint(rule) for rule in rules.BaseRule.__subclasses__()}
+        self.vocabulary_hash = hashlib.blake2b("\0".join(self.vocabulary).encode(), digest_size=8).hexdigest()
+        self.salt = f"{PARSER_VERSION}|{literal_limit}|{','.join(encodings)}"
+
+    def __repr__(self) -> str:
+        return (
+            f"Cache(directory={self.root}, hits={self.hits}, misses={self.misses}, reused={self.reused}, "
+            f"skipped={self.skipped}, evaluated={self.evaluated}, batches_reused={self.batches_reused}, "
+            f"batches_parsed={self.batches_parsed})"
+        )
+
+    def key(self, data: bytes | memoryview | mmap.mmap) -> str:
+        """Computes the cache key of raw file contents.
+
+        Args:
+            data (bytes | memoryview | mmap.mmap): The raw file contents.
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.blake2b(self.salt.encode(), digest_size=20)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def batch_key(self, data: bytes | memoryview | mmap.mmap, encoding: str) -> str:
+        """Computes the key of the raw contents of a single batch.
+
+        Args:
+            data (bytes | memoryview | mmap.mmap): The raw batch.
+            encoding (str): The encoding the batch is decoded with, which byte offsets within it depend on.
+
+        Returns:
+            str: The batch key.
+        """
+        digest = hashlib.blake2b(f"{self.salt}|{encoding}".encode(), digest_size=16)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def load_batches(self, path: Path) -> dict[str, dict[str, None | list[int]]]:
+        """Looks up the rule outcomes recorded for the batches of the last contents seen at a path.
+
+        Args:
+            path (Path): The path to the file.
+
+        Returns:
+            dict[str, dict[str, None | list[int]]]: The offset and end of each violating statement relative to the
+                start of its batch, or None if the rule passed, by rule fingerprint and by batch key.
+        """
+        try:
+            batches = json.loads(self._read(self._path(self._path_key(path), self.batches)))
+        except (OSError, ValueError) as e:
+            logger.debug(f"No batch results for {path}: {e}")
+            return {}
+
+        if not isinstance(batches, dict):
+            return {}
+
+        return batches
+
+    def store_batches(self, path: Path, batches: dict[str, dict[str, None | list[int]]]) -> None:
+        """Records the rule outcomes of the batches of a file, replacing those of its previous contents.
+
+        Failures to write are logged and otherwise ignored.
+
+        Args:
+            path (Path): The path to the file.
+            batches (dict[str, dict[str, None | list[int]]]): The outcomes by rule fingerprint and by batch key.
+
+        Returns:
+            None
+        """
+        target = self._path(self._path_key(path), self.batches)
+        try:
+            self._prepare()
+            target.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(target, json.dumps(batches, separators=(",", ":")).encode())
+        except OSError as e:
+            logger.debug(f"Unable to write batch results {target}: {e}")
+
+    def load(self, key: str) -> None | tuple[str, list[memoryview]]:
+        """Looks up the parsed statements of a file.
+
+        Args:
+            key (str): The cache key of the file contents.
+
+        Returns:
+            None | tuple[str, list[memoryview]]: The encoding of the file contents and the encoded segments, or
+                None if the file wasn't cached.
+        """
+        try:
+            entry = split_segments(self._read(self._path(key)))
+        except (OSError, ValueError, struct.error) as e:
+            logger.debug(f"Parse cache miss for {key}: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def store(self, key: str, encoding: str, segments: Sequence[bytes]) -> None:
+        """Stores the parsed statements of a file. Failures to write are logged and otherwise ignored.
+
+        Args:
+            key (str): The cache key of the file contents.
+            encoding (str): The encoding the file contents were decoded with.
+            segments (Sequence[bytes]): The encoded segments.
+
+        Returns:
+            None
+        """
+        path = self._path(key)
+        try:
+            name = encoding.encode("ascii")
+            if len(name) > _HEADER.size - 8:
+                raise ValueError(f"Encoding name {encoding} is too long")
+
+            self._prepare()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(path, _HEADER.pack(_MAGIC, len(segments), name) + zlib.compress(b"".join(segments), 1))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Unable to write parse cache entry {path}: {e}")
+
+    def reuse_results(
+        self, key: str, rules: Iterable[type[rules.BaseRule]]
+    ) -> tuple[RuleResults, list[RuleViolation], list[type[rules.BaseRule]]]:
+        """Looks up the recorded rule outcomes of a file.
+
+        Args:
+            key (str): The cache key of the file contents.
+            rules (Iterable[type[rules.BaseRule]]): The rules to evaluate.
+
+        Returns:
+            tuple[RuleResults, list[RuleViolation], list[type[rules.BaseRule]]]: The recorded results, the recorded
+                violations of the given rules and the rules that still have to be evaluated.
+        """
+        try:
+            results = RuleResults.loads(self._read(self._path(key, self.results)))
+        except (OSError, ValueError) as e:
+            logger.debug(f"No rule results for {key}: {e}")
+            results = RuleResults()
+
+        violations = []
+        pending = []
+        for rule in rules:
+            fingerprint = rule_fingerprint(rule)
+            if fingerprint in results.outcomes:
+                self.reused += 1
+                span = results.outcomes[fingerprint]
+                if span is not None:
+                    violation = RuleViolation(str(rule.rule), str(rule.id), "")
+                    violation.offset, violation.end = span
+                    violations.append(violation)
+            elif (
+                rule.triggers
+                and results.vocabulary == self.vocabulary_hash
+                and results.terms.isdisjoint(term.upper() for term in rule.triggers)
+            ):
+                self.skipped += 1
+            else:
+                pending.append(rule)
+
+        self.evaluated += len(pending)
+        return results, violations, pending
+
+    def store_results(
+        self,
+        key: str,
+        results: RuleResults,
+        rules: Iterable[type[rules.BaseRule]],
+        violations: Iterable[RuleViolation],
+        encoding: str,
+        segments: Iterable[memoryview] = (),
+        terms: None | Iterable[str] = None,
+    ) -> None:
+        """Records the outcomes of newly evaluated rules. Failures to write are logged and otherwise ignored.
+
+        Args:
+            key (str): The cache key of the file contents.
+            results (RuleResults): The results returned by reuse_results.
+            rules (Iterable[type[rules.BaseRule]]): The rules that were evaluated.
+            violations (Iterable[RuleViolation]): The violations found by these rules.
+            encoding (str): The encoding the file contents were decoded with.
+            segments (Iterable[memoryview]): The encoded segments of the file, used for finding its trigger terms.
+            terms (None | Iterable[str]): The trigger terms of the file, if they are already known.
+
+        Returns:
+            None
+        """
+        spans = {(x.rule, x.id): [x.offset or 0, x.end or x.offset or 0] for x in violations}
+        outcomes = {fingerprint: x for fingerprint, x in results.outcomes.items() if fingerprint in self.fingerprints}
+        for rule in rules:
+            outcomes[rule_fingerprint(rule)] = spans.get((str(rule.rule), str(rule.id)))
+
+        results.outcomes = outcomes
+
+        results.encoding = encoding
+        if results.vocabulary != self.vocabulary_hash:
+            results.vocabulary = self.vocabulary_hash
+            results.terms = find_terms(segments, self.vocabulary) if terms is None else set(terms)
+
+        path = self._path(key, self.results)
+        try:
+            self._prepare()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(path, results.dumps())
+        except OSError as e:
+            logger.debug(f"Unable to write rule results {path}: {e}")
+
+    def prune(self, interval: float = PRUNE_INTERVAL) -> int:
+        """Removes the least recently used entries once they outgrow the maximum size.
+
+        The entries are only listed if they weren't within the interval, so most runs only look at the time of the
+        last pruning. They are pruned to three quarters of the maximum size, so the next runs don't prune again
+        straight away. Failures are logged and otherwise ignored.
+
+        Args:
+            interval (float): The seconds since the last pruning after which the entries are listed again.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        marker = self.root / ".pruned"
+        try:
+            if not self.max_size or time.time() - marker.stat().st_mtime < interval:
+                return 0
+        except FileNotFoundError:
+            if not self.root.is_dir():
+                return 0
+        except OSError as e:
+            logger.debug(f"Unable to prune the cache {self.root}: {e}")
+            return 0
+
+        entries = []
+        for directory in (self.directory, self.results, self.batches):
+            for parent in _scandir(directory):
+                if parent.is_dir(follow_symlinks=False):
+                    for entry in _scandir(parent.path):
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(x[1] for x in entries)
+        removed = 0
+        if size > self.max_size:
+            for _, length, path in sorted(entries):
+                if size <= self.max_size * 3 // 4:
+                    break
+
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    logger.debug(f"Unable to remove cache entry {path}: {e}")
+                    continue
+
+                size -= length
+                removed += 1
+
+            logger.info(f"Removed {removed} of {len(entries)} cache entries, {self.root} is over {self.max_size} bytes")
+
+        try:
+            marker.touch()
+        except OSError as e:
+            logger.debug(f"Unable to write {marker}: {e}")
+
+        self.pruned += removed
+        return removed
+
+    def _read(self, path: Path) -> bytes:
+        data = path.read_bytes()
+        if self.max_size:
+            # Touching an entry when it is read keeps it from being pruned as unused.
+            with contextlib.suppress(OSError):
+                os.utime(path)
+
+        return data
+
+    def _path(self, key: str, directory: None | Path = None) -> Path:
+        return (directory or self.directory) / key[:2] / key
+
+    def _path_key(self, path: Path) -> str:
+        return hashlib.blake2b(f"{self.salt}|{path.resolve()}".encode(), digest_size=20).hexdigest()
+
+    def _prepare(self) -> None:
+        gitignore = self.root / ".gitignore"
+        if not gitignore.exists():
+            self.root.mkdir(parents=True, exist_ok=True)
+            gitignore.write_text("# Automatically created by QueryGuard.\n*\n")
+
+
+def _scandir(path: str | Path) -> list[os.DirEntry[str]]:
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if not entry.name.startswith(".")]
+    except OSError:
+        return []
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Writes a file by renaming a temporary file over it, so readers never see a partial file.
+
+    Args:
+        path (Path): The path to the file.
+        data (bytes): The file contents.
+
+    Returns:
+        None
+    """
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        os.replace(temporary, path)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
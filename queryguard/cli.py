@@ -4,35 +4,115 @@ import logging
 from pathlib import Path
 from typing import Optional, cast
 
+import click
 import typer
+from typer.core import TyperGroup
 
 from queryguard import __version__, config
 from queryguard.engine import RulesEngine
 from queryguard.exceptions import TerminatingError
+from queryguard.files import File
+from queryguard.logs import FORMATS
+from queryguard.lsp import LanguageServer
+from queryguard.sampling import UNITS
+from queryguard.shard import merge_reports
+from queryguard.workqueue import WorkQueue
 
-cli = typer.Typer()
+
+class DefaultCommandGroup(TyperGroup):
+    """Runs the run command unless the arguments start with the name of another command.
+
+    This keeps "qg <path>" working next to subcommands such as "qg merge". The help option is left to the group, so
+    "qg --help" lists the commands. A path named like a command is checked with "qg run <path>" or "qg ./<path>".
+    """
+
+    default_command = "run"
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        """Inserts the name of the default command when no command was named.
+
+        Args:
+            ctx (click.Context): The click context.
+            args (list[str]): The command line arguments.
+
+        Returns:
+            list[str]: The remaining arguments.
+        """
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args = [self.default_command, *args]
+
+        return super().parse_args(ctx, args)
+
+
+cli = typer.Typer(
+    cls=DefaultCommandGroup,
+    help="QueryGuard: A guard against unruly sql. Paths given without a command are checked by run, see qg run --help.",
+)
 
 
 @cli.command(help="QueryGuard: A guard against unruly sql.")
 def run(
-    path: Optional[Path] = typer.Argument(default=None, help="Path to a file or folder containing sql queries."),  # noqa: B008  , UP007 # workaround for defects in typer using optional arguments
+    path: Optional[list[Path]] = typer.Argument(default=None, help="Paths to files or folders containing sql queries."),  # noqa: B008  , UP007 # workaround for defects in typer using optional arguments
     settings: Optional[str] = typer.Option(default="", help="Path to configuration file."),  # noqa: UP007
     select: Optional[str] = typer.Option(default=config.SelectSetting.default, help="Rules to enable."),  # noqa: UP007
     ignore: Optional[str] = typer.Option(default=config.IgnoreSetting.default, help="Rules to ignore."),  # noqa: UP007
     output: Optional[str] = typer.Option(default=config.OutputSetting.default, help="Output format."),  # noqa: UP007
     version: Optional[bool] = typer.Option(default=False, help="Print the version and exit."),  # noqa: UP007
     debug: Optional[bool] = typer.Option(default=config.DebugSetting.default, help="Enable debug logging."),  # noqa: UP007
+    cache: Optional[bool] = typer.Option(default=True, help="Reuse parsed statements of unchanged files."),  # noqa: UP007
+    changed_since: Optional[str] = typer.Option(default=None, help="Only check files changed since a git ref."),  # noqa: UP007
+    uncommitted: Optional[bool] = typer.Option(  # noqa: UP007
+        default=False, help="With --changed-since, also check staged, unstaged and untracked files."
+    ),
+    diff_file: Optional[str] = typer.Option(default=None, help="Only check files changed in a unified diff."),  # noqa: UP007
+    hunks: Optional[bool] = typer.Option(  # noqa: UP007
+        default=False, help="With --changed-since or --diff-file, only check statements on changed lines."
+    ),
+    rev: Optional[list[str]] = typer.Option(  # noqa: B008, UP007
+        default=None, help="Check the files of a git revision, or ':' for the index, without a checkout."
+    ),
+    shard: Optional[str] = typer.Option(  # noqa: UP007
+        default=None, help="Only check the i-th of N shards of the files, balanced by file size, e.g. 1/4."
+    ),
+    queue: Optional[str] = typer.Option(  # noqa: UP007
+        default=None, help="Take files from a work queue in a shared directory, together with other processes."
+    ),
+    journal: Optional[str] = typer.Option(  # noqa: UP007
+        default=None, help="Record finished files in a journal, by default in the cache directory."
+    ),
+    resume: Optional[bool] = typer.Option(  # noqa: UP007
+        default=False, help="Skip the files an interrupted run with the same inputs already finished."
+    ),
+    files_from: Optional[str] = typer.Option(  # noqa: UP007
+        default=None,
+        help="Also check the files listed in a file, or '-' for standard input, one per line or NUL separated.",
+    ),
+    watch: Optional[bool] = typer.Option(  # noqa: UP007
+        default=False, help="Keep running and check files again when they change, until Ctrl-C."
+    ),
 ) -> None:
     """Run the QueryGuard tool with the specified parameters.
 
     Args:
-        path (Path): Path to a file or folder containing SQL queries.
+        path (list[Path]): Paths to files or folders containing SQL queries.
         settings (str, optional): Path to configuration file. Defaults to "".
         select (str, optional): Select rules to enable. Defaults to config.SelectSetting.default.
         ignore (str, optional): Ignore rules. Defaults to config.IgnoreSetting.default.
         output (str, optional): Output format. Defaults to config.OutputSetting.default.
         version (bool, optional): Print the version and exit. Defaults to False.
         debug (bool, optional): Enable debug mode. Defaults to config.DebugSetting.default.
+        cache (bool, optional): Reuse parsed statements of unchanged files. Defaults to True.
+        changed_since (str, optional): Only check files changed since a git ref. Defaults to None.
+        uncommitted (bool, optional): Also check uncommitted changes. Defaults to False.
+        diff_file (str, optional): Only check files changed in a unified diff. Defaults to None.
+        hunks (bool, optional): Only check statements on changed lines. Defaults to False.
+        rev (list[str], optional): Check the files of git revisions instead of the working tree. Defaults to None.
+        shard (str, optional): Only check one shard of the files. Defaults to None.
+        queue (str, optional): Take files from a work queue in a shared directory. Defaults to None.
+        journal (str, optional): Record finished files in a journal. Defaults to None.
+        resume (bool, optional): Skip the files an interrupted run already finished. Defaults to False.
+        files_from (str, optional): Also check the files listed in a file or standard input. Defaults to None.
+        watch (bool, optional): Check files again when they change. Defaults to False.
 
     Returns:
         None
@@ -43,7 +123,7 @@ def run(
         typer.echo(__version__)
         raise typer.Exit()
 
-    if not path:
+    if not path and not files_from:
         typer.echo("Error: Missing argument 'path'.")
         typer.echo("For usage information, use the --help flag.")
         raise typer.Exit(code=2)
@@ -51,15 +131,237 @@ def run(
     request_params = cast(
         config.RequestParams,
         {
-            "path": path,
+            "path": path[0] if path else None,
+            "paths": path,
             "settings": settings,
             "select": select,
             "ignore": ignore,
             "output": output,
             "debug": debug if debug else None,
+            "no_cache": None if cache else True,
+            "changed_since": changed_since,
+            "uncommitted": uncommitted if uncommitted else None,
+            "diff_file": diff_file,
+            "hunks": hunks if hunks else None,
+            "revisions": ",".join(rev) if rev else None,
+            "files_from": files_from,
+            "shard": shard,
+            "queue": queue,
+            "journal": journal,
+            "resume": resume if resume else None,
+            "watch": watch if watch else None,
         },
     )
     try:
-        RulesEngine(request_params).run()
+        engine = RulesEngine(request_params)
+        if engine.config.get_setting("watch"):
+            engine.watch()
+        else:
+            engine.run()
+    except TerminatingError as err:
+        raise typer.Exit(code=err.exit_code) from err
+
+
+@cli.command(help="Combine the json reports of several shards into one report and exit code.")
+def merge(
+    reports: list[Path] = typer.Argument(help="Paths to json reports, or '-' for standard input."),  # noqa: B008
+    output: Optional[str] = typer.Option(default=config.OutputSetting.default, help="Output format."),  # noqa: UP007
+) -> None:
+    """Combine the json reports of several shards.
+
+    Args:
+        reports (list[Path]): Paths to the json reports written with --output json.
+        output (str, optional): Output format. Defaults to config.OutputSetting.default.
+
+    Returns:
+        None
+    """
+    _report(merge_reports(reports), output)
+
+
+@cli.command(help="Report the results of all files in a work queue once the workers are done.")
+def finalize(
+    queue: Path = typer.Argument(help="Path to the work queue directory."),  # noqa: B008
+    output: Optional[str] = typer.Option(default=config.OutputSetting.default, help="Output format."),  # noqa: UP007
+) -> None:
+    """Report the results of a work queue.
+
+    Args:
+        queue (Path): Path to the work queue directory given to the workers with --queue.
+        output (str, optional): Output format. Defaults to config.OutputSetting.default.
+
+    Returns:
+        None
+    """
+    _report(WorkQueue(queue).results(), output)
+
+
+@cli.command(help="Keep QueryGuard loaded and check files for clients on a Unix socket, see qg-client.")
+def daemon(
+    socket: Optional[str] = typer.Option(default=None, help="Path to the Unix socket."),  # noqa: UP007
+    settings: Optional[str] = typer.Option(default="", help="Path to configuration file."),  # noqa: UP007
+    select: Optional[str] = typer.Option(default=config.SelectSetting.default, help="Rules to enable."),  # noqa: UP007
+    ignore: Optional[str] = typer.Option(default=config.IgnoreSetting.default, help="Rules to ignore."),  # noqa: UP007
+    debug: Optional[bool] = typer.Option(default=config.DebugSetting.default, help="Enable debug logging."),  # noqa: UP007
+) -> None:
+    """Run the QueryGuard daemon until it is stopped.
+
+    Args:
+        socket (str, optional): Path to the Unix socket. Defaults to None.
+        settings (str, optional): Path to configuration file. Defaults to "".
+        select (str, optional): Select rules to enable. Defaults to config.SelectSetting.default.
+        ignore (str, optional): Ignore rules. Defaults to config.IgnoreSetting.default.
+        debug (bool, optional): Enable debug mode. Defaults to config.DebugSetting.default.
+
+    Returns:
+        None
+    """
+    # The daemon needs Unix sockets, so it is only imported when it is run.
+    from queryguard.daemon import Daemon
+
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, force=True)
+    request_params = cast(
+        config.RequestParams,
+        {"settings": settings, "select": select, "ignore": ignore, "debug": debug if debug else None, "socket": socket},
+    )
+    socket_path = config.Config(request_params).get_setting("socket")
+    Daemon(request_params, socket_path).serve()
+
+
+@cli.command(help="Check the statements captured in query logs, such as Extended Events exports.")
+def ingest(
+    logs: list[str] = typer.Argument(help="Paths to query logs, or '-' for standard input."),  # noqa: B008
+    format: str = typer.Option(default="auto", help=f"Log format, one of {', '.join(FORMATS)}."),
+    settings: Optional[str] = typer.Option(default="", help="Path to configuration file."),  # noqa: UP007
+    select: Optional[str] = typer.Option(default=config.SelectSetting.default, help="Rules to enable."),  # noqa: UP007
+    ignore: Optional[str] = typer.Option(default=config.IgnoreSetting.default, help="Rules to ignore."),  # noqa: UP007
+    output: Optional[str] = typer.Option(default=config.OutputSetting.default, help="Output format."),  # noqa: UP007
+    debug: Optional[bool] = typer.Option(default=config.DebugSetting.default, help="Enable debug logging."),  # noqa: UP007
+    follow: Optional[bool] = typer.Option(  # noqa: UP007
+        default=False, help="Keep checking what is appended to a log, or to the logs in a directory, until Ctrl-C."
+    ),
+    checkpoint: Optional[str] = typer.Option(  # noqa: UP007
+        default=None, help="With --follow, where to save the positions read, by default in the cache directory."
+    ),
+    sample: Optional[int] = typer.Option(  # noqa: UP007
+        default=0, help="Estimate violation rates from a random sample of this many records or logs."
+    ),
+    error: Optional[float] = typer.Option(  # noqa: UP007
+        default=0.0, help="Estimate violation rates to within this error, such as 0.01, from a random sample."
+    ),
+    sample_by: Optional[str] = typer.Option(  # noqa: UP007
+        default="records", help=f"What to sample, one of {', '.join(UNITS)}."
+    ),
+    escalate: Optional[bool] = typer.Option(  # noqa: UP007
+        default=False, help="Check the logs in which sampled records have violations in full."
+    ),
+    seed: Optional[int] = typer.Option(default=None, help="Seed of the random sample."),  # noqa: UP007
+    top: Optional[int] = typer.Option(  # noqa: UP007
+        default=0, help="Summarize the violations of each rule with its most frequent query shapes, this many."
+    ),
+) -> None:
+    """Check query logs.
+
+    Args:
+        logs (list[str]): Paths to query logs, or "-" for standard input.
+        format (str, optional): Log format. Defaults to "auto".
+        settings (str, optional): Path to configuration file. Defaults to "".
+        select (str, optional): Select rules to enable. Defaults to config.SelectSetting.default.
+        ignore (str, optional): Ignore rules. Defaults to config.IgnoreSetting.default.
+        output (str, optional): Output format. Defaults to config.OutputSetting.default.
+        debug (bool, optional): Enable debug mode. Defaults to config.DebugSetting.default.
+        follow (bool, optional): Keep checking what is appended to the log. Defaults to False.
+        checkpoint (str, optional): Where to save the positions read while following. Defaults to None.
+        sample (int, optional): The number of records or logs to sample. Defaults to 0.
+        error (float, optional): The error bound of the estimates. Defaults to 0.0.
+        sample_by (str, optional): What to sample, "records" or "logs". Defaults to "records".
+        escalate (bool, optional): Check the logs with sampled violations in full. Defaults to False.
+        seed (int, optional): Seed of the random sample. Defaults to None.
+        top (int, optional): The number of query shapes to summarize per rule. Defaults to 0.
+
+    Returns:
+        None
+    """
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, force=True)
+    if follow and (len(logs) != 1 or logs[0] == "-"):
+        raise click.BadParameter("exactly one log file or directory can be followed", param_hint="--follow")
+
+    if format not in FORMATS:
+        raise click.BadParameter(f"expected one of {', '.join(FORMATS)}", param_hint="--format")
+
+    if sample_by not in UNITS:
+        raise click.BadParameter(f"expected one of {', '.join(UNITS)}", param_hint="--sample-by")
+
+    if (sample or 0) < 0 or not 0 <= (error or 0) < 0.5:
+        raise click.BadParameter("expected a positive sample size and an error between 0 and 0.5")
+
+    sampling = bool(sample or error)
+    if sampling and follow:
+        raise click.BadParameter("logs that are followed can't be sampled", param_hint="--follow")
+
+    if (top or 0) < 0:
+        raise click.BadParameter("expected a positive number of shapes", param_hint="--top")
+
+    if sampling and top:
+        raise click.BadParameter("sampled logs can't be summarized", param_hint="--top")
+
+    if sampling and "-" in logs and (escalate or sample_by == "logs"):
+        raise click.BadParameter("standard input can't be sampled by logs or checked again in full")
+
+    request_params = cast(
+        config.RequestParams,
+        {"settings": settings, "select": select, "ignore": ignore, "output": output, "debug": debug if debug else None},
+    )
+    try:
+        engine = RulesEngine(request_params)
+        if follow:
+            engine.follow(logs[0], format, checkpoint, top or 0)
+        elif sampling:
+            engine.sample(logs, format, sample or 0, error or 0.0, sample_by or "records", bool(escalate), seed)
+        else:
+            engine.ingest(logs, format, top or 0)
+    except TerminatingError as err:
+        raise typer.Exit(code=err.exit_code) from err
+
+
+@cli.command(help="Run a Language Server Protocol server on standard input and output, for editors.")
+def lsp(
+    settings: Optional[str] = typer.Option(default="", help="Path to configuration file."),  # noqa: UP007
+    select: Optional[str] = typer.Option(default=config.SelectSetting.default, help="Rules to enable."),  # noqa: UP007
+    ignore: Optional[str] = typer.Option(default=config.IgnoreSetting.default, help="Rules to ignore."),  # noqa: UP007
+    debounce: int = typer.Option(default=300, help="Milliseconds to wait after an edit before checking."),
+    debug: Optional[bool] = typer.Option(default=config.DebugSetting.default, help="Enable debug logging."),  # noqa: UP007
+) -> None:
+    """Run the QueryGuard language server until the editor exits it.
+
+    Args:
+        settings (str, optional): Path to configuration file. Defaults to "".
+        select (str, optional): Select rules to enable. Defaults to config.SelectSetting.default.
+        ignore (str, optional): Ignore rules. Defaults to config.IgnoreSetting.default.
+        debounce (int, optional): Milliseconds to wait after an edit before checking. Defaults to 300.
+        debug (bool, optional): Enable debug mode. Defaults to config.DebugSetting.default.
+
+    Returns:
+        None
+    """
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, force=True)
+    request_params = cast(
+        config.RequestParams,
+        {"settings": settings, "select": select, "ignore": ignore, "debug": debug if debug else None},
+    )
+    settings_config = config.Config(request_params)
+    server = LanguageServer(settings_config.rules, settings_config.get_setting("literal_limit"), debounce / 1000)
+    code = server.serve(click.get_binary_stream("stdin"), click.get_binary_stream("stdout"))
+    raise typer.Exit(code=code)
+
+
+def _report(files: list[File], output: None | str) -> None:
+    output_handler = config.OutputSetting().post_hook(output or config.OutputSetting.default)
+    try:
+        output_handler.process_result(files)
+        if any(file.violations for file in files):
+            output_handler.exit_violation_found()
+
+        output_handler.exit_violation_not_found()
     except TerminatingError as err:
         raise typer.Exit(code=err.exit_code) from err
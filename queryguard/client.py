@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import sys
+from typing import Any
+
+# Only the standard library is imported here, so the client starts quickly.
+
+DEFAULT_SOCKET = ".queryguard_cache/daemon.sock"
+SOCKET_VARIABLE = "QUERYGUARD_SOCKET"
+UNREACHABLE = 2
+
+
+def request(message: dict[str, Any], socket_path: str) -> dict[str, Any]:
+    """Sends a request to the daemon and waits for the response.
+
+    Requests and responses are JSON documents on a single line, one request per connection.
+
+    Args:
+        message (dict[str, Any]): The request.
+        socket_path (str): The path to the Unix socket of the daemon.
+
+    Returns:
+        dict[str, Any]: The response.
+
+    Raises:
+        OSError: If the daemon can't be reached.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        connection.shutdown(socket.SHUT_WR)
+        data = b"".join(iter(lambda: connection.recv(1 << 16), b""))
+
+    response: dict[str, Any] = json.loads(data)
+    return response
+
+
+def format_text(files: list[dict[str, Any]]) -> str:
+    """Formats results as plain text, one line per file followed by its violations.
+
+    Args:
+        files (list[dict[str, Any]]): The files, as in the json output format.
+
+    Returns:
+        str: The text.
+    """
+    lines = []
+    for file in files:
+        reason = f" ({file['reason']})" if file.get("reason") else ""
+        lines.append(f"{file['path']}: {file['status']}{reason}")
+        lines.extend(f"    {violation['message']}" for violation in file["violations"])
+
+    return "\n".join(lines)
+
+
+def main(argv: None | list[str] = None) -> int:
+    """Checks files with a running daemon and prints the results.
+
+    Args:
+        argv (None | list[str]): The command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The exit code, 1 if a violation was found and 2 if the daemon can't be reached.
+    """
+    parser = argparse.ArgumentParser(prog="qg-client", description="Check SQL files with a running QueryGuard daemon.")
+    parser.add_argument("paths", nargs="*", help="Paths to files or folders containing sql queries.")
+    parser.add_argument("--stdin", metavar="NAME", help="Check sql read from standard input, reported as NAME.")
+    parser.add_argument("--output", choices=("text", "json"), default="text", help="Output format.")
+    parser.add_argument("--socket", default=os.environ.get(SOCKET_VARIABLE) or DEFAULT_SOCKET, help="Daemon socket.")
+    parser.add_argument("--stop", action="store_true", help="Stop the daemon.")
+    args = parser.parse_args(argv)
+    if not (args.paths or args.stdin or args.stop):
+        parser.error("Missing argument 'paths'.")
+
+    message: dict[str, Any] = {"command": "stop"} if args.stop else {"command": "check", "cwd": os.getcwd()}
+    if not args.stop:
+        message["paths"] = args.paths
+        if args.stdin:
+            message["name"] = args.stdin
+            message["text"] = sys.stdin.read()
+
+    try:
+        response = request(message, args.socket)
+    except (OSError, ValueError) as e:
+        print(f"Error: Unable to reach the QueryGuard daemon at {args.socket}: {e}", file=sys.stderr)
+        return UNREACHABLE
+
+    if "error" in response:
+        print(f"Error: {response['error']}", file=sys.stderr)
+    elif "files" in response:
+        print(json.dumps(response["files"], indent=4) if args.output == "json" else format_text(response["files"]))
+
+    return int(response.get("exit_code", 0))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
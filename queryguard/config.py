@@ -18,7 +18,7 @@ if sys.version_info >= (3, 11):
 else:
     import tomli as tomllib  # pragma: no cover
 
-from queryguard import output, rules
+from queryguard import cache, client, output, parser, rules, source
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +27,7 @@ class RequestParams(TypedDict):
     """Request input parameters."""
 
     path: Path
+    paths: list[Path]
     settings: str
     select: str
     ignore: str
@@ -91,6 +92,10 @@ class BaseHandler(ABC):
         if setting.type == "bool":
             return bool(value)
 
+        # handle integers
+        if isinstance(value, (str, int)) and not isinstance(value, bool) and setting.type == "int":
+            return int(value)
+
         # handle paths
         if isinstance(value, Path) and setting.type == "path":
             return value
@@ -184,10 +189,10 @@ class FileHandler(BaseHandler):
         """
         value = self._data["tool"]["queryguard"].get(setting.name)
 
-        if not value:
+        if not value and not isinstance(value, int):
             value = self._data["tool"]["queryguard"].get(setting.alias)
 
-        if value:
+        if value or isinstance(value, int):
             return self.convert_type(setting, value)
 
         return super().get(setting)
@@ -264,12 +269,12 @@ class BaseSetting(ABC):
 
     @property
     @abstractmethod
-    def default(self) -> bool | str | Iterable[str] | Path | None:
+    def default(self) -> bool | str | int | Iterable[str] | Path | None:
         """Default value for the configuration."""
 
     @property
     @abstractmethod
-    def type(self) -> Literal["str"] | Literal["list"] | Literal["bool"] | Literal["path"]:
+    def type(self) -> Literal["str"] | Literal["list"] | Literal["bool"] | Literal["path"] | Literal["int"]:
         """Default value for the configuration."""
 
     def post_hook(self, value: Any) -> Any:  # noqa: ANN401
@@ -311,6 +316,242 @@ class PathSetting(BaseSetting):
     type = "path"
 
 
+class LiteralLimitSetting(BaseSetting):
+    """Literal limit setting."""
+
+    name = "literal_limit"
+    default = parser.DEFAULT_LITERAL_LIMIT
+    type = "int"
+
+
+class SplitThresholdSetting(BaseSetting):
+    """Split threshold setting."""
+
+    name = "split_threshold"
+    default = 64 << 20
+    type = "int"
+
+
+class WorkersSetting(BaseSetting):
+    """Workers setting."""
+
+    name = "workers"
+    default = os.cpu_count() or 1
+    type = "int"
+
+
+class FileTimeoutSetting(BaseSetting):
+    """Per-file time budget setting."""
+
+    name = "file_timeout"
+    default = 0
+    type = "int"
+
+
+class FileMemorySetting(BaseSetting):
+    """Per-worker memory budget setting."""
+
+    name = "file_memory"
+    default = 0
+    type = "int"
+
+
+class RecycleAfterSetting(BaseSetting):
+    """Worker recycling setting."""
+
+    name = "recycle_after"
+    default = 0
+    type = "int"
+
+
+class EncodingsSetting(BaseSetting):
+    """Fallback encodings setting."""
+
+    name = "encodings"
+    default = ",".join(source.DEFAULT_ENCODINGS)
+    type = "list"
+
+
+class MaxFileSizeSetting(BaseSetting):
+    """Maximum file size setting."""
+
+    name = "max_file_size"
+    default = 0
+    type = "int"
+
+
+class ReadAheadSetting(BaseSetting):
+    """Read-ahead depth setting."""
+
+    name = "read_ahead"
+    default = 8
+    type = "int"
+
+
+class ReadThreadsSetting(BaseSetting):
+    """Reader threads setting."""
+
+    name = "read_threads"
+    default = 4
+    type = "int"
+
+
+class CacheDirSetting(BaseSetting):
+    """Cache directory setting."""
+
+    name = "cache_dir"
+    default = cache.DEFAULT_CACHE_DIR
+    type = "path"
+
+
+class CacheSizeSetting(BaseSetting):
+    """Cache size setting."""
+
+    name = "cache_size"
+    default = cache.DEFAULT_CACHE_SIZE >> 20
+    type = "int"
+
+
+class NoCacheSetting(BaseSetting):
+    """Cache bypass setting."""
+
+    name = "no_cache"
+    default = False
+    type = "bool"
+
+
+class TreeMaxAgeSetting(BaseSetting):
+    """Directory cache max age setting."""
+
+    name = "tree_max_age"
+    default = 0
+    type = "int"
+
+
+class ChangedSinceSetting(BaseSetting):
+    """Changed since git ref setting."""
+
+    name = "changed_since"
+    default = ""
+    type = "str"
+
+
+class UncommittedSetting(BaseSetting):
+    """Include uncommitted changes setting."""
+
+    name = "uncommitted"
+    default = False
+    type = "bool"
+
+
+class DiffFileSetting(BaseSetting):
+    """Unified diff file setting."""
+
+    name = "diff_file"
+    default = ""
+    type = "str"
+
+
+class HunksSetting(BaseSetting):
+    """Only check changed lines setting."""
+
+    name = "hunks"
+    default = False
+    type = "bool"
+
+
+class FilesFromSetting(BaseSetting):
+    """File list setting."""
+
+    name = "files_from"
+    default = ""
+    type = "str"
+
+
+class JournalSetting(BaseSetting):
+    """Journal setting."""
+
+    name = "journal"
+    default = ""
+    type = "str"
+
+
+class ResumeSetting(BaseSetting):
+    """Resume an interrupted run setting."""
+
+    name = "resume"
+    default = False
+    type = "bool"
+
+
+class WatchSetting(BaseSetting):
+    """Watch for changes setting."""
+
+    name = "watch"
+    default = False
+    type = "bool"
+
+
+class WatchDebounceSetting(BaseSetting):
+    """Watch debounce setting."""
+
+    name = "watch_debounce"
+    default = 200
+    type = "int"
+
+
+class FollowIntervalSetting(BaseSetting):
+    """Follow poll interval setting."""
+
+    name = "follow_interval"
+    default = 500
+    type = "int"
+
+
+class SocketSetting(BaseSetting):
+    """Daemon socket setting."""
+
+    name = "socket"
+    default = client.DEFAULT_SOCKET
+    type = "path"
+
+
+class QueueSetting(BaseSetting):
+    """Queue setting."""
+
+    name = "queue"
+    default = ""
+    type = "str"
+
+
+class QueueLeaseSetting(BaseSetting):
+    """Work queue lease setting."""
+
+    name = "queue_lease"
+    default = 300
+    type = "int"
+
+
+class ShardSetting(BaseSetting):
+    """Shard setting."""
+
+    name = "shard"
+    default = ""
+    type = "str"
+
+
+class RevisionsSetting(BaseSetting):
+    """Git revisions setting."""
+
+    name = "revisions"
+    default = ""
+    type = "str"
+
+    def post_hook(self, value: str) -> list[str]:
+        """Post hook for splitting the comma separated revisions."""
+        return [x.strip() for x in value.split(",") if x.strip()]
+
+
 class OutputSetting(BaseSetting):
     """Path setting."""
 
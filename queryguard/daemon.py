@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import click
+
+from queryguard.cache import Cache
+from queryguard.config import Config, FileHandler, RequestParams
+from queryguard.exceptions import TerminatingError
+from queryguard.files import File, FileEncoder
+from queryguard.source import Source
+
+logger = logging.getLogger(__name__)
+
+VERDICTS_SIZE = 10000
+
+
+class Daemon:
+    """Keeps the rules, configuration and caches loaded between checks, and serves clients on a Unix socket.
+
+    Each client connection is handled on its own thread. The configuration file is checked on every request and
+    reloaded when it changed. A configuration that can't be loaded is reported to every client until it is fixed,
+    and the previous one is kept meanwhile. Verdicts are remembered by path, size and modification time, so checking
+    an unchanged file again doesn't even read it.
+
+    Attributes:
+        arguments (RequestParams): The arguments the configuration is resolved with.
+        socket_path (Path): The path to the Unix socket.
+        requests (int): The number of requests served.
+        reloads (int): The number of times the configuration was reloaded.
+    """
+
+    def __init__(self, arguments: RequestParams, socket_path: Path) -> None:
+        """Initializes the Daemon class and loads the configuration.
+
+        Args:
+            arguments (RequestParams): The arguments the configuration is resolved with.
+            socket_path (Path): The path to the Unix socket.
+        """
+        self.arguments = arguments
+        self.socket_path = socket_path
+        self.requests = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._server: None | socketserver.BaseServer = None
+        self._verdicts: OrderedDict[tuple[str, int, int], dict[str, Any]] = OrderedDict()
+        self._load()
+
+    def __repr__(self) -> str:
+        return f"Daemon({self.socket_path})"
+
+    def serve(self) -> None:
+        """Serves clients until the daemon is stopped by a client, SIGINT or SIGTERM.
+
+        Returns:
+            None
+
+        Raises:
+            click.ClickException: If another daemon is already serving on the socket.
+        """
+        path = str(self.socket_path)
+        if self.socket_path.exists():
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(path)
+                except OSError:
+                    self.socket_path.unlink()
+                else:
+                    raise click.ClickException(f"A daemon is already running on {path}")
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        with _Server(path, _Handler) as server:
+            server.daemon_instance = self
+            self._server = server
+            os.chmod(path, 0o600)
+            previous = {}
+            if threading.current_thread() is threading.main_thread():
+                previous = {
+                    signum: signal.signal(signum, lambda *_: self.stop()) for signum in (signal.SIGINT, signal.SIGTERM)
+                }
+
+            logger.info(f"Serving on {self.socket_path.resolve()}")
+            try:
+                server.serve_forever()
+            finally:
+                for signum, action in previous.items():
+                    signal.signal(signum, action)
+
+                self.socket_path.unlink(missing_ok=True)
+
+        logger.info(f"Stopped after {self.requests} requests")
+
+    def stop(self) -> None:
+        """Stops serving, after the requests in progress.
+
+        Returns:
+            None
+        """
+        if self._server:
+            threading.Thread(target=self._server.shutdown).start()
+
+    def handle(self, message: dict[str, Any]) -> dict[str, Any]:
+        """Answers a request.
+
+        Args:
+            message (dict[str, Any]): The request, either {"command": "stop"} or {"command": "check", "cwd": ...,
+                "paths": [...]} with optional "text" and "name" to check sql that isn't in a file.
+
+        Returns:
+            dict[str, Any]: The response, with the files and the exit code, or an error.
+        """
+        self.requests += 1
+        command = message.get("command")
+        if command == "stop":
+            self.stop()
+            return {"exit_code": 0}
+
+        if command != "check":
+            return {"error": f"Unknown command {command}", "exit_code": 1}
+
+        try:
+            self.refresh()
+            files = self.check(Path(message["cwd"]), message.get("paths", []), message.get("text"), message.get("name"))
+            if self.cache:
+                self.cache.prune()
+        except click.ClickException as e:
+            return {"error": e.message, "exit_code": e.exit_code}
+        except (KeyError, TypeError) as e:
+            return {"error": f"Invalid request: {e!r}", "exit_code": 1}
+        except Exception as e:
+            # Any other failure is a bug, but the client still gets an answer and the daemon keeps serving.
+            logger.exception(f"Unable to answer request {message}")
+            return {"error": f"Unable to check the files: {e!r}", "exit_code": 1}
+
+        return {"files": files, "exit_code": int(any(file.violations for file in files))}
+
+    def check(self, cwd: Path, paths: list[str], text: None | str = None, name: None | str = None) -> list[File]:
+        """Evaluates files and text.
+
+        Args:
+            cwd (Path): The directory relative paths are relative to.
+            paths (list[str]): Paths to files or folders containing SQL queries.
+            text (None | str): SQL to check that isn't in a file.
+            name (None | str): The name to report the text as.
+
+        Returns:
+            list[File]: The evaluated files, named like they were given.
+
+        Raises:
+            click.ClickException: If a path doesn't exist.
+        """
+        files = []
+        for value in paths:
+            path = Path(value)
+            full = path if path.is_absolute() else cwd / path
+            if full.is_file():
+                files.append(self.evaluate(full, path))
+            elif full.is_dir():
+                files.extend(self.evaluate(x, path / x.relative_to(full)) for x in full.glob("**/*.sql"))
+            else:
+                raise click.ClickException(f"Invalid path: {path}")
+
+        if text is not None:
+            file = File(Path(name or "-"))
+            reader = partial(Source, data=text.encode(), encodings=self.encodings)
+            file.evaluate(self.rules, self.literal_limit, reader=reader, cache=self.cache)
+            files.append(file)
+
+        return files
+
+    def evaluate(self, full: Path, path: Path) -> File:
+        """Evaluates a file, or recalls its verdict if it didn't change.
+
+        Args:
+            full (Path): The path to the file.
+            path (Path): The path to report the file as.
+
+        Returns:
+            File: The evaluated file.
+        """
+        try:
+            stat = full.stat()
+            key: None | tuple[str, int, int] = (str(full), stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            key = None
+
+        with self._lock:
+            verdict = self._verdicts.get(key) if key else None
+            if verdict:
+                self._verdicts.move_to_end(key)  # type: ignore[arg-type]
+
+        if verdict:
+            file = File.from_dict(verdict)
+        else:
+            file = File(full)
+            reader = partial(Source.read, encodings=self.encodings, max_size=self.max_size)
+            file.evaluate(self.rules, self.literal_limit, reader=reader, cache=self.cache)
+            if key:
+                with self._lock:
+                    self._verdicts[key] = file.to_dict()
+                    if len(self._verdicts) > VERDICTS_SIZE:
+                        self._verdicts.popitem(last=False)
+
+        file.path = path
+        return file
+
+    def refresh(self) -> None:
+        """Reloads the configuration if its file changed.
+
+        Returns:
+            None
+
+        Raises:
+            click.ClickException: If the changed configuration can't be loaded. The previous one is kept.
+        """
+        with self._lock:
+            if _get_stamp(self.arguments.get("settings")) != self._stamp:
+                logger.info("Configuration changed, reloading")
+                try:
+                    self._load()
+                except (OSError, ValueError, TerminatingError) as e:
+                    logger.warning(f"Unable to reload the configuration: {e}")
+                    raise click.ClickException(f"Unable to reload the configuration: {e}") from e
+
+                self.reloads += 1
+
+    def _load(self) -> None:
+        # The stamp is only updated once the configuration is loaded, so a broken configuration is tried again.
+        stamp = _get_stamp(self.arguments.get("settings"))
+        config = Config(self.arguments)
+        rules = config.rules
+        literal_limit = config.get_setting("literal_limit")
+        encodings = config.get_setting("encodings")
+        max_size = config.get_setting("max_file_size")
+        cache = None
+        if not config.get_setting("no_cache"):
+            cache = Cache(
+                config.get_setting("cache_dir"),
+                literal_limit,
+                encodings=encodings,
+                max_size=config.get_setting("cache_size") << 20,
+            )
+
+        self.rules = rules
+        self.literal_limit = literal_limit
+        self.encodings = encodings
+        self.max_size = max_size
+        self.cache = cache
+        self._stamp = stamp
+        self._verdicts.clear()
+        logger.debug(f"Loaded {len(self.rules)} rules")
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    daemon_instance: Daemon
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: _Server
+
+    def handle(self) -> None:
+        try:
+            message = json.loads(self.rfile.readline())
+        except ValueError as e:
+            response: dict[str, Any] = {"error": f"Invalid request: {e}", "exit_code": 1}
+        else:
+            if isinstance(message, dict):
+                response = self.server.daemon_instance.handle(message)
+            else:
+                response = {"error": "Invalid request: not a JSON object", "exit_code": 1}
+
+        self.wfile.write(json.dumps(response, cls=FileEncoder).encode() + b"\n")
+
+
+def _get_stamp(settings: None | str) -> None | tuple[str, int, int]:
+    paths = [Path(settings)] if settings else FileHandler._config_file_paths
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+
+        return str(path), stat.st_size, stat.st_mtime_ns
+
+    return None
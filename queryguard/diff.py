@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TypeVar
+
+T = TypeVar("T")
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class LineRanges:
+    """An interval index over changed line numbers.
+
+    The ranges are merged and sorted on creation, so each lookup is a binary search.
+    """
+
+    def __init__(self, ranges: Iterable[tuple[int, int]]) -> None:
+        """Initializes the LineRanges class.
+
+        Args:
+            ranges (Iterable[tuple[int, int]]): The first and last line of each range, numbered from 1.
+        """
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        for first, last in sorted(ranges):
+            if self._ends and first <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], last)
+            else:
+                self._starts.append(first)
+                self._ends.append(last)
+
+    def __repr__(self) -> str:
+        return f"LineRanges({list(self)})"
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return zip(self._starts, self._ends)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def overlaps(self, first: int, last: int) -> bool:
+        """Checks whether any range overlaps the given lines.
+
+        Args:
+            first (int): The first line.
+            last (int): The last line.
+
+        Returns:
+            bool: True if at least one of the lines is in a range.
+        """
+        index = bisect_right(self._starts, last) - 1
+        return index >= 0 and self._ends[index] >= first
+
+
+def parse_unified_diff(text: str, strip: int = 1) -> dict[str, LineRanges]:
+    """Reads the changed lines of each file from a unified diff.
+
+    Only added lines of the new version are kept, context lines aren't. Where lines were only removed, the lines
+    around the removal are considered changed.
+
+    Args:
+        text (str): The unified diff.
+        strip (int): The number of leading path components to remove from file names, like patch -p.
+
+    Returns:
+        dict[str, LineRanges]: The changed lines by file name. Deleted files aren't included.
+    """
+    ranges: dict[str, list[tuple[int, int]]] = {}
+    current: list[tuple[int, int]] = []
+    line = old = new = 0
+    removed = False
+    for row in text.splitlines():
+        if old or new:
+            if row.startswith("+"):
+                current.append((line, line))
+                line += 1
+                new -= 1
+                removed = False
+            elif row.startswith("-"):
+                old -= 1
+                removed = True
+            elif not row.startswith("\\"):
+                if removed:
+                    current.append((max(line - 1, 1), line))
+                    removed = False
+
+                line += 1
+                old -= 1
+                new -= 1
+
+            if removed and not (old or new):
+                current.append((max(line - 1, 1), line))
+                removed = False
+
+            continue
+
+        if row.startswith("+++ "):
+            name = row[4:].split("\t")[0].strip().strip('"')
+            if name == "/dev/null":
+                current = []
+            else:
+                current = ranges.setdefault("/".join(name.split("/")[strip:]) if name.count("/") >= strip else name, [])
+
+            continue
+
+        match = HUNK_HEADER.match(row)
+        if match:
+            old = 1 if match.group(1) is None else int(match.group(1))
+            line = int(match.group(2))
+            new = 1 if match.group(3) is None else int(match.group(3))
+            if not new:
+                line += 1
+
+    return {name: LineRanges(x) for name, x in ranges.items()}
+
+
+def select_changed(path: Path, root: Path, changes: dict[str, T]) -> dict[Path, T]:
+    """Picks the changed SQL files that are in a path and still exist.
+
+    Args:
+        path (Path): The path to a file or directory that was given as input.
+        root (Path): The directory the changed file names are relative to.
+        changes (dict[str, T]): Values by changed file name.
+
+    Returns:
+        dict[Path, T]: The values by file path, relative to the path like the files get_files lists, in file name
+            order.
+    """
+    resolved = path.resolve()
+    selected = {}
+    for name in sorted(changes):
+        changed = root / name
+        if not name.endswith(".sql") or not changed.is_file():
+            continue
+
+        if path.is_dir() and resolved in changed.resolve().parents:
+            selected[path / changed.resolve().relative_to(resolved)] = changes[name]
+        elif changed.resolve() == resolved:
+            selected[path] = changes[name]
+
+    return selected
@@ -1,15 +1,59 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import os
+import random
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial
 from pathlib import Path
+from typing import TypeVar
 
 import click
 
+from queryguard.aggregate import ViolationSummary
+from queryguard.cache import PARSER_VERSION, Cache, ruleset_fingerprint
 from queryguard.config import Config, RequestParams
+from queryguard.diff import parse_unified_diff, select_changed
+from queryguard.exceptions import Interrupted, TerminatingError
 from queryguard.files import File
+from queryguard.follow import BATCH_RECORDS, Follower, detect_follow_format
+from queryguard.git import (
+    INDEX,
+    CatFile,
+    get_blob_sizes,
+    get_changed_lines,
+    get_changed_paths,
+    get_top,
+    list_blobs,
+)
+from queryguard.journal import Journal
+from queryguard.logs import CHUNK_SIZE, LogChecker, Record, open_log, read_log
+from queryguard.pipeline import ReadAhead
+from queryguard.sampling import Estimator, Reservoir, get_sample_size
+from queryguard.shard import parse_shard, select_shard
+from queryguard.source import Source
+from queryguard.tree import TreeCache
+from queryguard.verdicts import VerdictStore
+from queryguard.watch import get_watcher, wait_for_changes
+from queryguard.watchdog import Watchdog
+from queryguard.workqueue import WorkQueue
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+STATS_INTERVAL = 10.0
+
 
 class RulesEngine:
     """The RulesEngine class represents the engine that runs the rules on SQL files.
@@ -58,6 +102,392 @@ class RulesEngine:
 
         return files
 
+    def get_listed_files(self, files_from: str) -> list[File]:
+        """Retrieves a list of File objects for the files listed in a manifest, without checking that they exist.
+
+        Paths are separated by NUL characters if the manifest contains any, and by line breaks otherwise. Duplicate
+        paths are listed once.
+
+        Args:
+            files_from (str): The path to the manifest, or "-" to read it from standard input.
+
+        Returns:
+            list[File]: A list of File objects.
+        """
+        if files_from == "-":
+            data = click.get_binary_stream("stdin").read()
+        else:
+            try:
+                data = Path(files_from).read_bytes()
+            except OSError as e:
+                raise click.ClickException(f"Unable to read file list {files_from}: {e}") from e
+
+        separator = b"\0" if b"\0" in data else b"\n"
+        names = dict.fromkeys(name.rstrip(b"\r") if separator == b"\n" else name for name in data.split(separator))
+        files = [File(Path(os.fsdecode(name))) for name in names if name.strip()]
+        logger.debug(f"{len(files)} files listed in {files_from}")
+        return files
+
+    def get_input_paths(self) -> list[Path]:
+        """The paths given as input. There are none when only a file list is given.
+
+        Returns:
+            list[Path]: The paths to the input files or directories.
+        """
+        paths = self.config.arguments.get("paths")
+        if paths:
+            return list(paths)
+
+        if self.config.get_setting("files_from"):
+            return []
+
+        return [self.config.get_setting("path")]
+
+    def get_input_files(self, cache: None | Cache) -> tuple[list[File], None | TreeCache]:
+        """Retrieves the files to evaluate from the input paths and file list.
+
+        Args:
+            cache (None | Cache): The cache of parsed statements and rule outcomes.
+
+        Returns:
+            tuple[list[File], None | TreeCache]: The files and the directory-level cache, if one is used. Files
+                that were already evaluated don't have the status "Not Run".
+
+        Files read from git revisions are evaluated here, once the shard is selected by the sizes of their blobs.
+        """
+        files_from = self.config.get_setting("files_from")
+        changed_since = self.config.get_setting("changed_since")
+        diff_file = self.config.get_setting("diff_file")
+        revisions = self.config.get_setting("revisions")
+        paths = self.get_input_paths()
+        files = self.get_listed_files(files_from) if files_from else []
+        tree = None
+        if len(paths) == 1 and not (files_from or changed_since or diff_file or revisions):
+            tree = self.get_tree(paths[0], cache)
+
+        blobs: dict[str, tuple[Path, str]] = {}
+        for path in paths:
+            if revisions:
+                top = get_top(path)
+                for file, oid in self.get_revision_files(path, revisions):
+                    files.append(file)
+                    blobs.setdefault(str(file.path), (top, oid))
+            elif diff_file:
+                files.extend(self.get_diff_files(path, Path(diff_file)))
+            elif changed_since:
+                files.extend(self.get_changed_files(path, changed_since))
+            else:
+                files.extend(tree.get_files() if tree else self.get_files(path))
+
+        if len(paths) > 1 or files_from:
+            unique: dict[str, File] = {}
+            for file in files:
+                unique.setdefault(str(file.path), file)
+
+            files = list(unique.values())
+
+        shard = self.config.get_setting("shard")
+        if shard:
+            sizes = _get_blob_sizes(blobs)
+            files = select_shard(
+                files, [sizes.get(str(file.path)) or _get_size(file.path) for file in files], *parse_shard(shard)
+            )
+
+        if blobs:
+            self.evaluate_revisions([file for file in files if str(file.path) in blobs], blobs, cache)
+
+        return files, tree
+
+    def get_changed_files(self, input_path: Path, ref: str) -> list[File]:
+        """Retrieves a list of File objects for the SQL files in the input path that changed since a git ref.
+
+        Args:
+            input_path (Path): The path to the input file or directory.
+            ref (str): The git ref to compare with.
+
+        Returns:
+            list[File]: A list of File objects.
+        """
+        if not input_path.exists():
+            raise click.ClickException(f"Invalid path: {input_path}")
+
+        logger.debug(f"Getting files changed since {ref} from {input_path}")
+        uncommitted = self.config.get_setting("uncommitted")
+        if self.config.get_setting("hunks"):
+            lines = get_changed_lines(input_path, ref, uncommitted=uncommitted)
+            return [File(path, changed_lines=changed_lines) for path, changed_lines in lines.items()]
+
+        return [File(path) for path in get_changed_paths(input_path, ref, uncommitted=uncommitted)]
+
+    def get_diff_files(self, input_path: Path, diff_file: Path) -> list[File]:
+        """Retrieves a list of File objects for the SQL files in the input path that are changed in a unified diff.
+
+        File names in the diff are relative to the current directory, after removing the a/ and b/ prefixes.
+
+        Args:
+            input_path (Path): The path to the input file or directory.
+            diff_file (Path): The path to the unified diff.
+
+        Returns:
+            list[File]: A list of File objects.
+        """
+        if not input_path.exists():
+            raise click.ClickException(f"Invalid path: {input_path}")
+
+        logger.debug(f"Getting files changed in {diff_file} from {input_path}")
+        try:
+            text = diff_file.read_text(encoding="utf-8", errors="surrogateescape")
+        except OSError as e:
+            raise click.ClickException(f"Unable to read diff file {diff_file}: {e}") from e
+
+        lines = select_changed(input_path, Path.cwd(), parse_unified_diff(text))
+        hunks = self.config.get_setting("hunks")
+        return [File(path, changed_lines=changed_lines if hunks else None) for path, changed_lines in lines.items()]
+
+    def get_revision_files(self, input_path: Path, revisions: list[str]) -> list[tuple[File, str]]:
+        """Retrieves File objects for the SQL files in the input path as they are in git revisions.
+
+        Files are named after their revision and their path in the repository, like "v1.0:sql/setup.sql", or
+        ":sql/setup.sql" in the index. Nothing is checked out.
+
+        Args:
+            input_path (Path): The path to the input file or directory.
+            revisions (list[str]): Tags, commits or other tree-ish revisions, or ":" for the index.
+
+        Returns:
+            list[tuple[File, str]]: Each File object with the id of its blob.
+        """
+        files = []
+        for revision in revisions:
+            for name, oid in list_blobs(input_path, revision):
+                files.append((File(Path(f":{name}" if revision == INDEX else f"{revision}:{name}")), oid))
+
+        return files
+
+    def evaluate_revisions(self, files: list[File], blobs: dict[str, tuple[Path, str]], cache: None | Cache) -> None:
+        """Evaluates files read from git revisions, reading their blobs from the repository.
+
+        Each distinct blob is read and evaluated once, and its verdict is shared by all files with the same contents.
+
+        Args:
+            files (list[File]): The files to evaluate, see get_revision_files.
+            blobs (dict[str, tuple[Path, str]]): The top-level directory of the repository and the blob id of each
+                file, by file path.
+            cache (None | Cache): The cache of parsed statements and rule outcomes.
+
+        Returns:
+            None
+        """
+        shared: dict[tuple[Path, str], list[File]] = {}
+        for file in files:
+            shared.setdefault(blobs[str(file.path)], []).append(file)
+
+        logger.debug(f"{len(files)} files in git revisions share {len(shared)} distinct blobs")
+        literal_limit = self.config.get_setting("literal_limit")
+        max_size = self.config.get_setting("max_file_size")
+        encodings = self.config.get_setting("encodings")
+        with ExitStack() as stack:
+            cat_files: dict[Path, CatFile] = {}
+            for (top, oid), same in self.output_handler.track(list(shared.items()), description="Processing..."):
+                if top not in cat_files:
+                    cat_files[top] = stack.enter_context(CatFile(top))
+
+                first = same[0]
+                data = cat_files[top].read(oid)
+                if max_size and len(data) > max_size:
+                    first.skip(f"larger than {max_size} bytes")
+                else:
+                    reader = partial(Source, data=data, encodings=encodings)
+                    first.evaluate(self.rules, literal_limit, reader=reader, cache=cache)
+
+                for file in same[1:]:
+                    file.status, file.reason, file.violations = first.status, first.reason, list(first.violations)
+
+    def get_cache(self) -> None | Cache:
+        """The cache of parsed statements and rule outcomes, unless it is disabled."""
+        if self.config.get_setting("no_cache"):
+            return None
+
+        return Cache(
+            self.config.get_setting("cache_dir"),
+            self.config.get_setting("literal_limit"),
+            encodings=self.config.get_setting("encodings"),
+            max_size=self.config.get_setting("cache_size") << 20,
+        )
+
+    def get_verdicts(self) -> None | VerdictStore:
+        """The store of the verdicts of statement shapes found in query logs, unless the cache is disabled."""
+        if self.config.get_setting("no_cache"):
+            return None
+
+        path = self.config.get_setting("cache_dir") / "verdicts.db"
+        try:
+            return VerdictStore(path, self.rules, self.config.get_setting("literal_limit"))
+        except sqlite3.Error as e:
+            logger.warning(f"Unable to open the verdict store {path}: {e}")
+            return None
+
+    def get_tree(self, input_path: Path, cache: None | Cache) -> None | TreeCache:
+        """The directory-level cache of the input path, if it is a directory and the cache is enabled.
+
+        Args:
+            input_path (Path): The path to the input file or directory.
+            cache (None | Cache): The cache of parsed statements and rule outcomes.
+
+        Returns:
+            None | TreeCache: The directory-level cache.
+        """
+        max_age = self.config.get_setting("tree_max_age")
+        if not cache or not max_age or not input_path.is_dir():
+            return None
+
+        salt = f"{cache.salt}|{ruleset_fingerprint(self.rules)}|{self.config.get_setting('max_file_size')}"
+        return TreeCache(cache.root, input_path, salt, max_age)
+
+    def get_queue(self) -> None | WorkQueue:
+        """The shared work queue, if the files are checked by several processes that take work from it."""
+        queue = self.config.get_setting("queue")
+        if not queue:
+            return None
+
+        if self.config.get_setting("revisions"):
+            raise click.ClickException("Revisions can't be checked with a work queue")
+
+        return WorkQueue(Path(queue), lease=self.config.get_setting("queue_lease"))
+
+    def get_journal(self, queue: None | WorkQueue) -> None | Journal:
+        """The journal of finished files, unless there is no place to keep it.
+
+        Without an explicit path the journal is kept in the cache directory, named after a fingerprint of the
+        inputs, rules and settings, and removed once the run is complete.
+
+        Args:
+            queue (None | WorkQueue): The shared work queue, which keeps the results of finished files itself.
+
+        Returns:
+            None | Journal: The journal.
+        """
+        path = self.config.get_setting("journal")
+        resume = self.config.get_setting("resume")
+        if queue:
+            if path or resume:
+                raise click.ClickException("A work queue keeps its results itself and can't be used with a journal")
+
+            return None
+
+        if not path and self.config.get_setting("no_cache"):
+            if resume:
+                raise click.ClickException("Resuming needs a journal, set --journal or enable the cache")
+
+            return None
+
+        inputs = [str(path.resolve()) for path in self.get_input_paths()]
+        settings = [
+            str(self.config.get_setting(name))
+            for name in (
+                "files_from",
+                "changed_since",
+                "uncommitted",
+                "diff_file",
+                "hunks",
+                "shard",
+                "literal_limit",
+                "max_file_size",
+                "encodings",
+            )
+        ]
+        data = json.dumps([PARSER_VERSION, ruleset_fingerprint(self.rules), inputs, settings])
+        fingerprint = hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+        if path:
+            return Journal(Path(path), fingerprint)
+
+        return Journal(
+            self.config.get_setting("cache_dir") / "journals" / f"{fingerprint}.jsonl", fingerprint, keep=False
+        )
+
+    def interrupt(self, files: list[File], interrupted: Interrupted, journal: None | Journal) -> None:
+        """Reports the files that were checked before a signal stopped the run, with a summary, and ends execution.
+
+        Args:
+            files (list[File]): The files of the run.
+            interrupted (Interrupted): The signal that stopped the run.
+            journal (None | Journal): The journal of finished files.
+
+        Returns:
+            None
+
+        Raises:
+            TerminatingError: Always, with the exit code of a process stopped by the signal.
+        """
+        checked = [file for file in files if file.status != "Not Run"]
+        self.output_handler.process_result(checked)
+        failed = sum(1 for file in checked if file.violations)
+        hint = " Run again with --resume to check the rest." if journal else ""
+        click.echo(
+            f"Interrupted: {len(checked)} of {len(files)} files checked, {failed} with violations.{hint}", err=True
+        )
+        raise TerminatingError(exit_code=128 + interrupted.signal)
+
+    def get_watchdog(self, cache: None | Cache) -> None | Watchdog:
+        """The watchdog that evaluates files in isolated workers, if a budget or worker recycling is set.
+
+        Args:
+            cache (None | Cache): The cache of parsed statements and rule outcomes.
+
+        Returns:
+            None | Watchdog: The watchdog.
+        """
+        timeout = self.config.get_setting("file_timeout")
+        memory = self.config.get_setting("file_memory")
+        recycle = self.config.get_setting("recycle_after")
+        if not (timeout or memory or recycle):
+            return None
+
+        return Watchdog(
+            self.rules,
+            self.config.get_setting("literal_limit"),
+            encodings=self.config.get_setting("encodings"),
+            max_size=self.config.get_setting("max_file_size"),
+            cache=cache,
+            timeout=timeout,
+            memory=memory << 20,
+            recycle=recycle,
+            workers=self.config.get_setting("workers"),
+        )
+
+    def evaluate_files(
+        self, items: Iterable[tuple[T, File]], read_ahead: ReadAhead, cache: None | Cache
+    ) -> Generator[tuple[T, File], None, None]:
+        """Evaluates the files of the items in this process, splitting large files into chunks for worker processes.
+
+        Args:
+            items (Iterable[tuple[T, File]]): A key and a file to evaluate.
+            read_ahead (ReadAhead): Reads the files.
+            cache (None | Cache): The cache of parsed statements and rule outcomes.
+
+        Returns:
+            Generator[tuple[T, File], None, None]: The items, once their files are evaluated.
+        """
+        literal_limit = self.config.get_setting("literal_limit")
+        split_threshold = self.config.get_setting("split_threshold")
+        workers = self.config.get_setting("workers")
+        executor: None | Executor = None
+        try:
+            for key, file in items:
+                started = time.perf_counter()
+                waited = read_ahead.stats.io_wait
+                if workers > 1 and _get_size(file.path) >= split_threshold:
+                    executor = executor or ProcessPoolExecutor(max_workers=workers)
+                    file.evaluate(self.rules, literal_limit, executor=executor, reader=read_ahead.read, cache=cache)
+                else:
+                    file.evaluate(self.rules, literal_limit, reader=read_ahead.read, cache=cache)
+
+                read_ahead.stats.cpu_time += time.perf_counter() - started - (read_ahead.stats.io_wait - waited)
+                yield key, file
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
     def run(self) -> None:
         """Evaluates each file in the input path for adherance to the enabled rules.
 
@@ -67,9 +497,70 @@ class RulesEngine:
         Returns:
             None
         """
-        files = self.get_files(self.config.get_setting("path"))
-        for file in self.output_handler.track(files, description="Processing..."):
-            file.evaluate(self.rules)
+        queue = self.get_queue()
+        cache = self.get_cache()
+        files, tree = self.get_input_files(cache)
+        journal = self.get_journal(queue)
+        pending = [file for file in files if file.status == "Not Run"]
+        if journal:
+            journal.start(pending, resume=self.config.get_setting("resume"))
+            pending = [file for file in pending if file.status == "Not Run"]
+
+        items: Iterable[tuple[None | str, File]] = [(None, file) for file in pending]
+        if queue:
+            queue.create(files, [_get_size(file.path) for file in files])
+            items, pending = queue.claim(), []
+
+        watchdog = self.get_watchdog(cache)
+        read_ahead = ReadAhead(
+            [] if watchdog else [file.path for file in pending],
+            depth=self.config.get_setting("read_ahead"),
+            threads=self.config.get_setting("read_threads"),
+            encodings=self.config.get_setting("encodings"),
+            max_size=self.config.get_setting("max_file_size"),
+        )
+        tracked = self.output_handler.track(items, description="Processing...")
+        evaluated = watchdog.evaluate(tracked) if watchdog else self.evaluate_files(tracked, read_ahead, cache)
+        interrupted: None | Interrupted = None
+        try:
+            with read_ahead, _interruptible():
+                for claimed, file in evaluated:
+                    if journal:
+                        journal.record(file)
+
+                    if queue and claimed:
+                        queue.finish(claimed, file)
+                        pending.append(file)
+        except Interrupted as e:
+            interrupted = e
+        finally:
+            evaluated.close()
+            if journal:
+                journal.close(complete=not interrupted)
+
+        logger.debug(f"Read-ahead: {read_ahead.stats}")
+        if watchdog:
+            logger.debug(f"Watchdog: {watchdog.started} workers started, {watchdog.exceeded} files exceeded a budget")
+
+        if cache:
+            cache.prune()
+            logger.debug(
+                f"Cache: {cache.hits} parsed files found, {cache.misses} missing, {cache.reused} rule outcomes reused, "
+                f"{cache.skipped} skipped by trigger terms, {cache.evaluated} evaluated, {cache.pruned} pruned"
+            )
+
+        if queue:
+            logger.debug(f"Work queue: {queue.claimed} items claimed by {queue.worker}")
+            queue.release()
+
+            files = pending
+
+        if tree:
+            tree.update(files)
+            logger.debug(f"Directory cache: {tree.reused} verdicts reused, {tree.scanned} directories listed")
+
+        if interrupted:
+            self.interrupt(files, interrupted, journal)
 
         self.output_handler.process_result(files)
 
@@ -78,3 +569,406 @@ class RulesEngine:
                 self.output_handler.exit_violation_found()
 
         self.output_handler.exit_violation_not_found()
+
+    def evaluate(self, files: list[File], cache: None | Cache, description: str = "") -> None:
+        """Evaluates files, in isolated workers if a budget is set.
+
+        Args:
+            files (list[File]): The files to evaluate.
+            cache (None | Cache): The cache of parsed statements and rule outcomes.
+            description (str): A description to show the progress with, none to not show progress.
+
+        Returns:
+            None
+        """
+        watchdog = self.get_watchdog(cache)
+        read_ahead = ReadAhead(
+            [] if watchdog else [file.path for file in files],
+            depth=self.config.get_setting("read_ahead"),
+            threads=self.config.get_setting("read_threads"),
+            encodings=self.config.get_setting("encodings"),
+            max_size=self.config.get_setting("max_file_size"),
+        )
+        items = [(None, file) for file in files]
+        tracked = self.output_handler.track(items, description=description) if description else items
+        evaluated = watchdog.evaluate(tracked) if watchdog else self.evaluate_files(tracked, read_ahead, cache)
+        try:
+            with read_ahead:
+                for _ in evaluated:
+                    pass
+        finally:
+            evaluated.close()
+
+    def watch(self) -> None:
+        """Evaluates each file in the input paths, then evaluates files again whenever they change.
+
+        Changes are collected until none arrived for the debounce time, so a branch switch is checked at once. The
+        results are shown after each check. Watching stops on SIGINT or SIGTERM, and the exit code reflects the
+        latest results.
+
+        Returns:
+            None
+
+        Raises:
+            click.ClickException: If the files aren't given as paths.
+        """
+        for name in ("files_from", "changed_since", "diff_file", "revisions", "queue", "shard", "journal", "resume"):
+            if self.config.get_setting(name):
+                raise click.ClickException(f"Watching only supports paths and can't be combined with {name}")
+
+        cache = self.get_cache()
+        paths = self.get_input_paths()
+        debounce = self.config.get_setting("watch_debounce") / 1000
+        files, tree = self.get_input_files(cache)
+        self.evaluate([file for file in files if file.status == "Not Run"], cache, description="Processing...")
+        if tree:
+            tree.update(files)
+
+        results = {str(file.path): file for file in files}
+        summary = f"Checked {len(files)} files"
+        watcher = get_watcher(paths)
+        try:
+            with _interruptible():
+                while True:
+                    self.output_handler.show(
+                        list(results.values()),
+                        f"{summary} at {time.strftime('%H:%M:%S')}, watching for changes.",
+                    )
+                    changed = wait_for_changes(watcher, debounce)
+                    started = time.perf_counter()
+                    if changed is None:
+                        # Events were lost, start over with a new watcher and all files.
+                        watcher.close()
+                        watcher = get_watcher(paths)
+                        results = {str(file.path): file for path in paths for file in self.get_files(path)}
+                        stale = list(results.values())
+                    else:
+                        stale = []
+                        for path in sorted(changed):
+                            if path.is_file():
+                                results[str(path)] = File(path)
+                                stale.append(results[str(path)])
+                            else:
+                                results.pop(str(path), None)
+
+                    self.evaluate(stale, cache)
+                    if cache:
+                        cache.prune()
+
+                    logger.debug(f"Checked {len(stale)} of {len(changed or [])} changed files")
+                    summary = f"Checked {len(stale)} changed files in {time.perf_counter() - started:.2f} s"
+        except Interrupted:
+            pass
+        finally:
+            watcher.close()
+            self.output_handler.close()
+
+        for file in results.values():
+            if file.violations:
+                self.output_handler.exit_violation_found()
+
+        self.output_handler.exit_violation_not_found()
+
+    def ingest(self, logs: list[str], format: str = "auto", top: int = 0) -> None:
+        """Checks the statements captured in query logs, reporting each record with violations as it is found.
+
+        Records are streamed from the logs and only counted once checked, so memory use doesn't depend on the size
+        of the logs. With top, the records aren't reported but summarized once checked, with the number of
+        violations of each rule and the query shapes violating it most often, in fixed memory. A summary is written
+        to standard error.
+
+        Args:
+            logs (list[str]): Paths to the logs, or "-" for standard input.
+            format (str): The format of the logs, see logs.FORMATS.
+            top (int): The number of query shapes to summarize per rule, or 0 to report every record.
+
+        Returns:
+            None
+
+        Raises:
+            TerminatingError: Always, with exit code 1 if a violation was found.
+        """
+        store = self.get_verdicts()
+        checker = LogChecker(self.rules, self.config.get_setting("literal_limit"), store)
+        summary = ViolationSummary(self.rules, top) if top else None
+        workers = self.config.get_setting("workers")
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        started = time.perf_counter()
+        interrupted: None | Interrupted = None
+        try:
+            with _interruptible():
+                for path in logs:
+                    with open_log(path) as stream:
+                        for record, violations in checker.check(read_log(stream, path, format), executor):
+                            if summary:
+                                summary.add(record, violations)
+                            elif violations:
+                                self.output_handler.process_record(record, violations)
+        except Interrupted as e:
+            interrupted = e
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            if store:
+                store.close()
+
+        if summary:
+            self.output_handler.process_summary(summary)
+
+        elapsed = time.perf_counter() - started
+        counts = ", ".join(f"{id}: {count}" for id, count in sorted(checker.counts.items()))
+        click.echo(
+            f"{'Interrupted after checking' if interrupted else 'Checked'} {checker.records} records in "
+            f"{elapsed:.1f} s ({checker.records / max(elapsed, 1e-9):.0f} per second), {checker.parsed} parsed, "
+            f"{f'{checker.reused} from stored verdicts, ' if store else ''}"
+            f"{checker.failed} with violations{f' ({counts})' if counts else ''}.",
+            err=True,
+        )
+        if interrupted:
+            raise TerminatingError(exit_code=128 + interrupted.signal)
+
+        if checker.failed:
+            self.output_handler.exit_violation_found()
+
+        self.output_handler.exit_violation_not_found()
+
+    def sample(
+        self,
+        logs: list[str],
+        format: str = "auto",
+        size: int = 0,
+        error: float = 0.0,
+        unit: str = "records",
+        escalate: bool = False,
+        seed: None | int = None,
+    ) -> None:
+        """Estimates the rate at which the records of query logs violate each rule from a random sample.
+
+        Records are sampled uniformly from all logs with a reservoir, so every record is read but only the sample is
+        checked, or whole logs are sampled and checked, so the other logs aren't read at all. With an error bound,
+        the sample is checked in random order until every confidence interval is within the bound. The estimates are
+        reported with their 95% confidence intervals, together with the logs in which violations were sampled, and
+        those logs can then be checked in full.
+
+        Args:
+            logs (list[str]): Paths to the logs, or "-" for standard input when records are sampled.
+            format (str): The format of the logs, see logs.FORMATS.
+            size (int): The number of records or logs to sample, or 0 to size the sample by the error bound.
+            error (float): The largest acceptable distance from an estimate to the bounds of its interval, or 0.
+            unit (str): What is sampled, "records" or "logs".
+            escalate (bool): Check the logs in which sampled records have violations in full, when records are
+                sampled.
+            seed (None | int): The seed of the random sample.
+
+        Returns:
+            None
+
+        Raises:
+            TerminatingError: Always, with exit code 1 if a violation was found.
+        """
+        rng = random.Random(seed)
+        store = self.get_verdicts()
+        literal_limit = self.config.get_setting("literal_limit")
+        checker = LogChecker(self.rules, literal_limit, store)
+        workers = self.config.get_setting("workers")
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        started = time.perf_counter()
+        estimator: None | Estimator = None
+        escalated = LogChecker(self.rules, literal_limit, store)
+        interrupted: None | Interrupted = None
+        try:
+            with _interruptible():
+                if unit == "records":
+                    reservoir: Reservoir[Record] = Reservoir(size or get_sample_size(error), rng)
+                    for path in logs:
+                        with open_log(path) as stream:
+                            for record in read_log(stream, path, format):
+                                reservoir.add(record)
+
+                    # The sample is checked in random order, so it can be cut short once the estimates are precise.
+                    rng.shuffle(reservoir.items)
+                    estimator = Estimator(self.rules, reservoir.seen, reservoir.seen)
+                    for record, violations in checker.check(reservoir.items, executor):
+                        estimator.add(
+                            record.source, 1, Counter({(violation.rule, violation.id) for violation in violations})
+                        )
+                        if violations and not escalate:
+                            self.output_handler.process_record(record, violations)
+                        if error and estimator.units % CHUNK_SIZE == 0 and estimator.precise(error):
+                            break
+                else:
+                    estimator = Estimator(self.rules, len(logs))
+                    for path in rng.sample(logs, min(size or len(logs), len(logs))):
+                        records = 0
+                        counts: Counter[tuple[str, str]] = Counter()
+                        with open_log(path) as stream:
+                            for record, violations in checker.check(read_log(stream, path, format), executor):
+                                records += 1
+                                counts.update({(violation.rule, violation.id) for violation in violations})
+                                if violations:
+                                    self.output_handler.process_record(record, violations)
+
+                        estimator.add(path, records, counts)
+                        if error and estimator.precise(error):
+                            break
+
+                self.output_handler.process_estimates(estimator)
+                if escalate and unit == "records":
+                    for path in sorted(estimator.strata):
+                        with open_log(path) as stream:
+                            for record, violations in escalated.check(read_log(stream, path, format), executor):
+                                if violations:
+                                    self.output_handler.process_record(record, violations)
+        except Interrupted as e:
+            interrupted = e
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            if store:
+                store.close()
+
+        elapsed = time.perf_counter() - started
+        sampled = f"{estimator.units} of {estimator.population} {unit}" if estimator else f"0 {unit}"
+        summary = (
+            f"{'Interrupted after sampling' if interrupted else 'Sampled'} {sampled} in {elapsed:.1f} s, "
+            f"{checker.records} records checked, {checker.parsed} parsed, {checker.failed} with violations"
+        )
+        if estimator and escalated.records:
+            summary += (
+                f"; {escalated.records} records of {len(estimator.strata)} logs checked in full, "
+                f"{escalated.failed} with violations"
+            )
+
+        click.echo(f"{summary}.", err=True)
+        if interrupted:
+            raise TerminatingError(exit_code=128 + interrupted.signal)
+
+        if checker.failed or escalated.failed:
+            self.output_handler.exit_violation_found()
+
+        self.output_handler.exit_violation_not_found()
+
+    def follow(self, log: str, format: str = "auto", checkpoint: None | str = None, top: int = 0) -> None:
+        """Checks the records appended to a log, or to the logs in a directory, until stopped by SIGINT or SIGTERM.
+
+        New records are checked in batches and reported, or summarized when stopped, like ingest does. After
+        each batch the positions in the logs are saved in the checkpoint, by default in the cache directory, so
+        a restart continues where the last run stopped. Throughput and lag are written to standard error at
+        intervals.
+
+        Args:
+            log (str): The path to the log file or directory.
+            format (str): The format of the logs, "lines", "go" or "auto".
+            checkpoint (None | str): The path to the checkpoint.
+            top (int): The number of query shapes to summarize per rule, or 0 to report every record.
+
+        Returns:
+            None
+
+        Raises:
+            TerminatingError: Always, with exit code 1 if a violation was found.
+        """
+        path = Path(log)
+        if not path.exists():
+            raise click.ClickException(f"Invalid path: {log}")
+
+        if format == "auto":
+            format = detect_follow_format(path)
+
+        if checkpoint:
+            checkpoint_path: None | Path = Path(checkpoint)
+        elif self.config.get_setting("no_cache"):
+            checkpoint_path = None
+        else:
+            name = hashlib.blake2b(f"{path.resolve()}|{format}".encode(), digest_size=16).hexdigest()
+            checkpoint_path = self.config.get_setting("cache_dir") / "offsets" / f"{name}.json"
+
+        store = self.get_verdicts()
+        checker = LogChecker(self.rules, self.config.get_setting("literal_limit"), store)
+        summary = ViolationSummary(self.rules, top) if top else None
+        interval = self.config.get_setting("follow_interval") / 1000
+        workers = self.config.get_setting("workers")
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        started = reported = time.perf_counter()
+        counted = 0
+        try:
+            with Follower(path, format, checkpoint_path) as follower, _interruptible():
+                while True:
+                    records = follower.poll()
+                    for record, violations in checker.check(records, executor):
+                        if summary:
+                            summary.add(record, violations)
+                        elif violations:
+                            self.output_handler.process_record(record, violations)
+
+                    if records:
+                        sys.stdout.flush()
+                        follower.commit()
+
+                    now = time.perf_counter()
+                    if now - reported >= STATS_INTERVAL:
+                        click.echo(
+                            f"Following {follower.files} files: {checker.records - counted} records in the last "
+                            f"{now - reported:.0f} s ({(checker.records - counted) / (now - reported):.0f} per "
+                            f"second), {checker.failed} with violations so far, {follower.lag} bytes behind.",
+                            err=True,
+                        )
+                        reported, counted = now, checker.records
+
+                    if len(records) < BATCH_RECORDS:
+                        time.sleep(interval)
+        except Interrupted:
+            pass
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            if store:
+                store.close()
+
+        if summary:
+            self.output_handler.process_summary(summary)
+
+        elapsed = time.perf_counter() - started
+        click.echo(
+            f"Stopped following after {elapsed:.0f} s: {checker.records} records checked, {checker.failed} with "
+            f"violations, {follower.rotations} rotations and {follower.truncations} truncations.",
+            err=True,
+        )
+        if checker.failed:
+            self.output_handler.exit_violation_found()
+
+        self.output_handler.exit_violation_not_found()
+
+
+@contextmanager
+def _interruptible() -> Iterator[None]:
+    """Raises Interrupted on SIGINT and SIGTERM, so partial results can be reported, then restores the handlers."""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum: int, frame: object) -> None:
+        raise Interrupted(signum)
+
+    previous = {signum: signal.signal(signum, handler) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        yield
+    finally:
+        for signum, action in previous.items():
+            signal.signal(signum, action)
+
+
+def _get_blob_sizes(blobs: dict[str, tuple[Path, str]]) -> dict[str, int]:
+    oids: dict[Path, set[str]] = {}
+    for top, oid in blobs.values():
+        oids.setdefault(top, set()).add(oid)
+
+    sizes = {top: get_blob_sizes(top, sorted(x)) for top, x in oids.items()}
+    return {path: sizes[top].get(oid, 0) for path, (top, oid) in blobs.items()}
+
+
+def _get_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 import sqlparse
 
+if TYPE_CHECKING:
+    from queryguard.source import Source  # pragma: no cover
+
+SNIPPET_LENGTH = 50
+
 
 class TerminatingError(Exception):
     """Exception that will stop QueryGuard execution."""
@@ -17,6 +24,40 @@ class TerminatingError(Exception):
     pass
 
 
+class Interrupted(Exception):
+    """Exception raised when QueryGuard receives a signal to stop, such as SIGINT or SIGTERM.
+
+    Attributes:
+        signal (int): The number of the signal.
+    """
+
+    def __init__(self, signal: int) -> None:
+        """Initialize an Interrupted Exception object.
+
+        Args:
+            signal (int): The number of the signal.
+        """
+        self.signal = signal
+        super().__init__(f"Interrupted by signal {signal}")
+
+
+class SkippedFile(Exception):
+    """Exception raised when a file is recognized as unsuitable for evaluation.
+
+    Attributes:
+        reason (str): Why the file was skipped.
+    """
+
+    def __init__(self, reason: str) -> None:
+        """Initialize a SkippedFile Exception object.
+
+        Args:
+            reason (str): Why the file was skipped.
+        """
+        self.reason = reason
+        super().__init__(reason)
+
+
 class RuleViolation(Exception):
     """Exception raised when a query does not adhere to the ruleset.
 
@@ -24,21 +65,62 @@ class RuleViolation(Exception):
         rule (str): The rule that was violated.
         statement (str): The statement that caused the violation.
         message (str): The error message that will be displayed.
+        offset (None | int): The position of the statement in the source, if known.
+        end (None | int): The position after the statement in the source, if known.
     """
 
-    def __init__(self, rule: str, id: str, statement: sqlparse.sql.Statement) -> None:
+    def __init__(self, rule: str, id: str, statement: sqlparse.sql.Statement | str) -> None:
         """Initialize a RuleViolation Exception object.
 
         Args:
             rule (str): The rule that was violated.
             id (str): The id of the rule that was violated.
-            statement (sqlparse.sql.Statement): The SQL statement that violated the rule.
+            statement (sqlparse.sql.Statement | str): The SQL statement that violated the rule, or its text.
         """
         self.rule = rule
         self.id = id
-        self.statement = str(statement)[0:50]
-        self.message = f"Violated rule {self.rule} ({self.id}). Statement: '{str(statement)[0:50]}'"
-        super().__init__(self.message)
+        self.statement = _get_prefix(statement, SNIPPET_LENGTH)
+        self.offset: None | int = getattr(statement, "offset", None)
+        self.end: None | int = getattr(statement, "end", None)
+        super().__init__(f"Violated rule {self.rule} ({self.id})")
 
     def __str__(self) -> str:
         return f"{self.rule} ({self.id})"
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return self.__class__, (self.rule, self.id, self.statement), self.__dict__
+
+    @property
+    def message(self) -> str:
+        """The error message that will be displayed."""
+        return f"Violated rule {self.rule} ({self.id}). Statement: '{self.statement}'"
+
+    def locate(self, source: Source) -> None:
+        """Copies the beginning of the statement out of the source it was read from, up to the end of the statement.
+
+        The statement parsed from the source may have its data sections elided, and violations reused from the cache
+        have no statement text at all, so the text is taken from the source while it is still open.
+
+        Args:
+            source (Source): The source the statement was read from.
+
+        Returns:
+            None
+        """
+        if self.offset is not None:
+            self.statement = source.snippet(self.offset, SNIPPET_LENGTH, self.end)
+
+
+def _get_prefix(statement: sqlparse.sql.Statement | str, length: int) -> str:
+    if not isinstance(statement, sqlparse.sql.TokenList):
+        return str(statement)[0:length]
+
+    values = []
+    size = 0
+    for token in statement.flatten():
+        values.append(token.value)
+        size += len(token.value)
+        if size >= length:
+            break
+
+    return "".join(values)[0:length]
@@ -1,19 +1,31 @@
 from __future__ import annotations
 
 import logging
+import os
 import re
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future
 from json import JSONEncoder
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import sqlparse
 
 from queryguard import rules
-from queryguard.exceptions import RuleViolation
-from queryguard.parser import SQLParser
+from queryguard.cache import SEGMENT_TOKENS, Cache, SegmentWriter, decode_segment, find_text_terms, rule_fingerprint
+from queryguard.diff import LineRanges
+from queryguard.exceptions import RuleViolation, SkippedFile
+from queryguard.parser import DEFAULT_LITERAL_LIMIT, SQLParser
+from queryguard.source import Source
 
 logger = logging.getLogger(__name__)
 
+UNIT_SIZE = 1 << 20
+UNIT_WINDOW = 2 * (os.cpu_count() or 1)
+
+_BatchWork = tuple[int, str, list[type[rules.BaseRule]], dict[str, Optional[list[int]]]]
+
 
 class FileEncoder(JSONEncoder):
     """Encodes File objects to JSON format."""
@@ -28,11 +40,15 @@ class FileEncoder(JSONEncoder):
             Any: The JSON-serializable representation of the object.
         """
         if isinstance(obj, File):
-            return {
+            encoded = {
                 "path": str(obj.path),
                 "violations": obj.violations,
                 "status": re.sub(r"[^\x00-\x7F]", " ", obj.status).strip(),
             }
+            if obj.reason:
+                encoded["reason"] = obj.reason
+
+            return encoded
 
         if isinstance(obj, RuleViolation):
             return {
@@ -57,26 +73,82 @@ class File:
         path (Path): The path to the file.
         violations (list[RuleViolation]): A list of rule violations found in the file.
         status (str): The evaluation status of the file.
+        reason (None | str): Why the file was skipped, if it was.
+        changed_lines (None | LineRanges): When given, only statements overlapping these lines are evaluated.
     """
 
-    def __init__(self, path: Path) -> None:
+    def __init__(self, path: Path, changed_lines: None | LineRanges = None) -> None:
         """Initializes a new instance of the Engine class.
 
         Args:
             path (Path): The path to the file to be analyzed.
+            changed_lines (None | LineRanges): When given, only statements overlapping these lines are evaluated.
         """
         self.path = path
         self.violations: list[RuleViolation] = []
         self.status = "Not Run"
+        self.reason: None | str = None
+        self.changed_lines = changed_lines
 
     def __repr__(self) -> str:
         return f"File(path={self.path}, status={self.status})"
 
-    def evaluate(self, rules: list[type[rules.BaseRule]]) -> None:
+    @classmethod
+    def from_dict(cls: type[File], data: dict[str, Any]) -> File:
+        """Restores a file and its verdict stored with to_dict.
+
+        Args:
+            data (dict[str, Any]): The stored file.
+
+        Returns:
+            File: The file.
+        """
+        file = cls(Path(data["path"]))
+        file.status = data["status"]
+        file.reason = data.get("reason")
+        for values in data["violations"]:
+            violation = RuleViolation(values["rule"], values["id"], values["statement"])
+            violation.offset = values["offset"]
+            violation.end = values.get("end")
+            file.violations.append(violation)
+
+        return file
+
+    def to_dict(self) -> dict[str, Any]:
+        """Converts the file and its verdict to plain values that can be stored and restored with from_dict.
+
+        Returns:
+            dict[str, Any]: The file.
+        """
+        return {
+            "path": str(self.path),
+            "status": self.status,
+            "reason": self.reason,
+            "violations": [
+                {"rule": x.rule, "id": x.id, "offset": x.offset, "end": x.end, "statement": x.statement}
+                for x in self.violations
+            ],
+        }
+
+    def evaluate(
+        self,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int = DEFAULT_LITERAL_LIMIT,
+        executor: None | Executor = None,
+        reader: Callable[[Path], Source] = Source.read,
+        cache: None | Cache = None,
+    ) -> None:
         """Evaluates the file against a list of rules.
 
         Args:
             rules (list[type[rules.BaseRule]]): A list of rule classes to be evaluated.
+            literal_limit (int): The longest string literal that is lexed verbatim.
+            executor (None | Executor): When given, the file is split into work units at GO batch boundaries which
+                are evaluated on the executor.
+            reader (Callable[[Path], Source]): Reads and decodes the file contents.
+            cache (None | Cache): When given, recorded rule outcomes and parsed statements of unchanged files are
+                taken from the cache instead of evaluating and parsing the file again. Of a file that changed, only
+                the GO batches that changed are parsed again. Not used when only changed lines are evaluated.
 
         Returns:
             None
@@ -84,18 +156,419 @@ class File:
         logger.debug(f"Evaluating rules against {self.path}")
 
         try:
-            text = self.path.read_text(encoding="utf-8", errors="strict")
-        except UnicodeDecodeError:
-            text = self.path.read_text(encoding="utf-16", errors="strict")
+            with reader(self.path) as source:
+                if self.changed_lines is not None:
+                    violations = self._evaluate_lines(source, rules, literal_limit, self.changed_lines)
+                elif cache:
+                    violations = self._evaluate_cached(source, rules, literal_limit, executor, cache)
+                elif executor:
+                    violations = self._evaluate_units(source, rules, literal_limit, executor)
+                else:
+                    violations = merge_violations(
+                        violation
+                        for offset, text in source.batches()
+                        for violation in evaluate_unit(text, offset, rules, literal_limit, source.encoding)
+                    )
 
-        statements: tuple[sqlparse.sql.Statement] = SQLParser.get_all_statements(text)
-        for rule in rules:
-            try:
-                rule().check(statements)
-            except RuleViolation as e:
-                self.violations.append(e)
+                for violation in violations:
+                    violation.locate(source)
+        except SkippedFile as e:
+            logger.debug(f"Skipping {self.path}: {e.reason}")
+            self.skip(e.reason)
+            return
+        except OSError as e:
+            logger.debug(f"Skipping unreadable {self.path}: {e}")
+            self.skip((e.strerror or "unreadable").lower())
+            return
 
+        self.violations.extend(violations)
         if self.violations:
             self.status = "Failed ❌"
         else:
             self.status = "Passed ✅"
+
+    def skip(self, reason: str) -> None:
+        """Marks the file as skipped.
+
+        Args:
+            reason (str): Why the file was skipped.
+
+        Returns:
+            None
+        """
+        self.status = "Skipped ⚠️"
+        self.reason = reason
+
+    def _evaluate_lines(
+        self, source: Source, rules: list[type[rules.BaseRule]], literal_limit: int, lines: LineRanges
+    ) -> list[RuleViolation]:
+        violations = []
+        parsed = line = 0
+        first = 1
+        for offset, text in source.batches():
+            last = first + text.count("\n")
+            if lines.overlaps(first + text.count("\n", 0, len(text) - len(text.lstrip())), last):
+                statements = parse_changed_unit(text, offset, first, lines, literal_limit, source.encoding)
+                violations.extend(check_statements(statements, rules))
+                parsed += 1
+
+            first = last
+            line += 1
+
+        logger.debug(f"Evaluated {parsed} of {line} batches of {self.path} overlapping changed lines")
+        return merge_violations(violations)
+
+    def _evaluate_cached(
+        self,
+        source: Source,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int,
+        executor: None | Executor,
+        cache: Cache,
+    ) -> list[RuleViolation]:
+        key = cache.key(source.buffer)
+        results, violations, pending = cache.reuse_results(key, rules)
+        if not pending:
+            logger.debug(f"Using cached results of {self.path}")
+            source.encoding = results.encoding
+            return merge_violations(violations)
+
+        entry = cache.load(key)
+        if entry is not None:
+            logger.debug(f"Using cached statements of {self.path}")
+            source.encoding, segments = entry
+            found = merge_violations(
+                violation for segment in segments for violation in check_statements(decode_segment(segment), pending)
+            )
+            cache.store_results(key, results, pending, found, source.encoding, segments)
+        else:
+            found, terms, encoded = self._evaluate_batches(source, pending, literal_limit, executor, cache)
+            if encoded is not None:
+                cache.store(key, source.encoding, encoded)
+
+            cache.store_results(key, results, pending, found, source.encoding, terms=terms)
+
+        return merge_violations([*violations, *found])
+
+    def _evaluate_batches(
+        self,
+        source: Source,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int,
+        executor: None | Executor,
+        cache: Cache,
+    ) -> tuple[list[RuleViolation], set[str], None | list[bytes]]:
+        known = cache.load_batches(self.path)
+        encode = not known
+        checks = [(rule, rule_fingerprint(rule), {term.upper() for term in rule.triggers}) for rule in rules]
+        recorded: dict[str, dict[str, None | list[int]]] = {}
+        violations: list[RuleViolation] = []
+        terms: set[str] = set()
+        encoded: list[bytes] = []
+        futures: deque[tuple[list[_BatchWork], Future[tuple[list[list[RuleViolation]], list[bytes]]]]] = deque()
+        chunk: list[_BatchWork] = []
+        size = 0
+        for offset, end, text in _batch_spans(source):
+            key = cache.batch_key(source.buffer[offset:end], source.encoding)
+            batch_terms = find_text_terms(text, cache.vocabulary)
+            terms |= batch_terms
+            if key in known:
+                cache.batches_reused += 1
+
+            outcomes = {x: y for x, y in known.get(key, {}).items() if x in cache.fingerprints}
+            recorded[key] = outcomes
+            missing = []
+            for rule, fingerprint, triggers in checks:
+                if fingerprint in outcomes:
+                    span = outcomes[fingerprint]
+                    if span is not None:
+                        violation = RuleViolation(str(rule.rule), str(rule.id), "")
+                        violation.offset, violation.end = offset + span[0], offset + span[1]
+                        violations.append(violation)
+                elif triggers and batch_terms.isdisjoint(triggers):
+                    outcomes[fingerprint] = None
+                else:
+                    missing.append(rule)
+
+            if missing or encode:
+                chunk.append((offset, text, missing, outcomes))
+                size += len(text)
+
+            if size >= UNIT_SIZE:
+                futures.append((chunk, _submit_batches(executor, chunk, literal_limit, source.encoding, encode)))
+                chunk, size = [], 0
+
+            while len(futures) > UNIT_WINDOW:
+                violations.extend(_collect_batches(*futures.popleft(), encoded, cache))
+
+        if chunk:
+            futures.append((chunk, _submit_batches(executor, chunk, literal_limit, source.encoding, encode)))
+
+        for work, future in futures:
+            violations.extend(_collect_batches(work, future, encoded, cache))
+
+        cache.store_batches(self.path, recorded)
+        if not encode:
+            return merge_violations(violations), terms, None
+
+        return merge_violations(violations), terms, encoded or [SegmentWriter().getvalue()]
+
+    def _evaluate_units(
+        self,
+        source: Source,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int,
+        executor: Executor,
+    ) -> list[RuleViolation]:
+        futures: deque[Future[list[RuleViolation]]] = deque()
+        violations: list[RuleViolation] = []
+        for offset, text in _group_batches(source.batches()):
+            futures.append(executor.submit(evaluate_unit, text, offset, rules, literal_limit, source.encoding))
+            while len(futures) > UNIT_WINDOW:
+                violations.extend(futures.popleft().result())
+
+        logger.debug(f"Evaluating {self.path} as work units")
+        for future in futures:
+            violations.extend(future.result())
+
+        return merge_violations(violations)
+
+
+def _batch_spans(source: Source) -> Iterator[tuple[int, int, str]]:
+    previous: None | tuple[int, str] = None
+    for offset, text in source.batches():
+        if previous is not None:
+            yield previous[0], offset, previous[1]
+
+        previous = offset, text
+
+    if previous is not None:
+        yield previous[0], len(source.buffer), previous[1]
+
+
+def _submit_batches(
+    executor: None | Executor, work: list[_BatchWork], literal_limit: int, encoding: str, encode: bool
+) -> Future[tuple[list[list[RuleViolation]], list[bytes]]]:
+    batches = [(offset, text, batch_rules) for offset, text, batch_rules, _ in work]
+    if executor:
+        return executor.submit(evaluate_batches, batches, literal_limit, encoding, encode)
+
+    future: Future[tuple[list[list[RuleViolation]], list[bytes]]] = Future()
+    future.set_result(evaluate_batches(batches, literal_limit, encoding, encode))
+    return future
+
+
+def _collect_batches(
+    work: list[_BatchWork],
+    future: Future[tuple[list[list[RuleViolation]], list[bytes]]],
+    encoded: list[bytes],
+    cache: Cache,
+) -> list[RuleViolation]:
+    results, segments = future.result()
+    encoded.extend(segments)
+    violations = []
+    for (offset, _, batch_rules, outcomes), found in zip(work, results):
+        cache.batches_parsed += 1
+        by_rule = {(x.rule, x.id): x for x in found}
+        for rule in batch_rules:
+            violation = by_rule.get((str(rule.rule), str(rule.id)))
+            if violation is None:
+                outcomes[rule_fingerprint(rule)] = None
+            else:
+                start = violation.offset or offset
+                outcomes[rule_fingerprint(rule)] = [start - offset, (violation.end or start) - offset]
+                violations.append(violation)
+
+    return violations
+
+
+def _group_batches(batches: Iterable[tuple[int, str]]) -> Iterator[tuple[int, str]]:
+    texts: list[str] = []
+    offset = size = 0
+    for batch_offset, text in batches:
+        if size >= UNIT_SIZE:
+            yield offset, "".join(texts)
+            texts, size = [], 0
+
+        if not texts:
+            offset = batch_offset
+
+        texts.append(text)
+        size += len(text)
+
+    if texts:
+        yield offset, "".join(texts)
+
+
+def check_statements(
+    statements: tuple[sqlparse.sql.Statement], rules: list[type[rules.BaseRule]]
+) -> list[RuleViolation]:
+    """Checks parsed statements against a list of rules.
+
+    Args:
+        statements (tuple[sqlparse.sql.Statement]): The parsed SQL statements.
+        rules (list[type[rules.BaseRule]]): A list of rule classes to be evaluated.
+
+    Returns:
+        list[RuleViolation]: The first violation of each rule.
+    """
+    violations = []
+    for rule in rules:
+        try:
+            rule().check(statements)
+        except RuleViolation as e:
+            violations.append(e)
+
+    return violations
+
+
+def parse_unit(
+    text: str,
+    offset: int,
+    literal_limit: int = DEFAULT_LITERAL_LIMIT,
+    encoding: str = "utf-8",
+) -> tuple[sqlparse.sql.Statement]:
+    """Parses a batch or a work unit of several batches.
+
+    Args:
+        text (str): The decoded SQL text of the work unit.
+        offset (int): The byte offset of the work unit in the source.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+        encoding (str): The encoding of the source, used for converting offsets.
+
+    Returns:
+        tuple[sqlparse.sql.Statement]: The parsed statements, annotated with byte offsets relative to the source.
+    """
+    statements = SQLParser.get_all_statements(text, literal_limit)
+    _to_byte_offsets(statements, text, offset, encoding)
+    return statements
+
+
+def parse_changed_unit(
+    text: str,
+    offset: int,
+    line: int,
+    lines: LineRanges,
+    literal_limit: int = DEFAULT_LITERAL_LIMIT,
+    encoding: str = "utf-8",
+) -> tuple[sqlparse.sql.Statement, ...]:
+    """Parses a batch like parse_unit and keeps only the statements overlapping changed lines.
+
+    Leading and trailing whitespace of a statement doesn't count towards its lines.
+
+    Args:
+        text (str): The decoded SQL text of the batch.
+        offset (int): The byte offset of the batch in the source.
+        line (int): The line number the batch starts on.
+        lines (LineRanges): The changed lines.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+        encoding (str): The encoding of the source, used for converting offsets.
+
+    Returns:
+        tuple[sqlparse.sql.Statement, ...]: The changed statements, annotated with byte offsets relative to the
+            source.
+    """
+    statements: list[sqlparse.sql.Statement] = list(SQLParser.get_all_statements(text, literal_limit))
+    ends = [*(statement.offset for statement in statements[1:]), len(text)]
+    changed = []
+    for statement, end in zip(statements, ends):
+        segment = text[statement.offset : end]
+        start = statement.offset + len(segment) - len(segment.lstrip())
+        stop = statement.offset + len(segment.rstrip())
+        first = line + text.count("\n", 0, start)
+        if start < stop and lines.overlaps(first, first + text.count("\n", start, stop)):
+            changed.append(statement)
+
+    _to_byte_offsets(changed, text, offset, encoding)
+    return tuple(changed)
+
+
+def _to_byte_offsets(statements: Iterable[sqlparse.sql.Statement], text: str, offset: int, encoding: str) -> None:
+    position = 0
+    for statement in statements:
+        offset += len(text[position : statement.offset].encode(encoding))
+        end = offset + len(text[statement.offset : statement.end].encode(encoding))
+        position = statement.end
+        statement.offset, statement.end = offset, end
+        offset = end
+
+
+def evaluate_unit(
+    text: str,
+    offset: int,
+    rules: list[type[rules.BaseRule]],
+    literal_limit: int = DEFAULT_LITERAL_LIMIT,
+    encoding: str = "utf-8",
+) -> list[RuleViolation]:
+    """Evaluates a batch or a work unit of several batches, possibly in a worker process.
+
+    Args:
+        text (str): The decoded SQL text of the work unit.
+        offset (int): The byte offset of the work unit in the source.
+        rules (list[type[rules.BaseRule]]): A list of rule classes to be evaluated.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+        encoding (str): The encoding of the source, used for converting offsets.
+
+    Returns:
+        list[RuleViolation]: The violations found, with byte offsets relative to the source.
+    """
+    return check_statements(parse_unit(text, offset, literal_limit, encoding), rules)
+
+
+def evaluate_batches(
+    batches: list[tuple[int, str, list[type[rules.BaseRule]]]],
+    literal_limit: int = DEFAULT_LITERAL_LIMIT,
+    encoding: str = "utf-8",
+    encode: bool = True,
+) -> tuple[list[list[RuleViolation]], list[bytes]]:
+    """Evaluates several batches against their own rules, possibly in a worker process.
+
+    Unlike evaluate_unit the violations are kept per batch, so they can be recorded by batch.
+
+    Args:
+        batches (list[tuple[int, str, list[type[rules.BaseRule]]]]): The byte offset, decoded text and the rules to
+            evaluate of each batch.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+        encoding (str): The encoding of the source, used for converting offsets.
+        encode (bool): Whether to encode the statements for the parse cache.
+
+    Returns:
+        tuple[list[list[RuleViolation]], list[bytes]]: The violations found in each batch, with byte offsets
+            relative to the source, and the encoded segments.
+    """
+    results = []
+    encoded = []
+    writer = SegmentWriter()
+    for offset, text, batch_rules in batches:
+        statements = parse_unit(text, offset, literal_limit, encoding)
+        results.append(check_statements(statements, batch_rules))
+        if encode:
+            writer.add(statements)
+            if len(writer) >= SEGMENT_TOKENS:
+                encoded.append(writer.getvalue())
+                writer = SegmentWriter()
+
+    if len(writer):
+        encoded.append(writer.getvalue())
+
+    return results, encoded
+
+
+def merge_violations(violations: Iterable[RuleViolation]) -> list[RuleViolation]:
+    """Merges the violations of several work units into a single result in source order.
+
+    Like an unsplit evaluation, only the first violation of each rule is kept.
+
+    Args:
+        violations (Iterable[RuleViolation]): The violations of all work units.
+
+    Returns:
+        list[RuleViolation]: The earliest violation of each rule, sorted by offset.
+    """
+    first: dict[tuple[str, str], RuleViolation] = {}
+    for violation in violations:
+        current = first.get((violation.rule, violation.id))
+        if current is None or (violation.offset or 0) < (current.offset or 0):
+            first[(violation.rule, violation.id)] = violation
+
+    return sorted(first.values(), key=lambda violation: violation.offset or 0)
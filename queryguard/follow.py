@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import codecs
+import json
+import logging
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+import click
+
+from queryguard.cache import write_atomic
+from queryguard.logs import GO_LINE, SNIFF_SIZE, Record, detect_format
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("lines", "go")
+READ_SIZE = 1 << 20
+HEAD_SIZE = 64
+BATCH_RECORDS = 4096
+COMPRESSED = (".gz", ".bz2", ".xz", ".zst", ".zip")
+CHECKPOINT_VERSION = 1
+
+# The device and inode of a file, which stay the same when a log is rotated by renaming it.
+_Identity = tuple[int, int]
+
+
+class _Tail:
+    """A followed file and the position after its last record."""
+
+    def __init__(self, path: Path, stream: IO[bytes], offset: int = 0, line: int = 1) -> None:
+        self.path = path
+        self.stream = stream
+        self.offset = offset
+        self.line = line
+        self.size = 0
+        self.mtime = 0
+        self.gone = False
+        stream.seek(0)
+        self.head = stream.read(HEAD_SIZE)
+
+
+class Follower:
+    """Follows a log file, or the files in a directory of rotating logs, as they are appended to.
+
+    Files are told apart by device and inode, so a log that is rotated by renaming it is read to its end under its
+    new name before the records of the file replacing it. A file that shrinks below the position read so far was
+    truncated and is read again from its start. Records are only returned once they are complete, a line ended by a
+    line break or a batch ended by a GO line, and positions only move past returned records. The positions can be
+    saved in a checkpoint, so a restart continues after the last record that was committed.
+
+    Attributes:
+        path (Path): The followed file or directory.
+        format (str): "lines" or "go".
+        checkpoint (None | Path): Where positions are saved.
+        records (int): The number of records read.
+        rotations (int): The number of files that were rotated away and read to their end.
+        truncations (int): The number of times a file was truncated.
+    """
+
+    def __init__(self, path: Path, format: str, checkpoint: None | Path = None) -> None:
+        """Initializes the Follower class and restores the positions saved in the checkpoint.
+
+        Args:
+            path (Path): The file or directory to follow.
+            format (str): "lines" or "go".
+            checkpoint (None | Path): Where positions are saved, None to not save them.
+
+        Raises:
+            click.ClickException: If the format can't be followed or the checkpoint can't be read.
+        """
+        if format not in FORMATS:
+            raise click.ClickException(f"Only logs in the formats {', '.join(FORMATS)} can be followed, not {format}")
+
+        self.path = path
+        self.format = format
+        self.checkpoint = checkpoint
+        self.records = 0
+        self.rotations = 0
+        self.truncations = 0
+        self._tails: dict[_Identity, _Tail] = {}
+        self._saved: dict[_Identity, dict[str, int | str]] = {}
+        if checkpoint and checkpoint.exists():
+            try:
+                data = json.loads(checkpoint.read_bytes())
+                if data.get("version") == CHECKPOINT_VERSION:
+                    self._saved = {(x["device"], x["inode"]): x for x in data["files"]}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise click.ClickException(f"Unable to read checkpoint {checkpoint}: {e}") from e
+
+    def __repr__(self) -> str:
+        return f"Follower({self.path}, files={len(self._tails)}, records={self.records})"
+
+    def __enter__(self) -> Follower:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    @property
+    def files(self) -> int:
+        """The number of files followed."""
+        return len(self._tails)
+
+    @property
+    def lag(self) -> int:
+        """The number of bytes written to the followed files that weren't read yet, as of the last poll."""
+        return sum(max(tail.size - tail.offset, 0) for tail in self._tails.values())
+
+    def poll(self, limit: int = BATCH_RECORDS) -> list[Record]:
+        """Reads the records that were completed since the last poll.
+
+        Args:
+            limit (int): The most records to read. More records are read by the next poll.
+
+        Returns:
+            list[Record]: The records, oldest file first.
+        """
+        self._refresh()
+        records: list[Record] = []
+        for identity, tail in sorted(self._tails.items(), key=lambda x: (not x[1].gone, x[1].mtime, x[1].path)):
+            records.extend(self._read(tail, limit - len(records)))
+            if len(records) >= limit:
+                break
+
+            if tail.gone:
+                logger.debug(f"Finished {tail.path}")
+                tail.stream.close()
+                del self._tails[identity]
+
+        self.records += len(records)
+        return records
+
+    def commit(self) -> None:
+        """Saves the positions after the records returned so far in the checkpoint.
+
+        Returns:
+            None
+        """
+        if not self.checkpoint:
+            return
+
+        files = [
+            {
+                "device": identity[0],
+                "inode": identity[1],
+                "path": str(tail.path),
+                "offset": tail.offset,
+                "line": tail.line,
+                "head": tail.head.hex(),
+            }
+            for identity, tail in self._tails.items()
+        ]
+        self.checkpoint.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.checkpoint, json.dumps({"version": CHECKPOINT_VERSION, "files": files}).encode())
+
+    def close(self) -> None:
+        """Closes the followed files.
+
+        Returns:
+            None
+        """
+        for tail in self._tails.values():
+            tail.stream.close()
+
+        self._tails.clear()
+
+    def _refresh(self) -> None:
+        if self.path.is_dir():
+            # Hidden files and rotated logs that were compressed are skipped.
+            candidates = [
+                path
+                for path in self.path.iterdir()
+                if not path.name.startswith(".") and not path.name.lower().endswith(COMPRESSED)
+            ]
+        else:
+            candidates = [self.path]
+
+        seen = set()
+        for path in candidates:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+
+            if not path.is_file():
+                continue
+
+            identity = (stat.st_dev, stat.st_ino)
+            seen.add(identity)
+            tail = self._tails.get(identity) or self._open(path, identity)
+            if tail is None:
+                continue
+
+            tail.path = path
+            tail.size = stat.st_size
+            tail.mtime = stat.st_mtime_ns
+            if stat.st_size < tail.offset:
+                logger.warning(f"{path} was truncated, reading it from the start")
+                self.truncations += 1
+                tail.offset, tail.line = 0, 1
+
+            if len(tail.head) < HEAD_SIZE and stat.st_size > len(tail.head):
+                tail.stream.seek(0)
+                tail.head = tail.stream.read(HEAD_SIZE)
+
+        for identity, tail in self._tails.items():
+            if identity not in seen and not tail.gone:
+                logger.debug(f"{tail.path} was rotated away, reading it to its end")
+                self.rotations += 1
+                tail.gone = True
+                tail.size = os.fstat(tail.stream.fileno()).st_size
+
+    def _open(self, path: Path, identity: _Identity) -> None | _Tail:
+        try:
+            stream = path.open("rb")
+        except OSError as e:
+            logger.warning(f"Unable to follow {path}: {e.strerror}")
+            return None
+
+        tail = _Tail(path, stream)
+        saved = self._saved.pop(identity, None)
+        if saved and tail.head.startswith(bytes.fromhex(str(saved["head"]))):
+            tail.offset, tail.line = int(saved["offset"]), int(saved["line"])
+            logger.debug(f"Continuing {path} at byte {tail.offset}")
+
+        self._tails[identity] = tail
+        return tail
+
+    def _read(self, tail: _Tail, limit: int) -> list[Record]:
+        records: list[Record] = []
+        size = READ_SIZE
+        while len(records) < limit:
+            tail.stream.seek(tail.offset)
+            data = tail.stream.read(size)
+            if not data:
+                break
+
+            consumed = 0
+            for record, end, line in self._split(data, tail, final=tail.gone and len(data) < size):
+                if record is not None:
+                    records.append(record)
+
+                consumed, tail.line = end, line
+                if len(records) >= limit:
+                    break
+
+            tail.offset += consumed
+            if consumed:
+                size = READ_SIZE
+            elif len(data) == size:
+                # A record longer than what was read, read more of it.
+                size *= 2
+            else:
+                break
+
+        return records
+
+    def _split(self, data: bytes, tail: _Tail, final: bool) -> Iterator[tuple[None | Record, int, int]]:
+        """Splits data into complete records, with the offset and the line number after each."""
+        skip = len(codecs.BOM_UTF8) if tail.offset == 0 and data.startswith(codecs.BOM_UTF8) else 0
+        position = skip
+        line = tail.line
+        batch: list[str] = []
+        start = 0
+        while True:
+            end = data.find(b"\n", position) + 1
+            if not end:
+                if final and position < len(data):
+                    end = len(data)
+                else:
+                    break
+
+            text = data[position:end].decode("utf-8", "replace")
+            position = end
+            line += 1
+            if self.format == "lines":
+                is_record = bool(text.strip()) and not GO_LINE.match(text)
+                yield Record(text, str(tail.path), line - 1) if is_record else None, end, line
+            elif GO_LINE.match(text):
+                yield Record("".join(batch), str(tail.path), start) if start else None, end, line
+                batch, start = [], 0
+            elif start or text.strip():
+                batch.append(text)
+                start = start or line - 1
+
+        if final and start:
+            yield Record("".join(batch), str(tail.path), start), len(data), line
+
+
+def detect_follow_format(path: Path) -> str:
+    """Detects the format of a followed log from its beginning, or from the beginning of a file in a directory.
+
+    Args:
+        path (Path): The followed file or directory.
+
+    Returns:
+        str: The format, "lines" unless the log contains GO lines or is in another format.
+    """
+    if path.is_dir():
+        files = sorted(x for x in path.iterdir() if x.is_file() and not x.name.lower().endswith(COMPRESSED))
+    else:
+        files = [path]
+
+    for file in files:
+        try:
+            with file.open("rb") as f:
+                head = f.read(SNIFF_SIZE)
+        except OSError:
+            continue
+
+        if head.strip():
+            return detect_format(head, file.name)
+
+    return "lines"
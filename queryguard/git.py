@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import logging
+import subprocess
+from collections.abc import Iterable
+from pathlib import Path
+from types import TracebackType
+
+import click
+
+from queryguard.diff import LineRanges, parse_unified_diff, select_changed
+
+logger = logging.getLogger(__name__)
+
+DIFF_FILTER = "ACMRT"
+INDEX = ":"
+
+
+def run_git(arguments: list[str], directory: Path, data: None | bytes = None) -> bytes:
+    """Runs a git command.
+
+    Args:
+        arguments (list[str]): The git arguments.
+        directory (Path): The directory to run git in.
+        data (None | bytes): The standard input of the command.
+
+    Returns:
+        bytes: The standard output of the command.
+
+    Raises:
+        click.ClickException: If git isn't installed or the command fails.
+    """
+    logger.debug(f"Running git {' '.join(arguments)} in {directory}")
+    try:
+        result = subprocess.run(
+            ["git", *arguments],  # noqa: S603, S607
+            cwd=directory,
+            input=data,
+            capture_output=True,
+            check=True,
+        )
+    except FileNotFoundError as e:
+        raise click.ClickException("git is not installed") from e
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode(errors="replace").strip()
+        raise click.ClickException(f"git {' '.join(arguments)} failed: {message}") from e
+
+    return result.stdout
+
+
+def get_base(ref: str, directory: Path) -> str:
+    """Finds the commit to compare with, the merge base of the ref and HEAD.
+
+    Shallow clones often lack the merge base, in which case the ref itself is compared with.
+
+    Args:
+        ref (str): The git ref, e.g. a branch name or a commit hash.
+        directory (Path): A directory in the repository.
+
+    Returns:
+        str: The commit hash.
+    """
+    try:
+        return run_git(["merge-base", ref, "HEAD"], directory).decode().strip()
+    except click.ClickException as e:
+        logger.debug(f"No merge base of {ref} and HEAD, comparing with {ref} itself: {e.message}")
+        return run_git(["rev-parse", "--verify", f"{ref}^{{commit}}"], directory).decode().strip()
+
+
+def get_changed_paths(path: Path, ref: str, uncommitted: bool = False) -> list[Path]:
+    """Lists the SQL files below a path that were added or modified since a git ref.
+
+    Renamed files are reported by their new path, and deleted files aren't reported.
+
+    Args:
+        path (Path): The path to a file or directory in a git repository.
+        ref (str): The git ref to compare with.
+        uncommitted (bool): Whether to include staged and unstaged changes and untracked files.
+
+    Returns:
+        list[Path]: The changed files, relative to the path like the files get_files lists.
+    """
+    top, base = _get_top_and_base(path, ref)
+    diff = ["diff", "--name-only", "-z", "--no-ext-diff", "--find-renames", f"--diff-filter={DIFF_FILTER}", base]
+    names = _split(run_git(diff if uncommitted else [*diff, "HEAD"], top))
+    if uncommitted:
+        names |= _get_untracked(top)
+
+    paths = list(select_changed(path, top, dict.fromkeys(names)))
+    logger.debug(f"{len(paths)} of {len(names)} files changed since {ref} are SQL files in {path}")
+    return paths
+
+
+def get_changed_lines(path: Path, ref: str, uncommitted: bool = False) -> dict[Path, None | LineRanges]:
+    """Finds the lines of the SQL files below a path that were added or modified since a git ref.
+
+    Args:
+        path (Path): The path to a file or directory in a git repository.
+        ref (str): The git ref to compare with.
+        uncommitted (bool): Whether to include staged and unstaged changes and untracked files.
+
+    Returns:
+        dict[Path, None | LineRanges]: The changed lines by file, relative to the path like the files get_files
+            lists. Untracked files are entirely new and have None instead.
+    """
+    top, base = _get_top_and_base(path, ref)
+    diff = [
+        "-c",
+        "core.quotepath=false",
+        "diff",
+        "--unified=0",
+        "--no-color",
+        "--no-ext-diff",
+        "--find-renames",
+        f"--diff-filter={DIFF_FILTER}",
+        base,
+    ]
+    output = run_git(diff if uncommitted else [*diff, "HEAD"], top)
+    changes: dict[str, None | LineRanges] = dict(parse_unified_diff(output.decode("utf-8", "surrogateescape")))
+    if uncommitted:
+        changes.update(dict.fromkeys(_get_untracked(top)))
+
+    lines = select_changed(path, top, changes)
+    logger.debug(f"{len(lines)} of {len(changes)} files changed since {ref} are SQL files in {path}")
+    return lines
+
+
+def get_top(path: Path) -> Path:
+    """Finds the top-level directory of the git repository containing a path.
+
+    Args:
+        path (Path): The path to a file or directory in a git repository. It doesn't have to exist in the working
+            tree.
+
+    Returns:
+        Path: The top-level directory.
+    """
+    directory = path if path.is_dir() else path.parent
+    while not directory.is_dir() and directory != directory.parent:
+        directory = directory.parent
+
+    return Path(run_git(["rev-parse", "--show-toplevel"], directory).decode().strip())
+
+
+def list_blobs(path: Path, revision: str) -> list[tuple[str, str]]:
+    """Lists the SQL files below a path in a revision, or in the index, without checking them out.
+
+    Args:
+        path (Path): The path to a file or directory in a git repository. It doesn't have to exist in the working
+            tree.
+        revision (str): A tree-ish such as a tag or commit, or INDEX for the staged files.
+
+    Returns:
+        list[tuple[str, str]]: The file name relative to the top-level directory and the blob id of each file, in
+            file name order.
+    """
+    top = get_top(path)
+    prefix = path.resolve().relative_to(top.resolve()).as_posix()
+    pathspec = [] if prefix == "." else ["--", prefix]
+    blobs = []
+    if revision == INDEX:
+        for entry in _split(run_git(["ls-files", "--stage", "-z", *pathspec], top)):
+            info, name = entry.split("\t", 1)
+            _, oid, stage = info.split()
+            if stage == "0" and name.endswith(".sql"):
+                blobs.append((name, oid))
+    else:
+        for entry in _split(run_git(["ls-tree", "-r", "-z", "--full-tree", revision, *pathspec], top)):
+            info, name = entry.split("\t", 1)
+            _, kind, oid = info.split()
+            if kind == "blob" and name.endswith(".sql"):
+                blobs.append((name, oid))
+
+    logger.debug(f"{len(blobs)} SQL files in {path} at {revision}")
+    return sorted(blobs)
+
+
+def get_blob_sizes(directory: Path, oids: Iterable[str]) -> dict[str, int]:
+    """Looks up the sizes of blobs without reading them, through a single git cat-file --batch-check.
+
+    Args:
+        directory (Path): A directory in the repository.
+        oids (Iterable[str]): The blob ids.
+
+    Returns:
+        dict[str, int]: The size in bytes of each blob that exists, by blob id.
+    """
+    request = "".join(f"{oid}\n" for oid in oids).encode()
+    sizes = {}
+    for line in run_git(["cat-file", "--batch-check"], directory, request).decode().splitlines():
+        fields = line.split()
+        if len(fields) == 3 and fields[1] == "blob":
+            sizes[fields[0]] = int(fields[2])
+
+    return sizes
+
+
+class CatFile:
+    """Reads blobs from the object database through a single long-running git cat-file --batch process.
+
+    Attributes:
+        directory (Path): The directory in the repository git runs in.
+        reads (int): The number of blobs read.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        """Initializes the CatFile class and starts git.
+
+        Args:
+            directory (Path): A directory in the repository.
+
+        Raises:
+            click.ClickException: If git isn't installed.
+        """
+        self.directory = directory
+        self.reads = 0
+        try:
+            self._process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],  # noqa: S603, S607
+                cwd=directory,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except FileNotFoundError as e:
+            raise click.ClickException("git is not installed") from e
+
+    def __repr__(self) -> str:
+        return f"CatFile(directory={self.directory}, reads={self.reads})"
+
+    def __enter__(self) -> CatFile:
+        return self
+
+    def __exit__(
+        self, exc_type: None | type[BaseException], exc_value: None | BaseException, traceback: None | TracebackType
+    ) -> None:
+        self.close()
+
+    def read(self, oid: str) -> bytes:
+        """Reads the contents of a blob.
+
+        Args:
+            oid (str): The blob id.
+
+        Returns:
+            bytes: The contents.
+
+        Raises:
+            click.ClickException: If the blob doesn't exist or git stopped.
+        """
+        stdin, stdout = self._process.stdin, self._process.stdout
+        if stdin is None or stdout is None:  # pragma: no cover
+            raise click.ClickException("git cat-file isn't running")
+
+        try:
+            stdin.write(f"{oid}\n".encode())
+            stdin.flush()
+        except OSError as e:
+            raise click.ClickException(f"git cat-file stopped: {e}") from e
+
+        header = stdout.readline().split()
+        if len(header) != 3 or header[1] != b"blob":
+            raise click.ClickException(f"Unable to read git blob {oid}: {b' '.join(header).decode(errors='replace')}")
+
+        data = stdout.read(int(header[2]))
+        stdout.read(1)
+        self.reads += 1
+        return data
+
+    def close(self) -> None:
+        """Stops git.
+
+        Returns:
+            None
+        """
+        if self._process.stdin:
+            self._process.stdin.close()
+
+        if self._process.stdout:
+            self._process.stdout.close()
+
+        self._process.wait()
+
+
+def _get_top_and_base(path: Path, ref: str) -> tuple[Path, str]:
+    top = get_top(path)
+    return top, get_base(ref, top)
+
+
+def _get_untracked(top: Path) -> set[str]:
+    return _split(run_git(["ls-files", "-z", "--others", "--exclude-standard"], top))
+
+
+def _split(output: bytes) -> set[str]:
+    return {name for name in output.decode("utf-8", "surrogateescape").split("\0") if name}
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import IO, Any
+
+from queryguard.cache import write_atomic
+from queryguard.files import File
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = 1.0
+
+
+class Journal:
+    """A log of the files a run has finished, so an interrupted run can be resumed.
+
+    The journal is a JSON lines file. The first line identifies the run by a fingerprint of its inputs, rules and
+    settings, and each further line holds the verdict of one file together with the size and modification time it
+    had. A verdict is only restored when the fingerprint and the file are unchanged. Lines are flushed as they are
+    written and synced to disk at most once per SYNC_INTERVAL seconds, so an interrupted run loses at most the
+    files of the last interval.
+
+    Attributes:
+        path (Path): The path to the journal.
+        fingerprint (str): Identifies the inputs, rules and settings of the run.
+        keep (bool): Whether the journal is kept once the run is complete.
+        restored (int): The number of verdicts restored from the journal.
+    """
+
+    def __init__(self, path: Path, fingerprint: str, keep: bool = True) -> None:
+        """Initializes the Journal class.
+
+        Args:
+            path (Path): The path to the journal.
+            fingerprint (str): Identifies the inputs, rules and settings of the run.
+            keep (bool): Whether the journal is kept once the run is complete. Defaults to True.
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self.keep = keep
+        self.restored = 0
+        self._file: None | IO[str] = None
+        self._synced = 0.0
+
+    def __repr__(self) -> str:
+        return f"Journal({self.path})"
+
+    def start(self, files: list[File], resume: bool = False) -> None:
+        """Starts the journal, restoring the verdicts of files that a previous run finished when resuming.
+
+        A journal that can't be written is logged and disabled, the run goes on without it.
+
+        Args:
+            files (list[File]): The files that still have to be evaluated.
+            resume (bool): Whether to restore verdicts from the journal. Otherwise the journal is started over.
+
+        Returns:
+            None
+        """
+        lines = [json.dumps({"fingerprint": self.fingerprint})]
+        if resume:
+            lines.extend(self._restore(files))
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(self.path, "".join(f"{line}\n" for line in lines).encode())
+            self._file = self.path.open("a", encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Unable to write journal {self.path}: {e}")
+
+        logger.debug(f"Journal {self.path}: {self.restored} verdicts restored")
+
+    def record(self, file: File) -> None:
+        """Appends the verdict of an evaluated file.
+
+        Args:
+            file (File): The evaluated file.
+
+        Returns:
+            None
+        """
+        if not self._file:
+            return
+
+        try:
+            self._file.write(json.dumps({"file": file.to_dict(), "stat": _get_stat(file.path)}) + "\n")
+            self._file.flush()
+            if time.monotonic() - self._synced >= SYNC_INTERVAL:
+                os.fsync(self._file.fileno())
+                self._synced = time.monotonic()
+        except OSError as e:
+            logger.warning(f"Unable to write journal {self.path}: {e}")
+            self.close()
+
+    def close(self, complete: bool = False) -> None:
+        """Syncs and closes the journal.
+
+        Args:
+            complete (bool): Whether the run is complete, in which case a journal that isn't kept is removed.
+
+        Returns:
+            None
+        """
+        if self._file:
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+            except OSError as e:
+                logger.debug(f"Unable to close journal {self.path}: {e}")
+
+            self._file = None
+
+        if complete and not self.keep:
+            try:
+                self.path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.debug(f"Unable to remove journal {self.path}: {e}")
+
+    def _restore(self, files: list[File]) -> list[str]:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("fingerprint") != self.fingerprint:
+                    logger.debug(f"Not resuming from journal {self.path}, the inputs, rules or settings changed")
+                    return []
+
+                entries: dict[str, tuple[str, dict[str, Any]]] = {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # the last line of an interrupted run may be cut off
+
+                    entries[entry["file"]["path"]] = (line.rstrip("\n"), entry)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Unable to read journal {self.path}: {e}")
+            return []
+
+        lines = []
+        for file in files:
+            line, entry = entries.get(str(file.path), ("", {}))
+            if entry and entry["stat"] == _get_stat(file.path):
+                restored = File.from_dict(entry["file"])
+                file.status, file.reason, file.violations = restored.status, restored.reason, restored.violations
+                lines.append(line)
+
+        self.restored = len(lines)
+        return lines
+
+
+def _get_stat(path: Path) -> None | list[int]:
+    try:
+        stat = path.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return None
@@ -0,0 +1,554 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import logging
+import re
+import sys
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, Future
+from itertools import islice
+from typing import IO, Any
+
+import click
+
+from queryguard import rules
+from queryguard.cache import find_text_terms
+from queryguard.exceptions import RuleViolation
+from queryguard.files import UNIT_WINDOW, check_statements
+from queryguard.parser import DEFAULT_LITERAL_LIMIT, ElidedQuery, SQLParser
+from queryguard.verdicts import Verdict, VerdictStore, get_shape, get_verdict, get_violations
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("auto", "xml", "csv", "lines", "go")
+CHUNK_SIZE = 256
+SNIFF_SIZE = 4096
+GO_LINE = re.compile(r"^\s*GO(?:\s+\d+)?\s*(?:--.*)?$", re.IGNORECASE)
+
+# The names of the fields a record is taken from, in order of preference and in lower case. Extended Events name
+# them in their data and action elements, Profiler in its columns and CSV exports in their header.
+FIELDS = {
+    "text": ("batch_text", "statement", "sql_text", "textdata", "query_sql_text", "query_text", "text"),
+    "time": ("timestamp", "starttime", "start_time", "event_time", "last_execution_time", "time"),
+    "login": ("server_principal_name", "session_server_principal_name", "username", "loginname", "login_name"),
+    "host": ("client_hostname", "hostname", "host_name"),
+    "database": ("database_name", "databasename", "db_name"),
+}
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+# The indexes of the rules to check a text against, and the text.
+_Work = tuple[list[int], str]
+
+
+class Record:
+    """A statement or batch captured in a query log, with where and when it ran.
+
+    Attributes:
+        text (str): The SQL text.
+        source (str): The log the record was read from.
+        position (int): The number of the record in the log, or the line it starts on in plain text logs.
+        time (None | str): When the statement ran, as written in the log.
+        login (None | str): The login that ran the statement.
+        host (None | str): The host the statement was sent from.
+        database (None | str): The database the statement ran in.
+    """
+
+    __slots__ = ("text", "source", "position", "time", "login", "host", "database")
+
+    def __init__(
+        self,
+        text: str,
+        source: str,
+        position: int,
+        time: None | str = None,
+        login: None | str = None,
+        host: None | str = None,
+        database: None | str = None,
+    ) -> None:
+        """Initializes the Record class.
+
+        Args:
+            text (str): The SQL text.
+            source (str): The log the record was read from.
+            position (int): The number of the record in the log, or the line it starts on in plain text logs.
+            time (None | str): When the statement ran, as written in the log.
+            login (None | str): The login that ran the statement.
+            host (None | str): The host the statement was sent from.
+            database (None | str): The database the statement ran in.
+        """
+        self.text = text
+        self.source = source
+        self.position = position
+        self.time = time
+        self.login = login
+        self.host = host
+        self.database = database
+
+    def __repr__(self) -> str:
+        return f"Record({self.source}:{self.position})"
+
+    def metadata(self) -> dict[str, str]:
+        """The source metadata that is known.
+
+        Returns:
+            dict[str, str]: The time, login, host and database, where they are known.
+        """
+        return {name: getattr(self, name) for name in ("time", "login", "host", "database") if getattr(self, name)}
+
+    def to_dict(self, violations: list[RuleViolation]) -> dict[str, Any]:
+        """Converts the record and its violations to a JSON-serializable dictionary.
+
+        Args:
+            violations (list[RuleViolation]): The violations found in the record.
+
+        Returns:
+            dict[str, Any]: The record without its text, and the violations.
+        """
+        return {"source": self.source, "position": self.position, **self.metadata(), "violations": violations}
+
+
+# A chunk of records, the rules selected for each, the fingerprint and shape of each record looked up in a verdict
+# store, the verdicts found in the store and the results of checking the selected texts or the missing shapes.
+_Chunk = tuple[
+    list[Record], list[_Work], dict[int, tuple[bytes, ElidedQuery]], dict[bytes, Verdict], "None | Future[list[Any]]"
+]
+
+
+class LogChecker:
+    """Checks the records of query logs against rules, one record at a time.
+
+    Only the rules whose trigger terms occur in a record are evaluated, and records without any are not parsed at all,
+    which is the case for most statements of a production workload. With a verdict store, the other records are
+    reduced to their shape and only shapes without a stored verdict are parsed, once per chunk of records. Records
+    can be checked in worker processes, a bounded number of chunks at a time, so memory doesn't grow with the size
+    of the logs.
+
+    Attributes:
+        rules (list[type[rules.BaseRule]]): The rule classes to evaluate.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+        store (None | VerdictStore): The verdicts of shapes checked before.
+        records (int): The number of records checked.
+        parsed (int): The number of records or shapes parsed.
+        reused (int): The number of records whose violations were taken from the verdict store.
+        failed (int): The number of records with violations.
+        counts (Counter[str]): The number of violations by rule id.
+    """
+
+    def __init__(
+        self,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int = DEFAULT_LITERAL_LIMIT,
+        store: None | VerdictStore = None,
+    ) -> None:
+        """Initializes the LogChecker class.
+
+        Args:
+            rules (list[type[rules.BaseRule]]): The rule classes to evaluate.
+            literal_limit (int): The longest string literal that is lexed verbatim.
+            store (None | VerdictStore): The verdicts of shapes checked before, for the same rules.
+        """
+        self.rules = rules
+        self.literal_limit = literal_limit
+        self.store = store
+        self.records = 0
+        self.parsed = 0
+        self.reused = 0
+        self.failed = 0
+        self.counts: Counter[str] = Counter()
+        self._triggers = [{term.upper() for term in rule.triggers} for rule in rules]
+        self._vocabulary = set().union(*self._triggers)
+
+    def __repr__(self) -> str:
+        return f"LogChecker(records={self.records}, parsed={self.parsed}, failed={self.failed})"
+
+    def check(
+        self, records: Iterable[Record], executor: None | Executor = None
+    ) -> Iterator[tuple[Record, list[RuleViolation]]]:
+        """Checks records, in the order they are given.
+
+        Args:
+            records (Iterable[Record]): The records.
+            executor (None | Executor): When given, chunks of records are checked on the executor.
+
+        Returns:
+            Iterator[tuple[Record, list[RuleViolation]]]: Each record with the violations found in it.
+        """
+        if executor is None and self.store is None:
+            for record in records:
+                work = self.select(record.text)
+                self.parsed += bool(work[0])
+                violations = check_texts([work], self.rules, self.literal_limit)[0] if work[0] else []
+                yield record, self._count(violations)
+
+            return
+
+        window: deque[_Chunk] = deque()
+        iterator = iter(records)
+        while chunk := list(islice(iterator, CHUNK_SIZE)):
+            window.append(self._submit(chunk, executor))
+            if len(window) >= UNIT_WINDOW:
+                yield from self._collect(*window.popleft())
+
+        while window:
+            yield from self._collect(*window.popleft())
+
+    def select(self, text: str) -> _Work:
+        """Selects the rules a text can violate by their trigger terms.
+
+        Args:
+            text (str): The SQL text.
+
+        Returns:
+            _Work: The indexes of the rules to check and the text.
+        """
+        self.records += 1
+        return self._get_indexes(text), text
+
+    def _submit(self, chunk: list[Record], executor: None | Executor) -> _Chunk:
+        works = [self.select(record.text) for record in chunk]
+        shapes: dict[int, tuple[bytes, ElidedQuery]] = {}
+        found: dict[bytes, Verdict] = {}
+        if self.store is None:
+            pending = [work for work in works if work[0]]
+            function: Any = check_texts
+        else:
+            shapes = {index: get_shape(work[1]) for index, work in enumerate(works) if work[0]}
+            found = self.store.get(fingerprint for fingerprint, _ in shapes.values())
+            missing = {fingerprint: shape.text for fingerprint, shape in shapes.values() if fingerprint not in found}
+            self.reused += sum(fingerprint in found for fingerprint, _ in shapes.values())
+            # Shapes missing from the store are checked once per chunk, against the rules their own terms select.
+            pending = [(self._get_indexes(text), text) for text in missing.values()]
+            function = check_shapes
+
+        self.parsed += sum(bool(indexes) for indexes, _ in pending)
+        future: None | Future[list[Any]] = None
+        if pending and executor is not None:
+            future = executor.submit(function, pending, self.rules, self.literal_limit)
+        elif pending:
+            future = Future()
+            future.set_result(function(pending, self.rules, self.literal_limit))
+
+        return chunk, works, shapes, found, future
+
+    def _collect(
+        self,
+        chunk: list[Record],
+        works: list[_Work],
+        shapes: dict[int, tuple[bytes, ElidedQuery]],
+        found: dict[bytes, Verdict],
+        future: None | Future[list[Any]],
+    ) -> Iterator[tuple[Record, list[RuleViolation]]]:
+        if self.store is None:
+            results = iter(future.result() if future else [])
+            for record, work in zip(chunk, works):
+                yield record, self._count(next(results) if work[0] else [])
+
+            return
+
+        missing = [x for x in dict.fromkeys(fingerprint for fingerprint, _ in shapes.values()) if x not in found]
+        checked = dict(zip(missing, future.result() if future else []))
+        if checked:
+            self.store.put(checked)
+
+        verdicts = {**found, **checked}
+        for index, record in enumerate(chunk):
+            if index in shapes:
+                fingerprint, shape = shapes[index]
+                yield record, self._count(get_violations(verdicts[fingerprint], record.text, shape))
+            else:
+                yield record, self._count([])
+
+    def _get_indexes(self, text: str) -> list[int]:
+        terms = find_text_terms(text, self._vocabulary)
+        return [index for index, triggers in enumerate(self._triggers) if not triggers or triggers & terms]
+
+    def _count(self, violations: list[RuleViolation]) -> list[RuleViolation]:
+        if violations:
+            self.failed += 1
+            self.counts.update(violation.id for violation in violations)
+
+        return violations
+
+
+def check_texts(
+    works: list[_Work], rules: list[type[rules.BaseRule]], literal_limit: int = DEFAULT_LITERAL_LIMIT
+) -> list[list[RuleViolation]]:
+    """Checks texts against some of the rules each, possibly in a worker process.
+
+    Args:
+        works (list[_Work]): The indexes of the rules to check each text against, and the text.
+        rules (list[type[rules.BaseRule]]): The rule classes the indexes refer to.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+
+    Returns:
+        list[list[RuleViolation]]: The violations found in each text.
+    """
+    return [
+        check_statements(SQLParser.get_all_statements(text, literal_limit), [rules[index] for index in indexes])
+        for indexes, text in works
+    ]
+
+
+def check_shapes(
+    works: list[_Work], rules: list[type[rules.BaseRule]], literal_limit: int = DEFAULT_LITERAL_LIMIT
+) -> list[Verdict]:
+    """Checks the shapes of texts against some of the rules each, possibly in a worker process.
+
+    Args:
+        works (list[_Work]): The indexes of the rules to check each shape against, and the shape.
+        rules (list[type[rules.BaseRule]]): The rule classes the indexes refer to.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+
+    Returns:
+        list[Verdict]: The verdict of each shape.
+    """
+    return [
+        get_verdict(shape, [rules[index] for index in indexes], literal_limit) if indexes else ()
+        for indexes, shape in works
+    ]
+
+
+def open_log(path: str) -> IO[bytes]:
+    """Opens a query log for reading.
+
+    Args:
+        path (str): The path to the log, or "-" for standard input.
+
+    Returns:
+        IO[bytes]: The log, buffered so its beginning can be peeked at.
+
+    Raises:
+        click.ClickException: If the log can't be opened.
+    """
+    if path == "-":
+        stream: IO[bytes] = click.get_binary_stream("stdin")
+        return stream if hasattr(stream, "peek") else io.BufferedReader(stream)  # type: ignore[arg-type]
+
+    try:
+        return open(path, "rb")  # noqa: SIM115
+    except OSError as e:
+        raise click.ClickException(f"Unable to read log {path}: {e.strerror}") from e
+
+
+def read_log(stream: IO[bytes], source: str, format: str = "auto") -> Iterator[Record]:
+    """Reads the records of a query log, one at a time.
+
+    Args:
+        stream (IO[bytes]): The log.
+        source (str): The name of the log, to tell where records come from.
+        format (str): One of FORMATS. "auto" detects the format from the beginning of the log.
+
+    Returns:
+        Iterator[Record]: The records, with the text and metadata found in the log.
+
+    Raises:
+        click.ClickException: If the format isn't known or the log isn't well-formed.
+    """
+    if format == "auto":
+        format = detect_format(stream.peek(SNIFF_SIZE)[:SNIFF_SIZE], source)  # type: ignore[attr-defined]
+        logger.debug(f"Reading {source} as {format}")
+
+    if format == "xml":
+        return read_xml(stream, source)
+
+    if format in ("csv", "lines", "go"):
+        reader = {"csv": read_csv, "lines": read_lines, "go": read_batches}[format]
+        return reader(decode_log(stream), source)
+
+    raise click.ClickException(f"Unknown log format {format}, expected one of {', '.join(FORMATS)}")
+
+
+def detect_format(head: bytes, source: str) -> str:
+    """Detects the format of a query log.
+
+    Args:
+        head (bytes): The beginning of the log.
+        source (str): The name of the log.
+
+    Returns:
+        str: The format, one of FORMATS except "auto".
+    """
+    for bom, encoding in ((codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")):
+        if head.startswith(bom):
+            head = head[len(bom) :].decode(encoding, "ignore").encode()
+
+    text = head.decode("utf-8", "ignore").lstrip("\ufeff \t\r\n")
+    lower = source.lower()
+    if text.startswith("<") or lower.endswith(".xml"):
+        return "xml"
+
+    if lower.endswith(".csv"):
+        return "csv"
+
+    header = text.partition("\n")[0].lower()
+    if "," in header and any(name in re.split(r"[\s,\"]+", header) for name in FIELDS["text"]):
+        return "csv"
+
+    return "go" if any(GO_LINE.match(line) for line in text.splitlines()) else "lines"
+
+
+def decode_log(stream: IO[bytes]) -> IO[str]:
+    """Decodes a text log as UTF-16 if it starts with a byte order mark, and as UTF-8 otherwise.
+
+    Undecodable bytes are replaced, as a log can't be decoded again with a fallback encoding while it is streamed.
+
+    Args:
+        stream (IO[bytes]): The log.
+
+    Returns:
+        IO[str]: The decoded log.
+    """
+    head = stream.peek(2)[:2]  # type: ignore[attr-defined]
+    encoding = "utf-16" if head in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE) else "utf-8-sig"
+    return io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+
+
+def read_xml(stream: IO[bytes], source: str) -> Iterator[Record]:
+    """Reads the events of an Extended Events or SQL Server Profiler XML export.
+
+    Each event is discarded once it is read, so the document is never held in memory as a whole.
+
+    Args:
+        stream (IO[bytes]): The export.
+        source (str): The name of the log.
+
+    Returns:
+        Iterator[Record]: A record for each event with SQL text.
+
+    Raises:
+        click.ClickException: If the export isn't well-formed XML.
+    """
+    parents: list[ET.Element] = []
+    position = 0
+    try:
+        for event, element in ET.iterparse(stream, events=("start", "end")):  # noqa: S314 # exports are local files
+            if event == "start":
+                parents.append(element)
+                continue
+
+            parents.pop()
+            if _local_name(element.tag).lower() != "event":
+                continue
+
+            fields = _get_event_fields(element)
+            if parents:
+                parents[-1].remove(element)
+
+            if fields.get("text"):
+                position += 1
+                yield _to_record(fields, source, position)
+    except ET.ParseError as e:
+        raise click.ClickException(f"Unable to read {source}: {e}") from e
+
+
+def read_csv(stream: IO[str], source: str) -> Iterator[Record]:
+    """Reads the rows of a CSV export, such as a Query Store dump, with the column names in the first row.
+
+    Args:
+        stream (IO[str]): The decoded export.
+        source (str): The name of the log.
+
+    Returns:
+        Iterator[Record]: A record for each row with SQL text.
+
+    Raises:
+        click.ClickException: If the export has no column with SQL text.
+    """
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {field: _find(header, names) for field, names in FIELDS.items()}
+    if columns["text"] is None:
+        raise click.ClickException(f"Unable to read {source}: no column with sql text, such as query_sql_text")
+
+    for position, row in enumerate(reader, start=1):
+        fields = {field: row[index] for field, index in columns.items() if index is not None and index < len(row)}
+        if fields.get("text"):
+            yield _to_record(fields, source, position)
+
+
+def read_lines(stream: IO[str], source: str) -> Iterator[Record]:
+    """Reads a log with one statement per line.
+
+    Args:
+        stream (IO[str]): The decoded log.
+        source (str): The name of the log.
+
+    Returns:
+        Iterator[Record]: A record for each line that is neither blank nor a GO line.
+    """
+    for position, line in enumerate(stream, start=1):
+        if line.strip() and not GO_LINE.match(line):
+            yield Record(line, source, position)
+
+
+def read_batches(stream: IO[str], source: str) -> Iterator[Record]:
+    """Reads a log of batches separated by GO lines.
+
+    Args:
+        stream (IO[str]): The decoded log.
+        source (str): The name of the log.
+
+    Returns:
+        Iterator[Record]: A record for each batch that isn't blank, positioned at its first line that isn't blank.
+    """
+    lines: list[str] = []
+    start = 0
+    for number, line in enumerate(stream, start=1):
+        if GO_LINE.match(line):
+            if start:
+                yield Record("".join(lines), source, start)
+
+            lines = []
+            start = 0
+        elif start or line.strip():
+            lines.append(line)
+            start = start or number
+
+    if start:
+        yield Record("".join(lines), source, start)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _get_event_fields(element: ET.Element) -> dict[str, str]:
+    values = {name.lower(): value for name, value in element.attrib.items()}
+    for child in element:
+        name = child.get("name")
+        if not name:
+            continue
+
+        # Extended Events keep the value in a child element, Profiler columns contain it directly.
+        value = next((x.text for x in child if _local_name(x.tag) == "value"), None) if len(child) else child.text
+        if value is not None:
+            values.setdefault(name.lower(), value)
+
+    fields = {}
+    for field, names in FIELDS.items():
+        name = next((name for name in names if name in values), None)
+        if name is not None:
+            fields[field] = values[name]
+
+    return fields
+
+
+def _find(header: list[str], names: Iterable[str]) -> None | int:
+    return next((header.index(name) for name in names if name in header), None)
+
+
+def _to_record(fields: dict[str, str], source: str, position: int) -> Record:
+    return Record(
+        fields["text"],
+        source,
+        position,
+        time=fields.get("time"),
+        login=fields.get("login"),
+        host=fields.get("host"),
+        database=fields.get("database"),
+    )
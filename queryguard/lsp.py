@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_right
+from typing import IO, Any
+
+import sqlparse
+
+from queryguard import rules
+from queryguard.files import check_statements
+from queryguard.parser import DEFAULT_LITERAL_LIMIT, SQLParser
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ERROR = 1
+METHOD_NOT_FOUND = -32601
+INVALID_REQUEST = -32600
+LEADING = re.compile(r"(?:\s|\bGO\b[^\n]*)*", re.IGNORECASE)
+
+# A violation as found in a batch: the first and last character relative to the batch, the rule and its id.
+Finding = tuple[int, int, str, str]
+
+
+class Document:
+    """An open text document, kept up to date with the edits sent by the editor.
+
+    Positions are given in lines and UTF-16 code units, like the Language Server Protocol counts them.
+
+    Attributes:
+        uri (str): The URI of the document.
+        version (int): The version of the document.
+        text (str): The current text.
+        batches (dict[str, list[Finding]]): The violations found in each GO batch when the document was last checked,
+            by the text of the batch.
+    """
+
+    def __init__(self, uri: str, text: str, version: int = 0) -> None:
+        """Initializes the Document class.
+
+        Args:
+            uri (str): The URI of the document.
+            text (str): The text.
+            version (int): The version of the document. Defaults to 0.
+        """
+        self.uri = uri
+        self.version = version
+        self.batches: dict[str, list[Finding]] = {}
+        self._set_text(text)
+
+    def __repr__(self) -> str:
+        return f"Document({self.uri}, version={self.version})"
+
+    def apply(self, change: dict[str, Any]) -> None:
+        """Applies a change, which either replaces a range or, without one, the whole text.
+
+        Args:
+            change (dict[str, Any]): A TextDocumentContentChangeEvent.
+
+        Returns:
+            None
+        """
+        if "range" not in change:
+            self._set_text(change["text"])
+            return
+
+        start = self.offset(change["range"]["start"])
+        end = self.offset(change["range"]["end"])
+        self._set_text(self.text[:start] + change["text"] + self.text[end:])
+
+    def offset(self, position: dict[str, int]) -> int:
+        """Converts a position into an offset in the text.
+
+        Args:
+            position (dict[str, int]): The line and UTF-16 character, counting from 0.
+
+        Returns:
+            int: The offset, clamped to the text.
+        """
+        line = position["line"]
+        if line >= len(self._lines):
+            return len(self.text)
+
+        start = self._lines[line]
+        end = self._lines[line + 1] if line + 1 < len(self._lines) else len(self.text)
+        units = position["character"]
+        text = self.text[start:end]
+        if text.isascii():
+            return start + min(units, len(text.rstrip("\r\n")))
+
+        offset = start
+        for char in text:
+            if units <= 0 or char in "\r\n":
+                break
+
+            units -= 2 if ord(char) > 0xFFFF else 1
+            offset += 1
+
+        return offset
+
+    def position(self, offset: int) -> dict[str, int]:
+        """Converts an offset in the text into a position.
+
+        Args:
+            offset (int): The offset.
+
+        Returns:
+            dict[str, int]: The line and UTF-16 character, counting from 0.
+        """
+        line = bisect_right(self._lines, offset) - 1
+        text = self.text[self._lines[line] : offset]
+        units = len(text) if text.isascii() else len(text.encode("utf-16-le")) // 2
+        return {"line": line, "character": units}
+
+    def _set_text(self, text: str) -> None:
+        self.text = text
+        self._lines = [0, *(match.end() for match in re.finditer(r"\r\n|\r|\n", text))]
+
+
+class LanguageServer:
+    """A Language Server Protocol server that checks open documents as they are edited.
+
+    Messages are read from one stream and written to another, usually standard input and output. After each edit
+    the document is checked once no further edit arrived for the debounce time. Only the GO batches whose text
+    changed since the last check are parsed and checked again, the violations of the other batches are reused.
+
+    Attributes:
+        rules (list[type[rules.BaseRule]]): The rule classes to evaluate.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+        debounce (float): The seconds to wait after an edit before checking the document.
+        documents (dict[str, Document]): The open documents, by URI.
+        parsed (int): The number of batches parsed.
+        reused (int): The number of batches whose violations were reused.
+    """
+
+    def __init__(
+        self,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int = DEFAULT_LITERAL_LIMIT,
+        debounce: float = 0.3,
+    ) -> None:
+        """Initializes the LanguageServer class.
+
+        Args:
+            rules (list[type[rules.BaseRule]]): The rule classes to evaluate.
+            literal_limit (int): The longest string literal that is lexed verbatim.
+            debounce (float): The seconds to wait after an edit before checking the document.
+        """
+        self.rules = rules
+        self.literal_limit = literal_limit
+        self.debounce = debounce
+        self.documents: dict[str, Document] = {}
+        self.parsed = 0
+        self.reused = 0
+        self._output: None | IO[bytes] = None
+        self._write_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._due: dict[str, float] = {}
+        self._shutdown = False
+        self._running = True
+
+    def __repr__(self) -> str:
+        return f"LanguageServer(documents={len(self.documents)}, parsed={self.parsed}, reused={self.reused})"
+
+    def serve(self, input: IO[bytes], output: IO[bytes]) -> int:
+        """Handles messages until the editor sends the exit notification or closes the input.
+
+        Args:
+            input (IO[bytes]): The stream messages are read from.
+            output (IO[bytes]): The stream messages are written to.
+
+        Returns:
+            int: The exit code, 0 if the editor asked the server to shut down before exiting.
+        """
+        self._output = output
+        checker = threading.Thread(target=self._check_due, daemon=True)
+        checker.start()
+        try:
+            while (message := read_message(input)) is not None:
+                if message.get("method") == "exit":
+                    break
+
+                try:
+                    self.handle(message)
+                except (KeyError, TypeError, AttributeError) as e:
+                    logger.warning(f"Ignoring invalid message {message.get('method')}: {e!r}")
+                    if "id" in message:
+                        self.send({"id": message["id"], "error": {"code": INVALID_REQUEST, "message": repr(e)}})
+        finally:
+            with self._condition:
+                self._running = False
+                self._condition.notify()
+
+            checker.join()
+
+        return 0 if self._shutdown else 1
+
+    def handle(self, message: dict[str, Any]) -> None:
+        """Handles a request or notification.
+
+        Args:
+            message (dict[str, Any]): The JSON-RPC message.
+
+        Returns:
+            None
+        """
+        method = message.get("method")
+        params = message.get("params") or {}
+        result: Any = None
+        if method == "initialize":
+            result = {
+                "capabilities": {"textDocumentSync": {"openClose": True, "change": 2, "save": False}},
+                "serverInfo": {"name": "queryguard"},
+            }
+        elif method == "shutdown":
+            self._shutdown = True
+        elif method == "textDocument/didOpen":
+            document = params["textDocument"]
+            with self._condition:
+                self.documents[document["uri"]] = Document(
+                    document["uri"], document["text"], document.get("version", 0)
+                )
+
+            self.schedule(document["uri"], 0)
+        elif method == "textDocument/didChange":
+            uri = params["textDocument"]["uri"]
+            with self._condition:
+                document = self.documents[uri]
+                for change in params["contentChanges"]:
+                    document.apply(change)
+
+                document.version = params["textDocument"].get("version", document.version + 1)
+
+            self.schedule(uri, self.debounce)
+        elif method == "textDocument/didClose":
+            uri = params["textDocument"]["uri"]
+            with self._condition:
+                self.documents.pop(uri, None)
+                self._due.pop(uri, None)
+
+            self.send({"method": "textDocument/publishDiagnostics", "params": {"uri": uri, "diagnostics": []}})
+        elif "id" in message:
+            self.send({"id": message["id"], "error": {"code": METHOD_NOT_FOUND, "message": f"Unknown method {method}"}})
+            return
+
+        if "id" in message:
+            self.send({"id": message["id"], "result": result})
+
+    def schedule(self, uri: str, delay: float) -> None:
+        """Checks a document after a delay, unless it is scheduled again before.
+
+        Args:
+            uri (str): The URI of the document.
+            delay (float): The seconds to wait.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self._due[uri] = time.monotonic() + delay
+            self._condition.notify()
+
+    def check(self, document: Document) -> list[dict[str, Any]]:
+        """Checks a document, parsing only the GO batches that changed since the last check.
+
+        Args:
+            document (Document): The document.
+
+        Returns:
+            list[dict[str, Any]]: The diagnostics.
+        """
+        batches: dict[str, list[Finding]] = {}
+        diagnostics = []
+        for start, text in SQLParser.split_batches(document.text):
+            findings = batches.get(text, document.batches.get(text))
+            if findings is None:
+                findings = self.check_batch(text)
+                self.parsed += 1
+            else:
+                self.reused += 1
+
+            batches[text] = findings
+            for first, last, rule, id in findings:
+                diagnostics.append(
+                    {
+                        "range": {"start": document.position(start + first), "end": document.position(start + last)},
+                        "severity": SEVERITY_ERROR,
+                        "code": id,
+                        "source": "queryguard",
+                        "message": f"Violated rule {rule} ({id})",
+                    }
+                )
+
+        document.batches = batches
+        return diagnostics
+
+    def check_batch(self, text: str) -> list[Finding]:
+        """Checks a GO batch.
+
+        Args:
+            text (str): The text of the batch.
+
+        Returns:
+            list[Finding]: The first violation of each rule, with the first and last character of its statement
+                without surrounding whitespace and GO lines.
+        """
+        statements: list[sqlparse.sql.Statement] = list(SQLParser.get_all_statements(text, self.literal_limit))
+        ends = dict(zip((x.offset for x in statements), [*(x.offset for x in statements[1:]), len(text)]))
+        findings = []
+        for violation in check_statements(tuple(statements), self.rules):
+            start = violation.offset or 0
+            end = ends.get(start, len(text))
+            segment = text[start:end]
+            leading = LEADING.match(segment)
+            first = start + (leading.end() if leading else 0)
+            last = start + len(segment.rstrip())
+            findings.append(
+                (first, last, violation.rule, violation.id)
+                if first < last
+                else (start, end, violation.rule, violation.id)
+            )
+
+        return findings
+
+    def send(self, message: dict[str, Any]) -> None:
+        """Writes a message.
+
+        Args:
+            message (dict[str, Any]): The JSON-RPC message, without the version.
+
+        Returns:
+            None
+        """
+        if self._output is None:
+            return
+
+        with self._write_lock:
+            write_message(self._output, {"jsonrpc": "2.0", **message})
+
+    def _check_due(self) -> None:
+        while True:
+            with self._condition:
+                while self._running and (not self._due or min(self._due.values()) > time.monotonic()):
+                    self._condition.wait(min(self._due.values()) - time.monotonic() if self._due else None)
+
+                if not self._running:
+                    return
+
+                uri = min(self._due, key=self._due.__getitem__)
+                del self._due[uri]
+                document = self.documents.get(uri)
+                if document is None:
+                    continue
+
+                snapshot = Document(uri, document.text, document.version)
+                snapshot.batches = document.batches
+
+            started = time.perf_counter()
+            diagnostics = self.check(snapshot)
+            with self._condition:
+                if self.documents.get(uri) is not document:
+                    continue
+
+                # The checked batches can be reused even if the document changed meanwhile.
+                document.batches = snapshot.batches
+                if document.version != snapshot.version:
+                    continue
+
+            logger.debug(f"Checked {uri} in {time.perf_counter() - started:.3f} s, {len(diagnostics)} diagnostics")
+            params = {"uri": uri, "version": snapshot.version, "diagnostics": diagnostics}
+            self.send({"method": "textDocument/publishDiagnostics", "params": params})
+
+
+def read_message(input: IO[bytes]) -> None | dict[str, Any]:
+    """Reads a message framed by a Content-Length header.
+
+    Args:
+        input (IO[bytes]): The stream.
+
+    Returns:
+        None | dict[str, Any]: The message, or None at the end of the stream.
+    """
+    length = None
+    while True:
+        line = input.readline()
+        if not line:
+            return None
+
+        line = line.strip()
+        if not line:
+            if length is not None:
+                break
+
+            continue
+
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+
+    try:
+        message: dict[str, Any] = json.loads(input.read(length))
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid message: {e}")
+        return {"error": {"code": INVALID_REQUEST}}
+
+    return message
+
+
+def write_message(output: IO[bytes], message: dict[str, Any]) -> None:
+    """Writes a message framed by a Content-Length header.
+
+    Args:
+        output (IO[bytes]): The stream.
+        message (dict[str, Any]): The message.
+
+    Returns:
+        None
+    """
+    body = json.dumps(message, separators=(",", ":")).encode()
+    output.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    output.flush()
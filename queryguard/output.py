@@ -8,11 +8,16 @@ from typing import Any, TypeVar
 
 from rich import progress
 from rich.console import Console
+from rich.live import Live
+from rich.markup import escape
 from rich.syntax import Syntax
 from rich.table import Table
 
-from queryguard.exceptions import TerminatingError
+from queryguard.aggregate import ViolationSummary
+from queryguard.exceptions import RuleViolation, TerminatingError
 from queryguard.files import File, FileEncoder
+from queryguard.logs import Record
+from queryguard.sampling import Estimator
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +54,62 @@ class BaseOutputHandler(ABC):
         """
         pass  # pragma: no cover
 
+    @abstractmethod
+    def process_record(self, record: Record, violations: list[RuleViolation]) -> None:
+        """Processes a query log record with violations as soon as it is checked.
+
+        Args:
+            record (Record): The record.
+            violations (list[RuleViolation]): The violations found in the record.
+
+        Returns:
+            None
+        """
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def process_estimates(self, estimator: Estimator) -> None:
+        """Processes the violation rates estimated from a sample of query log records.
+
+        Args:
+            estimator (Estimator): The sample and its estimates.
+
+        Returns:
+            None
+        """
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def process_summary(self, summary: ViolationSummary) -> None:
+        """Processes the summary of the violations found in query logs.
+
+        Args:
+            summary (ViolationSummary): The violations by rule and query shape.
+
+        Returns:
+            None
+        """
+        pass  # pragma: no cover
+
+    def show(self, files: list[File], summary: str) -> None:
+        """Shows the latest results while watching for changes, by default by processing them like a finished run.
+
+        Args:
+            files (list[File]): A list of files that have been analyzed.
+            summary (str): A line describing the latest check.
+
+        Returns:
+            None
+        """
+        self.process_result(files)
+
+    def close(self) -> None:  # noqa: B027
+        """Stops showing results.
+
+        Returns:
+            None
+        """
+
     def exit_violation_found(self) -> None:
         """Ends execution when a violdation was found."""
         raise TerminatingError(exit_code=1)
@@ -66,6 +127,7 @@ class ConsoleText(BaseOutputHandler):
     def __init__(self) -> None:
         """Initializes the ConsoleJson class."""
         self.console = Console()
+        self._live: None | Live = None
 
     def track(self, iterable: Iterable[T], description: str = "Processing...") -> Any:  # noqa: ANN401
         """Track progress by iterating over a sequence using the rich.progress.track function.
@@ -87,6 +149,128 @@ class ConsoleText(BaseOutputHandler):
         """
         logger.debug("Displaying results")
         console = Console()
+        console.print(self.get_table(files))
+
+    def process_record(self, record: Record, violations: list[RuleViolation]) -> None:
+        """Displays a line for each violation found in a query log record, with the metadata of the record.
+
+        Args:
+            record (Record): The record.
+            violations (list[RuleViolation]): The violations found in the record.
+
+        Returns:
+            None
+        """
+        metadata = "".join(f" {name}={value}" for name, value in record.metadata().items())
+        for violation in violations:
+            statement = " ".join(violation.statement.split())
+            self.console.out(f"{record.source}:{record.position}: {violation}{metadata}: {statement}", highlight=False)
+
+    def process_estimates(self, estimator: Estimator) -> None:
+        """Displays a table of the estimated violation rates, with the size of the sample below it.
+
+        Args:
+            estimator (Estimator): The sample and its estimates.
+
+        Returns:
+            None
+        """
+        table = Table(show_header=True, header_style="bold blue")
+        table.add_column("Rule")
+        table.add_column("Sampled", justify="right")
+        table.add_column("Rate", justify="right")
+        table.add_column("95% interval", justify="right")
+        table.add_column("Records", justify="right")
+        for estimate in estimator.estimates():
+            table.add_row(
+                f"{estimate.rule} ({estimate.id})",
+                str(estimate.violations),
+                f"{estimate.rate:.3%}",
+                f"{estimate.low:.3%} - {estimate.high:.3%}",
+                f"~{round(estimate.rate * estimate.records):,}",
+            )
+
+        if estimator.total is None:
+            table.caption = (
+                f"{estimator.records:,} records checked in {estimator.units:,} of {estimator.population:,} logs"
+            )
+        else:
+            table.caption = f"{estimator.records:,} of {estimator.total:,} records checked"
+
+        if estimator.strata:
+            table.caption += f", violations sampled in {', '.join(sorted(estimator.strata))}"
+
+        self.console.print(table)
+
+    def process_summary(self, summary: ViolationSummary) -> None:
+        """Displays a table of the violations of each rule, with the query shapes violating it most often.
+
+        Args:
+            summary (ViolationSummary): The violations by rule and query shape.
+
+        Returns:
+            None
+        """
+        table = Table(show_header=True, header_style="bold blue")
+        table.add_column("Rule")
+        table.add_column("Violations", justify="right")
+        table.add_column("Shape")
+        table.add_column("Count", justify="right")
+        table.add_column("First seen")
+        for rule, violations, shapes in summary.top():
+            table.add_section()
+            for index, shape in enumerate(shapes):
+                table.add_row(
+                    f"{rule.rule} ({rule.id})" if index == 0 else "",
+                    f"{violations:,}" if index == 0 else "",
+                    escape(shape["statement"]),
+                    f"{shape['count']:,}" + (f" (+/-{shape['error']:,})" if shape["error"] else ""),
+                    escape(shape["example"]),
+                )
+
+        table.caption = f"{summary.records:,} records with violations"
+        self.console.print(table)
+
+    def show(self, files: list[File], summary: str) -> None:
+        """Shows the latest results in a table that is updated in place.
+
+        Files with violations or skipped files come first, so they stay visible when the table doesn't fit.
+
+        Args:
+            files (list[File]): A list of File objects.
+            summary (str): A line describing the latest check, shown below the table.
+
+        Returns:
+            None
+        """
+        files = sorted(files, key=lambda file: (file.status == "Passed ✅", str(file.path)))
+        table = self.get_table(files)
+        table.caption = summary
+        if self._live is None:
+            self._live = Live(table, console=self.console, auto_refresh=False)
+            self._live.start()
+
+        self._live.update(table, refresh=True)
+
+    def close(self) -> None:
+        """Stops updating the table.
+
+        Returns:
+            None
+        """
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+
+    def get_table(self, files: list[File]) -> Table:
+        """Builds a table of the results.
+
+        Args:
+            files (list[File]): A list of File objects.
+
+        Returns:
+            Table: The table, with a section per file.
+        """
         table = Table(show_header=True, header_style="bold blue")
         table.add_column("File")
         table.add_column("Status")
@@ -97,6 +281,8 @@ class ConsoleText(BaseOutputHandler):
             table.add_section()
             if file.status == "Passed ✅":
                 table.add_row(str(file.path), "Passed ✅", "", "")
+            elif file.reason:
+                table.add_row(str(file.path), file.status, file.reason, "")
             else:
                 table.add_row(str(file.path), "Failed ❌", "", "")
                 for violation in file.violations:
@@ -110,7 +296,7 @@ class ConsoleText(BaseOutputHandler):
                     )
                     table.add_row("", "", str(violation), Syntax(cleaned_statement, "sql", theme="ansi_dark"))
 
-        console.print(table)
+        return table
 
 
 class ConsoleJson(BaseOutputHandler):
@@ -142,4 +328,38 @@ class ConsoleJson(BaseOutputHandler):
         """
         logger.debug("Displaying results")
         files_json = json.dumps(files, cls=FileEncoder, indent=4)
-        self.console.print(files_json)
+        self.console.out(files_json, highlight=False)
+
+    def process_record(self, record: Record, violations: list[RuleViolation]) -> None:
+        """Displays a query log record with violations as a JSON document on one line.
+
+        Args:
+            record (Record): The record.
+            violations (list[RuleViolation]): The violations found in the record.
+
+        Returns:
+            None
+        """
+        self.console.out(json.dumps(record.to_dict(violations), cls=FileEncoder), highlight=False)
+
+    def process_estimates(self, estimator: Estimator) -> None:
+        """Displays the sample and the estimated violation rates as a JSON document on one line.
+
+        Args:
+            estimator (Estimator): The sample and its estimates.
+
+        Returns:
+            None
+        """
+        self.console.out(json.dumps({"sample": estimator.to_dict()}), highlight=False)
+
+    def process_summary(self, summary: ViolationSummary) -> None:
+        """Displays the violations by rule and query shape as a JSON document on one line.
+
+        Args:
+            summary (ViolationSummary): The violations by rule and query shape.
+
+        Returns:
+            None
+        """
+        self.console.out(json.dumps({"summary": summary.to_dict()}), highlight=False)
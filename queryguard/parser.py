@@ -1,28 +1,259 @@
 from __future__ import annotations
 
 import logging
+import mmap
+import re
+from bisect import bisect_right
 from collections.abc import Generator
+from typing import Any
 
 import sqlparse
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LITERAL_LIMIT = 4096
+
+_LITERAL = r"""(?:N?'(?:''|\\'|[^'])*'|[-+]?(?:0x[0-9a-f]*|(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)|NULL\b|DEFAULT\b)"""
+_ROW = rf"\(\s*{_LITERAL}(?:\s*,\s*{_LITERAL})*\s*\)"
+_VALUES_ROWS = re.compile(rf"\s*{_ROW}(?:\s*,\s*{_ROW})*", re.IGNORECASE)
+_DATA_SCAN = re.compile(
+    r"""(?P<name>\[(?:\]\]|[^\]])*\]|"(?:""|[^"])*")|(?P<string>'(?:''|\\'|[^'])*')"""
+    r"""|(?P<comment>--[^\r\n]*|/\*.*?(?:\*/|\Z))|(?P<values>\bVALUES\b)""",
+    re.IGNORECASE | re.DOTALL,
+)
+_BATCH_PATTERN = (
+    r"""(?P<name>\[(?:\]\]|[^\]])*\]|"(?:""|[^"])*")|(?P<string>'(?:''|\\'|[^'])*')"""
+    r"""|(?P<comment>--[^\r\n]*|/\*.*?(?:\*/|\Z))"""
+    r"""|(?P<go>^[ \t]*GO(?:[ \t]+\d+)?[ \t]*\r?$)"""
+)
+_BATCH_SCAN = re.compile(_BATCH_PATTERN, re.IGNORECASE | re.DOTALL | re.MULTILINE)
+_BATCH_SCAN_BYTES = re.compile(_BATCH_PATTERN.encode(), re.IGNORECASE | re.DOTALL | re.MULTILINE)
+_SHAPE_SCAN = re.compile(
+    r"""(?P<string>'(?:''|\\'|[^'])*')|(?P<comment>--[^\r\n]*|/\*.*?(?:\*/|\Z))"""
+    r"""|(?P<name>\[[^\]]*\]|"[^"]*"|[\w@#$]+)|(?P<space>[ \t]*\r?\n\s*|[ \t]{2,})""",
+    re.DOTALL,
+)
+_VALUES_PLACEHOLDER = " (NULL)"
+_LITERAL_PLACEHOLDER = "''"
+_NUMBER_PLACEHOLDER = "0"
+
+
+class ElidedQuery:
+    """SQL text with bulk data sections replaced by short placeholders.
+
+    Attributes:
+        text (str): The reduced SQL text handed to the lexer.
+        spans (list[tuple[int, int, int]]): The elided sections as (original start, original end, placeholder length).
+    """
+
+    def __init__(self, text: str, spans: list[tuple[int, int, int]]) -> None:
+        """Initializes the ElidedQuery class.
+
+        Args:
+            text (str): The reduced SQL text.
+            spans (list[tuple[int, int, int]]): The elided sections in the original text.
+        """
+        self.text = text
+        self.spans = spans
+        self._reduced_starts: list[int] = []
+        self._removed: list[int] = []
+        removed = 0
+        for start, end, placeholder_length in spans:
+            self._reduced_starts.append(start - removed)
+            removed += (end - start) - placeholder_length
+            self._removed.append(removed)
+
+    def __repr__(self) -> str:
+        return f"ElidedQuery(length={len(self.text)}, spans={len(self.spans)})"
+
+    def original_offset(self, offset: int) -> int:
+        """Maps an offset in the reduced text back to the original text.
+
+        Offsets that fall inside a placeholder map to the start of the elided section.
+
+        Args:
+            offset (int): An offset in the reduced text.
+
+        Returns:
+            int: The corresponding offset in the original text.
+        """
+        index = bisect_right(self._reduced_starts, offset) - 1
+        if index < 0:
+            return offset
+
+        start, _, placeholder_length = self.spans[index]
+        if offset < self._reduced_starts[index] + placeholder_length:
+            return start
+
+        return offset + self._removed[index]
+
 
 class SQLParser:
     """Parses SQL queries for analysis."""
 
     @staticmethod
-    def get_all_statements(query: str) -> tuple[sqlparse.sql.Statement]:
+    def get_all_statements(
+        query: str, literal_limit: None | int = DEFAULT_LITERAL_LIMIT
+    ) -> tuple[sqlparse.sql.Statement]:
         """Parses the given SQL query and returns a tuple of sqlparse.sql.Statement objects.
 
+        Bulk data sections are elided before lexing, see SQLParser.elide_data_sections. Each statement is annotated
+        with offset and end attributes holding its span in the original query.
+
         Args:
             query (str): The SQL query to parse.
+            literal_limit (None | int): The longest string literal that is lexed verbatim. None disables the
+                data-section fast path entirely.
 
         Returns:
             tuple[sqlparse.sql.Statement]: A tuple of sqlparse.sql.Statement objects.
         """
         logger.debug("Parsing file contents")
-        return sqlparse.parse(query)  # type: ignore[no-any-return]
+        elided = SQLParser.elide_data_sections(query, literal_limit) if literal_limit is not None else None
+        statements: tuple[sqlparse.sql.Statement] = sqlparse.parse(elided.text if elided else query)
+
+        offset = 0
+        for statement in statements:
+            end = offset + len(str(statement))
+            statement.offset = elided.original_offset(offset) if elided else offset
+            statement.end = elided.original_offset(end) if elided else end
+            offset = end
+
+        return statements
+
+    @staticmethod
+    def split_batches(query: str) -> list[tuple[int, str]]:
+        """Splits the given SQL query into batches at GO separators.
+
+        GO separators inside comments, string literals and quoted identifiers are ignored. Each batch after the first
+        begins with the line break and GO line that end the previous batch, so statements are tokenized the same way
+        as in the unsplit query.
+
+        Args:
+            query (str): The SQL query to split.
+
+        Returns:
+            list[tuple[int, str]]: The offset and text of each batch.
+        """
+        starts = SQLParser.get_batch_starts(query)
+        ends = [*starts[1:], len(query)]
+        return [(start, query[start:end]) for start, end in zip(starts, ends)]
+
+    @staticmethod
+    def get_batch_starts(query: str | bytes | memoryview | mmap.mmap, position: int = 0) -> list[int]:
+        """Returns the offsets at which the batches of the given SQL query begin.
+
+        Raw bytes are scanned directly, without decoding, for encodings that are compatible with ASCII.
+
+        Args:
+            query (str | bytes | memoryview | mmap.mmap): The SQL query to split.
+            position (int): The offset at which the first batch begins.
+
+        Returns:
+            list[int]: The offset of each batch, see SQLParser.split_batches.
+        """
+        pattern: re.Pattern[Any] = _BATCH_SCAN_BYTES
+        line_break: str | bytes = b"\r\n"
+        if isinstance(query, str):
+            pattern, line_break = _BATCH_SCAN, "\r\n"
+
+        starts = [position]
+        while match := pattern.search(query, position):
+            position = max(match.end(), match.start() + 1)
+            if match.lastgroup == "go" and match.start() > starts[0]:
+                start = match.start() - 1
+                if start > 0 and query[start - 1 : start + 1] == line_break:
+                    start -= 1
+                starts.append(start)
+
+        return starts
+
+    @staticmethod
+    def elide_data_sections(query: str, literal_limit: int = DEFAULT_LITERAL_LIMIT) -> ElidedQuery:
+        """Replaces bulk data that no rule inspects with short placeholders.
+
+        Row lists following VALUES that consist only of literals are collapsed into a single (NULL) row and string
+        literals longer than literal_limit are emptied. Comments, string literals and quoted identifiers are skipped
+        while scanning so statement terminators and GO separators are never removed.
+
+        Args:
+            query (str): The SQL query to reduce.
+            literal_limit (int): The longest string literal that is kept verbatim.
+
+        Returns:
+            ElidedQuery: The reduced query and the elided spans.
+        """
+        parts: list[str] = []
+        spans: list[tuple[int, int, int]] = []
+        position = 0
+        kept = 0
+        while match := _DATA_SCAN.search(query, position):
+            position = match.end()
+            if match.lastgroup == "string":
+                if match.end() - match.start() - 2 <= literal_limit:
+                    continue
+                start, end, placeholder = match.start(), match.end(), _LITERAL_PLACEHOLDER
+            elif match.lastgroup == "values":
+                rows = _VALUES_ROWS.match(query, position)
+                if not rows:
+                    continue
+                start, end, placeholder = rows.start(), rows.end(), _VALUES_PLACEHOLDER
+                position = end
+            else:
+                continue
+
+            parts.append(query[kept:start])
+            parts.append(placeholder)
+            spans.append((start, end, len(placeholder)))
+            kept = end
+
+        if not spans:
+            return ElidedQuery(query, spans)
+
+        logger.debug(f"Elided {len(spans)} data sections")
+        parts.append(query[kept:])
+        return ElidedQuery("".join(parts), spans)
+
+    @staticmethod
+    def normalize(query: str) -> ElidedQuery:
+        """Reduces SQL text to its shape, which is the same for every execution of a parameterized query.
+
+        String literals are emptied, numbers replaced by 0, the contents of comments removed and runs of whitespace
+        collapsed. Names and keywords, which are what rules inspect, are kept as they are, so texts of the same shape
+        violate the same rules in the same statements.
+
+        Args:
+            query (str): The SQL query to reduce.
+
+        Returns:
+            ElidedQuery: The shape of the query and the reduced spans.
+        """
+        parts: list[str] = []
+        spans: list[tuple[int, int, int]] = []
+        kept = 0
+        for match in _SHAPE_SCAN.finditer(query):
+            value = match.group()
+            if match.lastgroup == "string":
+                placeholder = _LITERAL_PLACEHOLDER
+            elif match.lastgroup == "comment":
+                placeholder = "/**/" if value.startswith("/*") else "--"
+            elif match.lastgroup == "name":
+                if not value[0].isdigit():
+                    continue
+                placeholder = _NUMBER_PLACEHOLDER
+            else:
+                placeholder = "\n" if "\n" in value else " "
+
+            if value == placeholder:
+                continue
+
+            parts.append(query[kept : match.start()])
+            parts.append(placeholder)
+            spans.append((match.start(), match.end(), len(placeholder)))
+            kept = match.end()
+
+        parts.append(query[kept:])
+        return ElidedQuery("".join(parts), spans)
 
     @staticmethod
     def to_case_insensitive_regex(string: str) -> str:
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from types import TracebackType
+
+from queryguard.exceptions import SkippedFile
+from queryguard.source import DEFAULT_ENCODINGS, Source
+
+logger = logging.getLogger(__name__)
+
+READ_AHEAD_LIMIT = 16 << 20
+
+
+class BufferPool:
+    """A pool of reusable read buffers."""
+
+    def __init__(self) -> None:
+        """Initializes the BufferPool class."""
+        self._buffers: list[bytearray] = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+
+    def __repr__(self) -> str:
+        return f"BufferPool(buffers={len(self._buffers)}, allocations={self.allocations})"
+
+    def acquire(self, size: int) -> bytearray:
+        """Takes a buffer of at least the given size out of the pool, allocating one if none fits.
+
+        Args:
+            size (int): The number of bytes needed.
+
+        Returns:
+            bytearray: A buffer of at least size bytes.
+        """
+        with self._lock:
+            for index, buffer in enumerate(self._buffers):
+                if len(buffer) >= size:
+                    return self._buffers.pop(index)
+
+            if self._buffers:
+                self._buffers.remove(min(self._buffers, key=len))
+
+            self.allocations += 1
+
+        return bytearray(size)
+
+    def release(self, buffer: bytearray) -> None:
+        """Hands a buffer back to the pool.
+
+        Args:
+            buffer (bytearray): The buffer that is no longer used.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._buffers.append(buffer)
+
+
+class PipelineStats:
+    """Counters of the read-ahead pipeline.
+
+    Attributes:
+        files (int): The number of files read.
+        bytes (int): The number of bytes read into buffers.
+        read_time (float): Seconds spent reading, summed over all reader threads.
+        io_wait (float): Seconds the evaluation waited for reads to complete.
+        cpu_time (float): Seconds spent parsing and checking files.
+    """
+
+    def __init__(self) -> None:
+        """Initializes the PipelineStats class."""
+        self.files = 0
+        self.bytes = 0
+        self.read_time = 0.0
+        self.io_wait = 0.0
+        self.cpu_time = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"PipelineStats(files={self.files}, bytes={self.bytes}, read_time={self.read_time:.3f}, "
+            f"io_wait={self.io_wait:.3f}, cpu_time={self.cpu_time:.3f})"
+        )
+
+
+class ReadAhead:
+    """Reads upcoming files on a small thread pool while the current file is parsed and checked.
+
+    Files are read in the order they are given, at most depth files ahead of the file being evaluated. Small files
+    are read into buffers that are reused once their source is closed, larger ones are memory-mapped.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        depth: int = 8,
+        threads: int = 4,
+        encodings: Iterable[str] = DEFAULT_ENCODINGS,
+        max_size: int = 0,
+    ) -> None:
+        """Initializes the ReadAhead class.
+
+        Args:
+            paths (Iterable[Path]): The files that will be evaluated, in order.
+            depth (int): The number of files read ahead. 0 reads each file when it is needed.
+            threads (int): The number of reader threads.
+            encodings (Iterable[str]): Fallback encodings for files that aren't valid UTF-8.
+            max_size (int): Files larger than this many bytes are skipped without being read. 0 disables the limit.
+        """
+        self.depth = depth
+        self.encodings = list(encodings)
+        self.max_size = max_size
+        self.stats = PipelineStats()
+        self._pending = list(reversed(list(paths)))
+        self._futures: dict[Path, Future[Source]] = {}
+        self._pool = BufferPool()
+        self._lock = threading.Lock()
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="queryguard-read") if depth > 0 else None
+        )
+
+    def __repr__(self) -> str:
+        return f"ReadAhead(depth={self.depth}, stats={self.stats})"
+
+    def __enter__(self) -> ReadAhead:
+        self._fill()
+        return self
+
+    def __exit__(
+        self, exc_type: None | type[BaseException], exc_value: None | BaseException, traceback: None | TracebackType
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stops reading ahead and hands back the buffers of files that were read but not evaluated.
+
+        Returns:
+            None
+        """
+        self._pending.clear()
+        for future in self._futures.values():
+            future.cancel()
+
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+        for future in self._futures.values():
+            if not future.cancelled() and not future.exception():
+                future.result().close()
+
+        self._futures.clear()
+
+    def read(self, path: Path) -> Source:
+        """Returns the contents of the given file, waiting for the read to complete if necessary.
+
+        Args:
+            path (Path): The path to the file.
+
+        Returns:
+            Source: The file contents.
+
+        Raises:
+            SkippedFile: If the file is oversized or binary.
+        """
+        started = time.perf_counter()
+        future = self._futures.pop(path, None)
+        try:
+            return future.result() if future else self._load(path)
+        finally:
+            self.stats.io_wait += time.perf_counter() - started
+            self._fill()
+
+    def _fill(self) -> None:
+        while self._executor and self._pending and len(self._futures) < self.depth:
+            path = self._pending.pop()
+            self._futures[path] = self._executor.submit(self._load, path)
+
+    def _load(self, path: Path) -> Source:
+        started = time.perf_counter()
+        try:
+            size = path.stat().st_size
+            if self.max_size and size > self.max_size:
+                raise SkippedFile(f"larger than {self.max_size} bytes")
+
+            if not size or size > READ_AHEAD_LIMIT:
+                return Source(path, encodings=self.encodings)
+
+            buffer = self._pool.acquire(size)
+            view = memoryview(buffer)[:size]
+            try:
+                with path.open(mode="rb", buffering=0) as f:
+                    read = 0
+                    while read < size and (count := f.readinto(view[read:])):
+                        read += count
+
+                source = Source(path, view[:read], self.encodings, release=partial(self._pool.release, buffer))
+            except BaseException:
+                view.release()
+                self._pool.release(buffer)
+                raise
+
+            with self._lock:
+                self.stats.bytes += read
+
+            return source
+        finally:
+            with self._lock:
+                self.stats.files += 1
+                self.stats.read_time += time.perf_counter() - started
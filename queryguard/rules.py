@@ -18,8 +18,12 @@ class BaseRule(ABC):
 
     Attributes:
         rule (str): The name of the rule.
+        triggers (tuple[str, ...]): Terms of which at least one is contained in a token of every statement the rule
+            can match, case-insensitively. Files without any of them can't violate the rule. Empty when unknown.
     """
 
+    triggers: tuple[str, ...] = ()
+
     def __str__(self) -> str:
         return "Rule: " + self.rule + " (" + self.id + ")"
 
@@ -87,6 +91,7 @@ class NoCreateLogin(BaseRule):
 
     rule = "NoCreateLogin"
     id = "S001"
+    triggers = ("LOGIN",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -123,6 +128,7 @@ class NoDropLogin(BaseRule):
 
     rule = "NoDropLogin"
     id = "S002"
+    triggers = ("LOGIN",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -161,6 +167,7 @@ class NoAlterLogin(BaseRule):
 
     rule = "NoAlterLogin"
     id = "S003"
+    triggers = ("LOGIN", "SP_PASSWORD", "SP_DEFAULTDB", "SP_DEFAULTLANGUAGE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -201,6 +208,7 @@ class NoCreateServerRole(BaseRule):
 
     rule = "NoCreateServerRole"
     id = "S004"
+    triggers = ("SERVER",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -228,6 +236,7 @@ class NoDropServerRole(BaseRule):
 
     rule = "NoDropServerRole"
     id = "S005"
+    triggers = ("SERVER",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -257,6 +266,7 @@ class NoAlterServerRole(BaseRule):
 
     rule = "NoAlterServerRole"
     id = "S006"
+    triggers = ("SERVER", "SP_ADDSRVROLEMEMBER", "SP_DROPSRVROLEMEMBER")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -291,6 +301,7 @@ class NoCreateDatabaseRole(BaseRule):
 
     rule = "NoCreateDatabaseRole"
     id = "S007"
+    triggers = ("ROLE",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -317,6 +328,7 @@ class NoDropDatabaseRole(BaseRule):
 
     rule = "NoDropDatabaseRole"
     id = "S008"
+    triggers = ("ROLE",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -344,6 +356,7 @@ class NoAlterDatabaseRole(BaseRule):
 
     rule = "NoAlterDatabaseRole"
     id = "S009"
+    triggers = ("ROLE",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -373,6 +386,7 @@ class NoCreateAppRole(BaseRule):
 
     rule = "NoCreateAppRole"
     id = "S010"
+    triggers = ("APPLICATION", "SP_ADDAPPROLE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -404,6 +418,7 @@ class NoDropAppRole(BaseRule):
 
     rule = "NoDropAppRole"
     id = "S011"
+    triggers = ("APPLICATION", "SP_DROPAPPROLE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -435,6 +450,7 @@ class NoAlterAppRole(BaseRule):
 
     rule = "NoAlterAppRole"
     id = "S012"
+    triggers = ("APPLICATION", "SP_APPROLEPASSWORD")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -470,6 +486,7 @@ class NoDynamicSQL(BaseRule):
 
     rule = "NoDynamicSQL"
     id = "S013"
+    triggers = ("EXEC",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -509,6 +526,7 @@ class NoCreateUser(BaseRule):
 
     rule = "NoCreateUser"
     id = "S014"
+    triggers = ("USER", "SP_GRANTDBACCESS")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -539,6 +557,7 @@ class NoDropUser(BaseRule):
 
     rule = "NoDropUser"
     id = "S015"
+    triggers = ("USER", "SP_REVOKEDBACCESS")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -569,6 +588,7 @@ class NoAlterUser(BaseRule):
 
     rule = "NoAlterUser"
     id = "S016"
+    triggers = ("USER",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -600,6 +620,7 @@ class NoCreateDatabase(BaseRule):
 
     rule = "NoCreateDatabase"
     id = "S017"
+    triggers = ("DATABASE", "SP_ATTACH_DB", "SP_ATTACH_SINGLE_FILE_DB")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -634,6 +655,7 @@ class NoDropDatabase(BaseRule):
 
     rule = "NoDropDatabase"
     id = "S018"
+    triggers = ("DATABASE", "SP_DETACH_DB", "SP_DBREMOVE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -666,6 +688,7 @@ class NoAlterDatabaseAll(BaseRule):
 
     rule = "NoAlterDatabaseAll"
     id = "S019"
+    triggers = ("DATABASE", "SHRINKFILE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -706,6 +729,7 @@ class NoAlterDatabaseFiles(BaseRule):
 
     rule = "NoAlterDatabase"
     id = "S020"
+    triggers = ("DATABASE", "SHRINKFILE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -738,6 +762,7 @@ class NoAlterServerConfiguration(BaseRule):
 
     rule = "NoAlterServerConfiguration"
     id = "S021"
+    triggers = ("CONFIGURATION", "SP_CONFIGURE")
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -778,6 +803,7 @@ class NoAlterAuthExceptObject(BaseRule):
 
     rule = "NoAlterAuthExceptObject"
     id = "S021"
+    triggers = ("::",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -813,6 +839,7 @@ class NoBackup(BaseRule):
 
     rule = "NoBackup"
     id = "S023"
+    triggers = ("BACKUP",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
@@ -852,6 +879,7 @@ class NoGrantExceptObject(BaseRule):
 
     rule = "NoGrantExceptObject"
     id = "S024"
+    triggers = ("GRANT",)
 
     def check(self, statements: tuple[sqlparse.sql.Statement]) -> None:
         super().check(statements)
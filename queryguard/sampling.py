@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import math
+import random
+from collections import Counter
+from typing import Any, Generic, TypeVar
+
+from queryguard import rules
+
+T = TypeVar("T")
+
+UNITS = ("records", "logs")
+# The normal quantile of 95% two-sided confidence intervals.
+Z = 1.959964
+
+
+class Reservoir(Generic[T]):
+    """A uniform random sample of fixed size of a stream of unknown length.
+
+    Items are sampled with Algorithm L, which draws random numbers only for the items that enter the sample, so adding
+    an item that is skipped costs a comparison.
+
+    Attributes:
+        size (int): The size of the sample.
+        items (list[T]): The sampled items, in no particular order.
+        seen (int): The number of items added.
+    """
+
+    def __init__(self, size: int, rng: random.Random) -> None:
+        """Initializes the Reservoir class.
+
+        Args:
+            size (int): The size of the sample.
+            rng (random.Random): The source of randomness.
+        """
+        self.size = size
+        self.items: list[T] = []
+        self.seen = 0
+        self._rng = rng
+        self._weight = 1.0
+        self._next = size
+
+    def __repr__(self) -> str:
+        return f"Reservoir(size={self.size}, seen={self.seen})"
+
+    def add(self, item: T) -> None:
+        """Adds an item of the stream, which replaces a sampled item with the right probability.
+
+        Args:
+            item (T): The item.
+
+        Returns:
+            None
+        """
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            if len(self.items) == self.size:
+                self._skip()
+        elif self.seen > self._next:
+            self.items[self._rng.randrange(self.size)] = item
+            self._skip()
+
+    def _skip(self) -> None:
+        self._weight *= math.exp(math.log(1 - self._rng.random()) / self.size)
+        self._next = self.seen + int(math.log(1 - self._rng.random()) / math.log1p(-self._weight))
+
+
+class Estimate:
+    """The estimated rate at which records violate a rule.
+
+    Attributes:
+        rule (str): The name of the rule.
+        id (str): The id of the rule.
+        violations (int): The number of sampled records violating the rule.
+        rate (float): The estimated fraction of records violating the rule.
+        low (float): The lower bound of the 95% confidence interval of the rate.
+        high (float): The upper bound of the 95% confidence interval of the rate.
+        records (float): The estimated number of records.
+    """
+
+    def __init__(
+        self, rule: str, id: str, violations: int, rate: float, low: float, high: float, records: float
+    ) -> None:
+        """Initializes the Estimate class.
+
+        Args:
+            rule (str): The name of the rule.
+            id (str): The id of the rule.
+            violations (int): The number of sampled records violating the rule.
+            rate (float): The estimated fraction of records violating the rule.
+            low (float): The lower bound of the confidence interval of the rate.
+            high (float): The upper bound of the confidence interval of the rate.
+            records (float): The estimated number of records.
+        """
+        self.rule = rule
+        self.id = id
+        self.violations = violations
+        self.rate = rate
+        self.low = low
+        self.high = high
+        self.records = records
+
+    def __repr__(self) -> str:
+        return f"Estimate({self.id}, rate={self.rate:.4g}, low={self.low:.4g}, high={self.high:.4g})"
+
+    def to_dict(self) -> dict[str, Any]:
+        """Converts the estimate to a JSON-serializable dictionary.
+
+        Returns:
+            dict[str, Any]: The estimate, with the estimated number of violating records.
+        """
+        return {
+            "name": self.rule,
+            "id": self.id,
+            "violations": self.violations,
+            "rate": self.rate,
+            "low": self.low,
+            "high": self.high,
+            "estimated": round(self.rate * self.records),
+        }
+
+
+class Estimator:
+    """Estimates the violation rate of each rule from a simple random sample of units.
+
+    A unit is a record, or a whole log when logs are sampled. The rate is estimated as the fraction of sampled records
+    violating the rule, with the variance of a ratio estimator over the sampled units, so records of a log that tend
+    to violate the same rules widen the interval. Intervals are Wilson score intervals for the effective sample size
+    implied by that variance. When no sampled record violates a rule, or every one does, the records are taken to be
+    independent.
+
+    Attributes:
+        rules (list[type[rules.BaseRule]]): The rule classes estimated.
+        population (int): The number of units sampled from.
+        total (None | int): The number of records sampled from, when known.
+        units (int): The number of units checked.
+        records (int): The number of records checked.
+        strata (Counter[str]): The number of violations found in the sampled records, by log.
+    """
+
+    def __init__(self, rules: list[type[rules.BaseRule]], population: int, total: None | int = None) -> None:
+        """Initializes the Estimator class.
+
+        Args:
+            rules (list[type[rules.BaseRule]]): The rule classes estimated.
+            population (int): The number of units sampled from.
+            total (None | int): The number of records sampled from, when known. Otherwise it is estimated from the
+                average size of the sampled units.
+        """
+        self.rules = rules
+        self.population = population
+        self.total = total
+        self.units = 0
+        self.records = 0
+        self.strata: Counter[str] = Counter()
+        self._sizes = 0
+        # Rules are counted by name and id, since rules may share an id.
+        self._violations: Counter[tuple[str, str]] = Counter()
+        self._squares: Counter[tuple[str, str]] = Counter()
+        self._products: Counter[tuple[str, str]] = Counter()
+
+    def __repr__(self) -> str:
+        return f"Estimator(units={self.units}, population={self.population}, records={self.records})"
+
+    def add(self, stratum: str, records: int, counts: Counter[tuple[str, str]]) -> None:
+        """Adds a checked unit.
+
+        Args:
+            stratum (str): The log the unit was read from.
+            records (int): The number of records in the unit.
+            counts (Counter[tuple[str, str]]): The number of records violating each rule, by rule name and id.
+
+        Returns:
+            None
+        """
+        self.units += 1
+        self.records += records
+        self._sizes += records * records
+        for key, count in counts.items():
+            self._violations[key] += count
+            self._squares[key] += count * count
+            self._products[key] += count * records
+
+        if counts:
+            self.strata[stratum] += sum(counts.values())
+
+    def estimates(self) -> list[Estimate]:
+        """Estimates the violation rate of each rule.
+
+        Returns:
+            list[Estimate]: The estimate of each rule.
+        """
+        total = self.total
+        if total is None:
+            total = round(self.records / max(self.units, 1) * self.population)
+
+        return [self._estimate(str(rule.rule), str(rule.id), total) for rule in self.rules]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Converts the sample and the estimates to a JSON-serializable dictionary.
+
+        Returns:
+            dict[str, Any]: The size of the sample and of the population, the estimates and the logs with violations.
+        """
+        return {
+            "units": self.units,
+            "population": self.population,
+            "records": self.records,
+            "total": self.total,
+            "estimates": [estimate.to_dict() for estimate in self.estimates()],
+            "strata": dict(sorted(self.strata.items())),
+        }
+
+    def precise(self, error: float) -> bool:
+        """Tells whether every confidence interval is at most twice the error wide.
+
+        Args:
+            error (float): The largest acceptable distance from the estimate to the bounds of its interval.
+
+        Returns:
+            bool: True if the sample is large enough.
+        """
+        return self.units > 1 and all(x.high - x.rate <= error and x.rate - x.low <= error for x in self.estimates())
+
+    def _estimate(self, rule: str, id: str, total: int) -> Estimate:
+        key = (rule, id)
+        violations = self._violations[key]
+        if not self.records:
+            return Estimate(rule, id, 0, 0.0, 0.0, 1.0, total)
+
+        rate = violations / self.records
+        if self.units >= self.population:
+            return Estimate(rule, id, violations, rate, rate, rate, total)
+
+        correction = 1 - self.units / self.population
+        size = self.records / correction
+        if 0 < violations < self.records and self.units > 1:
+            residuals = self._squares[key] - 2 * rate * self._products[key] + rate * rate * self._sizes
+            mean = self.records / self.units
+            variance = correction * residuals / ((self.units - 1) * self.units * mean * mean)
+            if variance > 0:
+                size = rate * (1 - rate) / variance
+
+        low, high = wilson(rate, size)
+        return Estimate(rule, id, violations, rate, low, high, total)
+
+
+def wilson(rate: float, size: float, z: float = Z) -> tuple[float, float]:
+    """Computes the Wilson score interval of a proportion.
+
+    Args:
+        rate (float): The observed proportion.
+        size (float): The (effective) sample size.
+        z (float): The normal quantile of the confidence level.
+
+    Returns:
+        tuple[float, float]: The lower and upper bound.
+    """
+    denominator = 1 + z * z / size
+    center = (rate + z * z / (2 * size)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / size + z * z / (4 * size * size)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def get_sample_size(error: float, z: float = Z) -> int:
+    """The number of records that estimates any rate to within an error, at the 95% confidence level.
+
+    Args:
+        error (float): The largest acceptable distance from the estimate to the bounds of its interval.
+        z (float): The normal quantile of the confidence level.
+
+    Returns:
+        int: The sample size needed for a rate of 50%, the hardest to estimate.
+    """
+    return math.ceil(z * z / (4 * error * error))
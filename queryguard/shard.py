@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import click
+
+from queryguard.exceptions import RuleViolation
+from queryguard.files import File
+
+logger = logging.getLogger(__name__)
+
+STATUSES = {"Passed": "Passed ✅", "Failed": "Failed ❌", "Skipped": "Skipped ⚠️", "Not Run": "Not Run"}
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Reads a shard given as "i/N", the i-th of N shards counting from 1.
+
+    Args:
+        value (str): The shard.
+
+    Returns:
+        tuple[int, int]: The index of the shard, counting from 0, and the number of shards.
+
+    Raises:
+        click.ClickException: If the shard isn't valid.
+    """
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise click.ClickException(f"Invalid shard {value}, expected i/N such as 1/4") from None
+
+    if not 1 <= index <= count:
+        raise click.ClickException(f"Invalid shard {value}, the index must be between 1 and {count}")
+
+    return index - 1, count
+
+
+def partition(items: Sequence[tuple[str, int]], count: int) -> list[int]:
+    """Assigns items to shards so that the shards have about the same total size.
+
+    The largest items are assigned first, each to the shard with the smallest total so far. Ties are broken by
+    name and shard number, so every runner computes the same assignment from the same items, regardless of their
+    order.
+
+    Args:
+        items (Sequence[tuple[str, int]]): The name and size of each item.
+        count (int): The number of shards.
+
+    Returns:
+        list[int]: The shard of each item.
+    """
+    shards = [0] * len(items)
+    totals = [(0, shard) for shard in range(count)]
+    for position in sorted(range(len(items)), key=lambda x: (-items[x][1], items[x][0])):
+        total, shard = heapq.heappop(totals)
+        shards[position] = shard
+        heapq.heappush(totals, (total + max(items[position][1], 1), shard))
+
+    return shards
+
+
+def select_shard(files: list[File], sizes: Iterable[int], index: int, count: int) -> list[File]:
+    """Picks the files of one shard, keeping their order.
+
+    Args:
+        files (list[File]): All files.
+        sizes (Iterable[int]): The size of each file in bytes.
+        index (int): The index of the shard, counting from 0.
+        count (int): The number of shards.
+
+    Returns:
+        list[File]: The files of the shard.
+    """
+    shards = partition([(str(file.path), size) for file, size in zip(files, sizes)], count)
+    selected = [file for file, shard in zip(files, shards) if shard == index]
+    logger.debug(f"Shard {index + 1}/{count} has {len(selected)} of {len(files)} files")
+    return selected
+
+
+def load_report(path: Path) -> list[File]:
+    """Reads the files and their verdicts from a report written with the json output format.
+
+    Args:
+        path (Path): The path to the report, or "-" for standard input.
+
+    Returns:
+        list[File]: The files.
+
+    Raises:
+        click.ClickException: If the report can't be read.
+    """
+    try:
+        data = click.get_binary_stream("stdin").read() if str(path) == "-" else path.read_bytes()
+        return [_load_file(values) for values in json.loads(data)]
+    except OSError as e:
+        raise click.ClickException(f"Unable to read report {path}: {e}") from e
+    except (ValueError, KeyError, TypeError) as e:
+        raise click.ClickException(f"Invalid report {path}: {e!r}") from e
+
+
+def merge_reports(paths: Iterable[Path]) -> list[File]:
+    """Combines the reports of several shards into one.
+
+    Args:
+        paths (Iterable[Path]): The paths to the reports.
+
+    Returns:
+        list[File]: The files of all reports. A file that is in more than one report is only kept once.
+    """
+    files: dict[str, File] = {}
+    for path in paths:
+        for file in load_report(path):
+            files.setdefault(str(file.path), file)
+
+    return list(files.values())
+
+
+def _load_file(values: dict[str, Any]) -> File:
+    file = File(Path(values["path"]))
+    file.status = STATUSES.get(values["status"], values["status"])
+    file.reason = values.get("reason")
+    for violation in values["violations"]:
+        file.violations.append(RuleViolation(violation["name"], violation["id"], violation["statement"]))
+
+    return file
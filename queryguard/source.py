@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import codecs
+import logging
+import mmap
+import os
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+from queryguard.exceptions import SNIPPET_LENGTH, SkippedFile
+from queryguard.parser import SQLParser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODINGS = ("cp1252",)
+SAMPLE_SIZE = 8192
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+_ASCII_PROBE = "\r\n\t '-*/GOgo0123456789"
+
+
+def sniff_encoding(data: bytes) -> tuple[None | str, int]:
+    """Detects the encoding of raw file contents from its byte order mark and byte patterns.
+
+    Files without a byte order mark are recognized as UTF-16 when their NUL bytes are concentrated on either the
+    even or the odd positions, as is the case for mostly ASCII text. Any other NUL bytes indicate a binary file.
+
+    Args:
+        data (bytes): The beginning of the raw file contents.
+
+    Returns:
+        tuple[None | str, int]: The detected encoding, or None when the encoding can't be determined from the bytes
+            alone, and the length of the byte order mark.
+
+    Raises:
+        SkippedFile: If the contents look like a binary file.
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding, len(bom)
+
+    sample = data[:SAMPLE_SIZE]
+    if b"\x00" not in sample:
+        return None, 0
+
+    half = len(sample) // 2 or 1
+    even_nuls = sample[0::2].count(0)
+    odd_nuls = sample[1::2].count(0)
+    if odd_nuls > half * 0.3 and even_nuls < half * 0.05:
+        return "utf-16-le", 0
+    if even_nuls > half * 0.3 and odd_nuls < half * 0.05:
+        return "utf-16-be", 0
+
+    raise SkippedFile("binary file")
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    """Checks whether SQL separators are encoded as plain ASCII bytes in the given encoding.
+
+    Args:
+        encoding (str): The name of the encoding.
+
+    Returns:
+        bool: True if the raw bytes can be scanned for batches without decoding them.
+    """
+    return _ASCII_PROBE.encode(encoding) == _ASCII_PROBE.encode("ascii")
+
+
+class Source:
+    """The raw contents of a file and their encoding.
+
+    Files are memory-mapped rather than copied into memory. For encodings compatible with ASCII the batches are
+    found by scanning the raw bytes and only one batch at a time is decoded. All offsets refer to bytes in the raw
+    contents, so text is only copied out of the file when it is needed.
+
+    Attributes:
+        path (Path): The path to the file.
+        encoding (str): The encoding of the contents.
+        start (int): The offset at which the contents begin, after any byte order mark.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        data: None | bytes | memoryview = None,
+        encodings: Iterable[str] = DEFAULT_ENCODINGS,
+        release: None | Callable[[], None] = None,
+    ) -> None:
+        """Initializes the Source class.
+
+        Args:
+            path (Path): The path to the file.
+            data (None | bytes | memoryview): The raw contents, if they were already read. Defaults to mapping the
+                file.
+            encodings (Iterable[str]): Fallback encodings for files that aren't valid UTF-8.
+            release (None | Callable[[], None]): Called when the source is closed, to hand back a reused buffer.
+
+        Raises:
+            SkippedFile: If the contents look like a binary file.
+        """
+        self.path = path
+        self._data: None | bytes | memoryview | mmap.mmap = data
+        self._release = release
+        self._fallbacks = list(encodings)
+        sniffed, self.start = sniff_encoding(bytes(self.buffer[:SAMPLE_SIZE]))
+        self._sniffed = sniffed is not None
+        self.encoding = sniffed or "utf-8"
+
+    def __repr__(self) -> str:
+        return f"Source(path={self.path}, encoding={self.encoding})"
+
+    def __enter__(self) -> Source:
+        return self
+
+    def __exit__(
+        self, exc_type: None | type[BaseException], exc_value: None | BaseException, traceback: None | TracebackType
+    ) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_release"] = None
+        if isinstance(self._data, (memoryview, mmap.mmap)):
+            state["_data"] = None
+
+        return state
+
+    @classmethod
+    def read(cls: type[Source], path: Path, encodings: Iterable[str] = DEFAULT_ENCODINGS, max_size: int = 0) -> Source:
+        """Opens a file for evaluation without copying its contents into memory.
+
+        Args:
+            path (Path): The path to the file.
+            encodings (Iterable[str]): Fallback encodings for files that aren't valid UTF-8.
+            max_size (int): Files larger than this many bytes are skipped without being read. 0 disables the limit.
+
+        Returns:
+            Source: The file contents.
+
+        Raises:
+            SkippedFile: If the file is oversized or binary.
+        """
+        if max_size and path.stat().st_size > max_size:
+            raise SkippedFile(f"larger than {max_size} bytes")
+
+        return cls(path, encodings=encodings)
+
+    @property
+    def buffer(self) -> bytes | memoryview | mmap.mmap:
+        """The raw contents, mapping the file into memory on first use."""
+        if self._data is None:
+            with self.path.open(mode="rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        return self._data
+
+    @property
+    def text(self) -> str:
+        """The decoded contents."""
+        return self.decode(self.buffer[self.start :])
+
+    def close(self) -> None:
+        """Unmaps the file or hands back its buffer. Snippets can still be read afterwards.
+
+        Returns:
+            None
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+        if isinstance(self._data, memoryview):
+            self._data.release()
+
+        if isinstance(self._data, (memoryview, mmap.mmap)):
+            self._data = None
+
+        if self._release:
+            self._release()
+            self._release = None
+
+    def decode(self, data: bytes | memoryview) -> str:
+        """Decodes raw bytes, switching to the first fallback encoding that fits when they aren't valid UTF-8.
+
+        Args:
+            data (bytes | memoryview): Raw bytes taken from the contents.
+
+        Returns:
+            str: The decoded text.
+
+        Raises:
+            SkippedFile: If the bytes can't be decoded.
+        """
+        try:
+            return str(data, self.encoding, "strict")
+        except UnicodeDecodeError:
+            if self._sniffed:
+                raise SkippedFile(f"invalid {self.encoding}") from None
+
+        for encoding in self._fallbacks:
+            try:
+                text = str(data, encoding, "strict")
+            except (UnicodeDecodeError, LookupError):
+                logger.debug(f"Unable to decode contents of {self.path} as {encoding}")
+                continue
+
+            self.encoding = encoding
+            self._fallbacks = self._fallbacks[self._fallbacks.index(encoding) :]
+            return text
+
+        raise SkippedFile("unknown encoding")
+
+    def batches(self) -> Iterator[tuple[int, str]]:
+        """Yields the GO batches of the contents, decoding one batch at a time where possible.
+
+        Yields:
+            Iterator[tuple[int, str]]: The byte offset and decoded text of each batch.
+        """
+        buffer = self.buffer
+        if is_ascii_compatible(self.encoding):
+            starts = SQLParser.get_batch_starts(buffer, self.start)
+            for start, end in zip(starts, [*starts[1:], len(buffer)]):
+                yield start, self.decode(buffer[start:end])
+
+            return
+
+        offset = self.start
+        for _, text in SQLParser.split_batches(self.decode(buffer[self.start :])):
+            yield offset, text
+            offset += len(text.encode(self.encoding))
+
+    def byte_offset(self, offset: int, text: str, position: int) -> int:
+        """Converts a position in a decoded batch into an offset in the raw contents.
+
+        Args:
+            offset (int): The byte offset of the batch.
+            text (str): The decoded text of the batch.
+            position (int): The position in the decoded text.
+
+        Returns:
+            int: The byte offset in the raw contents.
+        """
+        return offset + len(text[:position].encode(self.encoding))
+
+    def snippet(self, offset: int, length: int = SNIPPET_LENGTH, end: None | int = None) -> str:
+        """Copies a short piece of text out of the contents.
+
+        Args:
+            offset (int): The byte offset at which the snippet begins.
+            length (int): The maximum number of characters.
+            end (None | int): The byte offset the snippet doesn't extend past, if any.
+
+        Returns:
+            str: The decoded snippet.
+        """
+        size = length * 4
+        if end is not None:
+            size = max(min(size, end - offset), 0)
+        if self._data is not None:
+            data = bytes(self._data[offset : offset + size])
+        else:
+            with self.path.open(mode="rb") as f:
+                f.seek(offset)
+                data = f.read(size)
+
+        return data.decode(self.encoding, errors="replace")[:length]
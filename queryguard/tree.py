@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from queryguard.cache import write_atomic
+from queryguard.files import File
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+class TreeCache:
+    """A directory-level cache of file verdicts that skips unchanged subtrees.
+
+    Every directory is recorded with its modification time, the verdicts of its files and an aggregate digest of
+    the verdicts in its subtree. A directory whose modification time is unchanged is trusted with its whole
+    subtree without listing or stat'ing anything below it, until the oldest record in the subtree is older than
+    max_age. Editing a file in place doesn't change the modification time of its directory, so such edits are only
+    noticed once the directory is revalidated.
+
+    When a directory is revalidated its entries are listed again, and files whose size and modification time are
+    unchanged keep their verdict.
+
+    Attributes:
+        path (Path): The file holding the tree.
+        max_age (float): Seconds for which a directory is trusted without being listed.
+        reused (int): The number of files whose verdicts were reused.
+        scanned (int): The number of directories that were listed.
+    """
+
+    def __init__(self, directory: Path, root: Path, salt: str, max_age: float) -> None:
+        """Initializes the TreeCache class.
+
+        Args:
+            directory (Path): The cache directory.
+            root (Path): The directory being evaluated.
+            salt (str): Identifies the rules and settings the verdicts depend on.
+            max_age (float): Seconds for which a directory is trusted without being listed.
+        """
+        key = hashlib.blake2b(f"{FORMAT_VERSION}|{root.resolve()}|{salt}".encode(), digest_size=16).hexdigest()
+        self.path = directory / "tree" / f"{key}.json"
+        self.root = root
+        self.max_age = max_age
+        self.reused = 0
+        self.scanned = 0
+        self._node: dict[str, Any] = {}
+        self._pending: dict[Path, tuple[dict[str, Any], str]] = {}
+        try:
+            self._node = json.loads(self.path.read_bytes())
+        except (OSError, ValueError) as e:
+            logger.debug(f"No directory cache for {root}: {e}")
+
+    def __repr__(self) -> str:
+        return f"TreeCache(root={self.root}, reused={self.reused}, scanned={self.scanned})"
+
+    @property
+    def digest(self) -> None | str:
+        """The aggregate digest of all verdicts, once they are known."""
+        return self._node.get("digest")
+
+    def get_files(self) -> list[File]:
+        """Lists the SQL files below the root, restoring the verdicts of files in unchanged subtrees.
+
+        Returns:
+            list[File]: The files. Files that still have to be evaluated have the status "Not Run".
+        """
+        files: list[File] = []
+        self._node = self._collect(self.root, self._node, time.time(), files)
+        return files
+
+    def update(self, files: Iterable[File]) -> None:
+        """Records the verdicts of evaluated files and writes the tree. Failures to write are logged.
+
+        Args:
+            files (Iterable[File]): The files returned by get_files, after they were evaluated.
+
+        Returns:
+            None
+        """
+        for file in files:
+            pending = self._pending.pop(file.path, None)
+            if pending is not None:
+                node, name = pending
+                verdict = file.to_dict()
+                del verdict["path"]
+                node["files"][name].update(verdict)
+
+        if self._pending:
+            logger.debug(f"Not writing directory cache, {len(self._pending)} files weren't evaluated")
+            return
+
+        _update_digest(self._node)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(self.path, json.dumps(self._node, separators=(",", ":")).encode())
+        except OSError as e:
+            logger.debug(f"Unable to write directory cache {self.path}: {e}")
+
+    def _collect(self, directory: Path, node: dict[str, Any], now: float, files: list[File]) -> dict[str, Any]:
+        mtime = os.stat(directory).st_mtime_ns
+        if node.get("mtime") == mtime and now - node.get("oldest", 0) < self.max_age and "digest" in node:
+            self._restore(directory, node, files)
+            return node
+
+        self.scanned += 1
+        scanned: dict[str, Any] = {"mtime": mtime, "checked": now, "files": {}, "dirs": {}}
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda x: x.name):
+                if entry.is_dir():
+                    scanned["dirs"][entry.name] = self._collect(
+                        Path(entry.path), node.get("dirs", {}).get(entry.name, {}), now, files
+                    )
+                elif entry.name.endswith(".sql") and entry.is_file():
+                    stat = entry.stat()
+                    known = node.get("files", {}).get(entry.name, {})
+                    if known.get("mtime") == stat.st_mtime_ns and known.get("size") == stat.st_size:
+                        scanned["files"][entry.name] = known
+                        files.append(File.from_dict({"path": entry.path, **known}))
+                        self.reused += 1
+                    else:
+                        scanned["files"][entry.name] = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+                        self._pending[Path(entry.path)] = (scanned, entry.name)
+                        files.append(File(Path(entry.path)))
+
+        return scanned
+
+    def _restore(self, directory: Path, node: dict[str, Any], files: list[File]) -> None:
+        for name, verdict in node["files"].items():
+            files.append(File.from_dict({"path": str(directory / name), **verdict}))
+            self.reused += 1
+
+        for name, child in node["dirs"].items():
+            self._restore(directory / name, child, files)
+
+
+def _update_digest(node: dict[str, Any]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for name, verdict in sorted(node["files"].items()):
+        values = {key: value for key, value in verdict.items() if key not in ("mtime", "size")}
+        digest.update(f"f|{name}|{json.dumps(values, sort_keys=True)}\0".encode())
+
+    oldest = node["checked"]
+    for name, child in sorted(node["dirs"].items()):
+        digest.update(f"d|{name}|{_update_digest(child)}\0".encode())
+        oldest = min(oldest, child["oldest"])
+
+    node["oldest"] = oldest
+    node["digest"] = digest.hexdigest()
+    return digest.hexdigest()
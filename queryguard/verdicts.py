@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Iterable
+from itertools import islice
+from pathlib import Path
+
+from queryguard import rules
+from queryguard.cache import PARSER_VERSION, ruleset_fingerprint
+from queryguard.exceptions import SNIPPET_LENGTH, RuleViolation
+from queryguard.files import check_statements
+from queryguard.parser import DEFAULT_LITERAL_LIMIT, ElidedQuery, SQLParser
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+FRONT_SIZE = 1 << 16
+LOOKUP_BATCH = 500
+MAX_VERDICTS = 1 << 20
+
+# The rule, rule id, start and end of each statement of a shape that violates a rule, in the shape.
+Verdict = tuple[tuple[str, str, int, int], ...]
+
+
+class VerdictStore:
+    """A persistent store of the violations of statement shapes, for one set of rules.
+
+    Applications run the same parameterized statements over and over, so most statements of a query log have a shape
+    that was checked before. Verdicts are looked up by a fingerprint of the shape in batches, first in an in-memory
+    front cache of the most recently used verdicts and then in a SQLite database, and only the shapes found in
+    neither are parsed. Verdicts are stored per rule set, by a hash of the rule implementations and the parser
+    settings, so changing a rule doesn't reuse outdated verdicts.
+
+    Attributes:
+        path (Path): The SQLite database.
+        key (str): The hash of the rule set and the parser settings.
+        hits (int): The number of verdicts found in the front cache.
+        loaded (int): The number of verdicts read from the database.
+        misses (int): The number of verdicts not found.
+        stored (int): The number of verdicts written to the database.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        rules: Iterable[type[rules.BaseRule]],
+        literal_limit: int = DEFAULT_LITERAL_LIMIT,
+        front_size: int = FRONT_SIZE,
+    ) -> None:
+        """Initializes the VerdictStore class and opens the database, creating it if needed.
+
+        Args:
+            path (Path): The SQLite database.
+            rules (Iterable[type[rules.BaseRule]]): The rule classes verdicts are stored for.
+            literal_limit (int): The longest string literal that is lexed verbatim.
+            front_size (int): The most verdicts kept in memory.
+
+        Raises:
+            sqlite3.Error: If the database can't be opened.
+        """
+        self.path = path
+        self.key = hashlib.blake2b(
+            f"{SCHEMA_VERSION}|{PARSER_VERSION}|{literal_limit}|{ruleset_fingerprint(rules)}".encode(), digest_size=16
+        ).hexdigest()
+        self.hits = 0
+        self.loaded = 0
+        self.misses = 0
+        self.stored = 0
+        self._front_size = front_size
+        self._front: OrderedDict[bytes, Verdict] = OrderedDict()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        try:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts "
+                "(ruleset TEXT NOT NULL, fingerprint BLOB NOT NULL, verdict TEXT NOT NULL, "
+                "UNIQUE (ruleset, fingerprint))"
+            )
+        except sqlite3.Error:
+            self._connection.close()
+            raise
+
+    def __repr__(self) -> str:
+        return (
+            f"VerdictStore({self.path}, hits={self.hits}, loaded={self.loaded}, misses={self.misses}, "
+            f"stored={self.stored})"
+        )
+
+    def __enter__(self) -> VerdictStore:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def get(self, fingerprints: Iterable[bytes]) -> dict[bytes, Verdict]:
+        """Looks up the verdicts of shapes.
+
+        Args:
+            fingerprints (Iterable[bytes]): The fingerprints of the shapes.
+
+        Returns:
+            dict[bytes, Verdict]: The verdicts found, by fingerprint.
+        """
+        found: dict[bytes, Verdict] = {}
+        missing: list[bytes] = []
+        for fingerprint in dict.fromkeys(fingerprints):
+            verdict = self._front.get(fingerprint)
+            if verdict is None:
+                missing.append(fingerprint)
+            else:
+                self._front.move_to_end(fingerprint)
+                found[fingerprint] = verdict
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        iterator = iter(missing)
+        while batch := list(islice(iterator, LOOKUP_BATCH)):
+            try:
+                rows = self._connection.execute(
+                    "SELECT fingerprint, verdict FROM verdicts "  # noqa: S608
+                    f"WHERE ruleset = ? AND fingerprint IN ({','.join('?' * len(batch))})",
+                    (self.key, *batch),
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Unable to read verdicts from {self.path}: {e}")
+                break
+
+            for fingerprint, data in rows:
+                verdict = tuple(tuple(x) for x in json.loads(data))
+                self._remember(fingerprint, verdict)
+                found[fingerprint] = verdict
+                self.loaded += 1
+                self.misses -= 1
+
+        return found
+
+    def put(self, verdicts: dict[bytes, Verdict]) -> None:
+        """Stores the verdicts of shapes that were checked.
+
+        Args:
+            verdicts (dict[bytes, Verdict]): The verdicts by fingerprint.
+
+        Returns:
+            None
+        """
+        for fingerprint, verdict in verdicts.items():
+            self._remember(fingerprint, verdict)
+
+        rows = [(self.key, fingerprint, json.dumps(verdict)) for fingerprint, verdict in verdicts.items()]
+        try:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Unable to store verdicts in {self.path}: {e}")
+            return
+
+        self.stored += len(rows)
+
+    def close(self) -> None:
+        """Discards the oldest verdicts beyond MAX_VERDICTS and closes the database.
+
+        Returns:
+            None
+        """
+        try:
+            self._connection.execute(
+                "DELETE FROM verdicts WHERE rowid <= (SELECT MAX(rowid) FROM verdicts) - ?", (MAX_VERDICTS,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Unable to prune verdicts in {self.path}: {e}")
+
+        self._connection.close()
+
+    def _remember(self, fingerprint: bytes, verdict: Verdict) -> None:
+        self._front[fingerprint] = verdict
+        self._front.move_to_end(fingerprint)
+        if len(self._front) > self._front_size:
+            self._front.popitem(last=False)
+
+
+def get_shape(text: str) -> tuple[bytes, ElidedQuery]:
+    """Reduces SQL text to its shape, see SQLParser.normalize, and fingerprints it.
+
+    Args:
+        text (str): The SQL text.
+
+    Returns:
+        tuple[bytes, ElidedQuery]: The fingerprint and the shape.
+    """
+    shape = SQLParser.normalize(text)
+    return hashlib.blake2b(shape.text.encode(), digest_size=16).digest(), shape
+
+
+def get_verdict(shape: str, rules: list[type[rules.BaseRule]], literal_limit: int = DEFAULT_LITERAL_LIMIT) -> Verdict:
+    """Checks the shape of SQL text against rules.
+
+    Args:
+        shape (str): The shape of the text.
+        rules (list[type[rules.BaseRule]]): The rule classes to evaluate.
+        literal_limit (int): The longest string literal that is lexed verbatim.
+
+    Returns:
+        Verdict: The statements of the shape violating each rule.
+    """
+    statements = SQLParser.get_all_statements(shape, literal_limit)
+    return tuple(
+        (violation.rule, violation.id, violation.offset or 0, len(shape) if violation.end is None else violation.end)
+        for violation in check_statements(statements, rules)
+    )
+
+
+def get_violations(verdict: Verdict, text: str, shape: ElidedQuery) -> list[RuleViolation]:
+    """Converts a verdict of a shape to the violations of a text of that shape.
+
+    Args:
+        verdict (Verdict): The verdict of the shape.
+        text (str): The SQL text.
+        shape (ElidedQuery): The shape of the text.
+
+    Returns:
+        list[RuleViolation]: The violations, with the statements copied out of the text.
+    """
+    violations = []
+    for rule, id, start, end in verdict:
+        offset = shape.original_offset(start)
+        violation = RuleViolation(rule, id, text[offset : shape.original_offset(end)][:SNIPPET_LENGTH])
+        violation.offset = offset
+        violations.append(violation)
+
+    return violations
@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from types import TracebackType
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 1.0
+MAX_DELAY = 5.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT = struct.Struct("iIII")
+
+# The paths of the sql files that changed, or None if the changes are unknown and everything needs to be rescanned.
+Changes = Union[None, set[Path]]
+
+
+class PollingWatcher:
+    """Finds changed sql files by comparing the size and modification time of all files at an interval.
+
+    Attributes:
+        paths (list[Path]): The files and directories watched.
+        interval (float): The seconds between two scans.
+    """
+
+    def __init__(self, paths: Iterable[Path], interval: float = POLL_INTERVAL) -> None:
+        """Initializes the PollingWatcher class and takes the first snapshot.
+
+        Args:
+            paths (Iterable[Path]): The files and directories to watch.
+            interval (float): The seconds between two scans.
+        """
+        self.paths = list(paths)
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._scanned = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f"PollingWatcher({len(self._snapshot)} files)"
+
+    def __enter__(self) -> PollingWatcher:
+        return self
+
+    def __exit__(
+        self, exc_type: None | type[BaseException], exc_value: None | BaseException, traceback: None | TracebackType
+    ) -> None:
+        self.close()
+
+    def read(self, timeout: None | float) -> Changes:
+        """Waits for changes until the timeout.
+
+        Args:
+            timeout (None | float): The seconds to wait, None to wait until something changed.
+
+        Returns:
+            Changes: The changed files, empty if nothing changed before the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wake = self._scanned + self.interval
+            if deadline is not None and deadline < wake:
+                time.sleep(max(deadline - time.monotonic(), 0))
+                return set()
+
+            time.sleep(max(wake - time.monotonic(), 0))
+            snapshot = self._scan()
+            self._scanned = time.monotonic()
+            changed = {
+                Path(path)
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        """Stops watching.
+
+        Returns:
+            None
+        """
+        self._snapshot = {}
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in self.paths:
+            for file in path.glob("**/*.sql") if path.is_dir() else [path]:
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+
+                snapshot[str(file)] = (stat.st_size, stat.st_mtime_ns)
+
+        return snapshot
+
+
+class InotifyWatcher:
+    """Finds changed sql files with inotify, which tells about changes as they happen instead of scanning.
+
+    Every directory below the watched directories gets a watch, including directories created later.
+
+    Attributes:
+        paths (list[Path]): The files and directories watched.
+    """
+
+    def __init__(self, paths: Iterable[Path]) -> None:
+        """Initializes the InotifyWatcher class and starts watching.
+
+        Args:
+            paths (Iterable[Path]): The files and directories to watch.
+
+        Raises:
+            OSError: If inotify isn't available or the limit of watches is reached.
+        """
+        self.paths = list(paths)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise _last_error("inotify_init1")
+
+        self._directories: dict[int, Path] = {}
+        self._files: dict[Path, set[str]] = {}
+        try:
+            for path in self.paths:
+                if path.is_dir():
+                    self._add_tree(path)
+                else:
+                    self._files.setdefault(path.parent, set()).add(path.name)
+                    self._add(path.parent)
+        except OSError:
+            self.close()
+            raise
+
+    def __repr__(self) -> str:
+        return f"InotifyWatcher({len(self._directories)} directories)"
+
+    def __enter__(self) -> InotifyWatcher:
+        return self
+
+    def __exit__(
+        self, exc_type: None | type[BaseException], exc_value: None | BaseException, traceback: None | TracebackType
+    ) -> None:
+        self.close()
+
+    def read(self, timeout: None | float) -> Changes:
+        """Waits for changes until the timeout.
+
+        Args:
+            timeout (None | float): The seconds to wait, None to wait until something changed.
+
+        Returns:
+            Changes: The changed files, empty if nothing changed before the timeout, None if events were lost.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not select.select([self._fd], [], [], remaining)[0]:
+                return set()
+
+            try:
+                data = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                continue
+
+            changed = self._parse(data)
+            if changed is None or changed:
+                return changed
+
+    def close(self) -> None:
+        """Stops watching.
+
+        Returns:
+            None
+        """
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _parse(self, data: bytes) -> Changes:
+        changed: set[Path] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT.size : offset + EVENT.size + length].rstrip(b"\0"))
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                logger.debug("Lost inotify events, rescanning")
+                return None
+
+            directory = self._directories.get(wd)
+            if directory is None:
+                continue
+
+            if mask & IN_IGNORED:
+                del self._directories[wd]
+                continue
+
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and directory not in self._files:
+                    # Files created before the watch was added don't raise events.
+                    changed.update(self._add_tree(path))
+                elif mask & IN_MOVED_FROM:
+                    return None
+            elif self._matches(directory, name):
+                changed.add(path)
+
+        return changed
+
+    def _matches(self, directory: Path, name: str) -> bool:
+        names = self._files.get(directory)
+        return name in names if names is not None else name.endswith(".sql")
+
+    def _add_tree(self, root: Path) -> list[Path]:
+        files: list[Path] = []
+        for directory, _, names in os.walk(root):
+            self._add(Path(directory))
+            files.extend(Path(directory) / name for name in names if name.endswith(".sql"))
+
+        return files
+
+    def _add(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            error = _last_error(f"inotify_add_watch {directory}")
+            if error.errno in (errno.ENOENT, errno.ENOTDIR):
+                return
+
+            raise error
+
+        self._directories[wd] = directory
+
+
+def get_watcher(paths: Iterable[Path]) -> InotifyWatcher | PollingWatcher:
+    """Starts watching files and directories, with inotify where it is available and by polling otherwise.
+
+    Args:
+        paths (Iterable[Path]): The files and directories to watch.
+
+    Returns:
+        InotifyWatcher | PollingWatcher: The watcher.
+    """
+    paths = list(paths)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except OSError as e:
+            logger.warning(f"Unable to watch with inotify, polling instead: {e}")
+
+    return PollingWatcher(paths)
+
+
+def wait_for_changes(
+    watcher: InotifyWatcher | PollingWatcher, debounce: float, max_delay: float = MAX_DELAY
+) -> Changes:
+    """Waits for changes, then collects further changes until none arrived for the debounce time.
+
+    Bulk changes, like switching branches, are so reported at once instead of file by file.
+
+    Args:
+        watcher (InotifyWatcher | PollingWatcher): The watcher.
+        debounce (float): The seconds without changes that end a batch of changes.
+        max_delay (float): The most seconds to collect changes for, so continuous changes are still reported.
+
+    Returns:
+        Changes: The changed files, or None if everything needs to be rescanned.
+    """
+    changed = watcher.read(None)
+    deadline = time.monotonic() + max_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return changed
+
+        more = watcher.read(min(debounce, remaining))
+        if more is not None and not more:
+            return changed
+
+        changed = None if more is None or changed is None else changed | more
+
+
+def _load_libc() -> ctypes.CDLL:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError(errno.ENOSYS, "inotify isn't supported")
+
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def _last_error(call: str) -> OSError:
+    number = ctypes.get_errno()
+    return OSError(number, f"{call}: {os.strerror(number)}")
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import contextlib
+import logging
+import multiprocessing
+import signal
+import time
+from collections.abc import Generator, Iterable
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Generic, TypeVar
+
+from queryguard import rules
+from queryguard.cache import Cache
+from queryguard.diff import LineRanges
+from queryguard.files import File
+from queryguard.source import DEFAULT_ENCODINGS, Source
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SHUTDOWN_TIMEOUT = 1.0
+
+
+class Watchdog:
+    """Evaluates files in worker processes that are stopped when a file takes too long or uses too much memory.
+
+    Each worker evaluates one file at a time. A worker that runs past the time budget is killed, and a worker that
+    runs out of memory exits, so one pathological file can neither stall the run nor take down QueryGuard. The file
+    is then skipped with a reason starting with "budget exceeded" and a new worker takes over. A file whose
+    evaluation raises an error, or whose worker exits on its own, is skipped with a reason naming the error instead.
+    Workers are also replaced after a number of files, to contain memory that accumulates over many files.
+
+    Attributes:
+        timeout (float): The seconds a file may take, 0 for no limit.
+        memory (int): The bytes of address space a worker may use, 0 for no limit.
+        recycle (int): The number of files after which a worker is replaced, 0 to keep workers.
+        workers (int): The number of files evaluated at the same time.
+        started (int): The number of workers started.
+        exceeded (int): The number of files that exceeded a budget.
+    """
+
+    def __init__(
+        self,
+        rules: list[type[rules.BaseRule]],
+        literal_limit: int,
+        encodings: Iterable[str] = DEFAULT_ENCODINGS,
+        max_size: int = 0,
+        cache: None | Cache = None,
+        timeout: float = 0,
+        memory: int = 0,
+        recycle: int = 0,
+        workers: int = 1,
+    ) -> None:
+        """Initializes the Watchdog class.
+
+        Args:
+            rules (list[type[rules.BaseRule]]): The rule classes to evaluate.
+            literal_limit (int): The longest string literal that is lexed verbatim.
+            encodings (Iterable[str]): Fallback encodings for files that aren't valid UTF-8.
+            max_size (int): Files larger than this many bytes are skipped without being read. 0 disables the limit.
+            cache (None | Cache): The cache the workers take recorded outcomes from and record new ones in.
+            timeout (float): The seconds a file may take, 0 for no limit.
+            memory (int): The bytes of address space a worker may use, 0 for no limit.
+            recycle (int): The number of files after which a worker is replaced, 0 to keep workers.
+            workers (int): The number of files evaluated at the same time.
+        """
+        if memory and resource is None:
+            logger.warning("Memory budgets aren't supported on this platform")
+            memory = 0
+
+        self.timeout = timeout
+        self.memory = memory
+        self.recycle = recycle
+        self.workers = max(workers, 1)
+        self.started = 0
+        self.exceeded = 0
+        self._options = {
+            "rules": rules,
+            "literal_limit": literal_limit,
+            "encodings": tuple(encodings),
+            "max_size": max_size,
+            "cache": (cache.root, literal_limit, tuple(encodings)) if cache else None,
+            "memory": memory,
+            "recycle": recycle,
+        }
+
+    def __repr__(self) -> str:
+        return f"Watchdog(timeout={self.timeout}, memory={self.memory}, recycle={self.recycle})"
+
+    def evaluate(self, items: Iterable[tuple[T, File]]) -> Generator[tuple[T, File], None, None]:
+        """Evaluates the files of the items, taking the next item whenever a worker is free.
+
+        Args:
+            items (Iterable[tuple[T, File]]): A key and a file to evaluate.
+
+        Returns:
+            Generator[tuple[T, File], None, None]: The items, in the order their files were evaluated.
+        """
+        pending = iter(items)
+        idle: list[_Worker[T]] = []
+        busy: dict[Connection, _Worker[T]] = {}
+        try:
+            while True:
+                while len(busy) < self.workers:
+                    item = next(pending, None)
+                    if item is None:
+                        break
+
+                    worker = idle.pop() if idle else self._start()
+                    worker.submit(*item)
+                    busy[worker.connection] = worker
+
+                if not busy:
+                    return
+
+                for connection in wait(list(busy), self._wait_time(busy.values())):
+                    worker = busy.pop(connection)  # type: ignore[arg-type]
+                    key, file = worker.receive()
+                    if worker.done(self.recycle):
+                        worker.stop()
+                    else:
+                        idle.append(worker)
+
+                    self.exceeded += file.reason is not None and file.reason.startswith("budget exceeded")
+                    yield key, file
+
+                now = time.monotonic()
+                for connection, worker in list(busy.items()):
+                    if self.timeout and now - worker.submitted > self.timeout:
+                        del busy[connection]
+                        worker.kill()
+                        key, file = worker.current()
+                        file.skip(f"budget exceeded: took longer than {self.timeout:g} s")
+                        self.exceeded += 1
+                        yield key, file
+        finally:
+            for worker in [*idle, *busy.values()]:
+                worker.stop()
+
+    def _start(self) -> _Worker[T]:
+        self.started += 1
+        return _Worker(self._options, self.memory)
+
+    def _wait_time(self, workers: Iterable[_Worker[T]]) -> None | float:
+        if not self.timeout:
+            return None
+
+        return max(min(worker.submitted for worker in workers) + self.timeout - time.monotonic(), 0)
+
+
+class _Worker(Generic[T]):
+    """A worker process and the item it is evaluating."""
+
+    def __init__(self, options: dict[str, Any], memory: int) -> None:
+        self.memory = memory
+        self.connection, child = multiprocessing.Pipe()
+        self.process: BaseProcess = multiprocessing.get_context().Process(target=_serve, args=(child, options))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.count = 0
+        self.submitted = 0.0
+        self._item: tuple[T, File]
+
+    def submit(self, key: T, file: File) -> None:
+        self._item = key, file
+        self.submitted = time.monotonic()
+        lines = list(file.changed_lines) if file.changed_lines is not None else None
+        self.connection.send((str(file.path), lines))
+
+    def current(self) -> tuple[T, File]:
+        return self._item
+
+    def receive(self) -> tuple[T, File]:
+        key, file = self.current()
+        self.count += 1
+        try:
+            result = self.connection.recv()
+        except (EOFError, OSError):
+            self.process.join(SHUTDOWN_TIMEOUT)
+            code = self.process.exitcode
+            if code is not None and code < 0:
+                # Workers are killed by signals when they overrun the memory limit, for instance by SIGSEGV.
+                file.skip(f"budget exceeded: the worker was stopped by {_signal_name(-code)}")
+            else:
+                file.skip(f"the worker crashed with exit code {code}")
+
+            self.count = -1
+            return key, file
+
+        if result is None:
+            file.skip(f"budget exceeded: used more than {self.memory >> 20} MB")
+            self.count = -1
+        elif isinstance(result, str):
+            file.skip(f"the worker failed: {result}")
+        else:
+            restored = File.from_dict(result)
+            file.status, file.reason, file.violations = restored.status, restored.reason, restored.violations
+
+        return key, file
+
+    def done(self, recycle: int) -> bool:
+        return self.count < 0 or (recycle > 0 and self.count >= recycle)
+
+    def stop(self) -> None:
+        with contextlib.suppress(OSError):
+            self.connection.send(None)
+
+        self.process.join(SHUTDOWN_TIMEOUT)
+        if self.process.is_alive():
+            self.kill()
+
+        self.connection.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+def _serve(connection: Connection, options: dict[str, Any]) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if options["memory"]:
+        resource.setrlimit(resource.RLIMIT_AS, (options["memory"], options["memory"]))
+
+    cache = Cache(*options["cache"]) if options["cache"] else None
+    count = 0
+    while not options["recycle"] or count < options["recycle"]:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+
+        if task is None:
+            return
+
+        path, lines = task
+        file = File(Path(path), changed_lines=None if lines is None else LineRanges((x, y) for x, y in lines))
+        result: str | dict[str, Any]
+        try:
+            file.evaluate(
+                options["rules"],
+                options["literal_limit"],
+                reader=lambda x: Source.read(x, options["encodings"], options["max_size"]),
+                cache=cache,
+            )
+            result = file.to_dict()
+        except MemoryError:
+            connection.send(None)
+            return
+        except Exception as e:
+            # An error in a rule or the parser only fails this file, with a reason naming the error.
+            result = repr(e)
+
+        connection.send(result)
+        count += 1
+
+
+def _signal_name(number: int) -> str:
+    try:
+        return signal.Signals(number).name
+    except ValueError:
+        return f"signal {number}"
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import click
+
+from queryguard.cache import write_atomic
+from queryguard.diff import LineRanges
+from queryguard.files import File
+
+logger = logging.getLogger(__name__)
+
+LEASE = 300
+
+
+class WorkQueue:
+    """A queue of files in a shared directory, that several processes on one or more hosts take work from.
+
+    The first process creates the queue in a temporary directory and renames it into place, so the queue appears
+    complete or not at all. Each item is a file in pending/, which a worker claims by renaming it to claimed/, so
+    only one worker gets it. The verdict is written to results/ and the claim is removed. No process coordinates
+    the others, and a worker that is started late simply finds less work.
+
+    A claim is a lease: its modification time is renewed by a background thread while the worker holds it. A worker
+    that runs out of pending items takes over the claims that weren't renewed within the lease, so the items of a
+    worker that was killed or lost its host are checked by the others, or by a worker started later.
+
+    Attributes:
+        root (Path): The queue directory.
+        worker (str): The name of this worker, which claimed items carry.
+        lease (float): The seconds after which a claim that wasn't renewed is taken over.
+        claimed (int): The number of items this worker claimed.
+        reclaimed (int): The number of expired claims of other workers this worker took over.
+    """
+
+    def __init__(self, root: Path, worker: None | str = None, lease: float = LEASE) -> None:
+        """Initializes the WorkQueue class.
+
+        Args:
+            root (Path): The queue directory.
+            worker (None | str): The name of this worker. Defaults to the host name and process id.
+            lease (float): The seconds after which a claim that wasn't renewed is taken over. It has to be well
+                above the difference between the clocks of the hosts sharing the queue.
+        """
+        self.root = root
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease = lease
+        self.claimed = 0
+        self.reclaimed = 0
+        self._claims: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat: None | threading.Thread = None
+
+    def __repr__(self) -> str:
+        return f"WorkQueue({self.root})"
+
+    def create(self, files: list[File], sizes: list[int]) -> bool:
+        """Creates the queue unless another process already did.
+
+        Files that still have to be evaluated are queued largest first, so small files fill the gaps at the end.
+        The verdicts of files that were already evaluated are stored as results right away.
+
+        Args:
+            files (list[File]): The files to check.
+            sizes (list[int]): The size of each file in bytes.
+
+        Returns:
+            bool: True if this process created the queue.
+
+        Raises:
+            click.ClickException: If the queue directory is in use for something else.
+        """
+        if (self.root / "manifest.json").is_file():
+            return False
+
+        self.root.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.root.parent, prefix=f".{self.root.name}-"))
+        try:
+            for name in ("pending", "claimed", "results"):
+                (staging / name).mkdir()
+
+            order = sorted(range(len(files)), key=lambda x: (-sizes[x], str(files[x].path)))
+            for number, position in enumerate(order):
+                file = files[position]
+                if file.status == "Not Run":
+                    (staging / "pending" / f"{number:08d}").write_text(json.dumps(_to_item(file)), encoding="utf-8")
+                else:
+                    (staging / "results" / f"{number:08d}.json").write_text(json.dumps(file.to_dict()))
+
+            (staging / "manifest.json").write_text(json.dumps({"items": len(files)}))
+            os.rename(staging, self.root)
+        except OSError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not (self.root / "manifest.json").is_file():
+                raise click.ClickException(f"Unable to create work queue {self.root}: {e}") from e
+
+            return False
+
+        logger.debug(f"Created work queue {self.root} with {len(files)} items")
+        return True
+
+    def claim(self) -> Iterator[tuple[str, File]]:
+        """Claims the pending items one at a time, skipping items that other workers claimed first.
+
+        Once no item is pending, the items whose claim expired are claimed too.
+
+        Returns:
+            Iterator[tuple[str, File]]: The name and file of each item this worker claimed.
+        """
+        for name in sorted(os.listdir(self.root / "pending")):
+            file = self._take(self.root / "pending" / name, name)
+            if file is not None:
+                yield name, file
+
+        for entry in self._expired():
+            name, _, worker = entry.partition(".")
+            file = self._take(self.root / "claimed" / entry, name)
+            if file is not None:
+                logger.warning(f"Took over {file.path} from {worker}, whose claim expired")
+                self.reclaimed += 1
+                yield name, file
+
+    def finish(self, name: str, file: File) -> None:
+        """Stores the verdict of a claimed item and releases the claim.
+
+        Args:
+            name (str): The name of the item.
+            file (File): The evaluated file.
+
+        Returns:
+            None
+
+        Raises:
+            click.ClickException: If the result can't be written.
+        """
+        try:
+            write_atomic(self.root / "results" / f"{name}.json", json.dumps(file.to_dict()).encode())
+            (self.root / "claimed" / f"{name}.{self.worker}").unlink(missing_ok=True)
+            with self._lock:
+                self._claims.discard(name)
+        except OSError as e:
+            raise click.ClickException(f"Unable to store the result of {file.path} in {self.root}: {e}") from e
+
+    def release(self) -> None:
+        """Puts the items this worker claimed but didn't finish back, for another worker to take.
+
+        Returns:
+            None
+        """
+        self._stopped.set()
+        if self._heartbeat:
+            self._heartbeat.join()
+
+        for name in sorted(self._claims):
+            try:
+                os.rename(self.root / "claimed" / f"{name}.{self.worker}", self.root / "pending" / name)
+            except OSError as e:
+                logger.debug(f"Unable to release {name} in {self.root}: {e}")
+
+        self._claims.clear()
+
+    def results(self) -> list[File]:
+        """Collects the verdicts of all items, in queue order.
+
+        Returns:
+            list[File]: The evaluated files.
+
+        Raises:
+            click.ClickException: If the queue doesn't exist or items are still pending or claimed.
+        """
+        try:
+            items = json.loads((self.root / "manifest.json").read_text())["items"]
+            names = sorted(x for x in os.listdir(self.root / "results") if x.endswith(".json") and x[0] != ".")
+            unfinished = len(os.listdir(self.root / "pending")) + len(os.listdir(self.root / "claimed"))
+        except (OSError, ValueError, KeyError) as e:
+            raise click.ClickException(f"Invalid work queue {self.root}: {e}") from e
+
+        if unfinished or len(names) != items:
+            expired = len(self._expired())
+            raise click.ClickException(
+                f"Work queue {self.root} isn't finished, {items - len(names)} of {items} items have no result"
+                + (f", {expired} claims expired, run a worker on the queue to check them" if expired else "")
+            )
+
+        return [File.from_dict(json.loads((self.root / "results" / name).read_text())) for name in names]
+
+    def _take(self, path: Path, name: str) -> None | File:
+        claim = self.root / "claimed" / f"{name}.{self.worker}"
+        try:
+            # The claim is renewed before it is renamed, so it doesn't look expired to the other workers.
+            os.utime(path)
+            os.rename(path, claim)
+            item = json.loads(claim.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+        self.claimed += 1
+        with self._lock:
+            self._claims.add(name)
+
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._renew, name="queue-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+        return _from_item(item)
+
+    def _expired(self) -> list[str]:
+        """The claims of other workers that weren't renewed within the lease."""
+        expired = []
+        now = time.time()
+        for entry in sorted(os.listdir(self.root / "claimed")):
+            if entry.partition(".")[2] == self.worker:
+                continue
+
+            try:
+                if now - (self.root / "claimed" / entry).stat().st_mtime > self.lease:
+                    expired.append(entry)
+            except FileNotFoundError:
+                continue
+
+        return expired
+
+    def _renew(self) -> None:
+        while not self._stopped.wait(self.lease / 4):
+            with self._lock:
+                names = list(self._claims)
+
+            for name in names:
+                try:
+                    os.utime(self.root / "claimed" / f"{name}.{self.worker}")
+                except FileNotFoundError:
+                    logger.warning(f"The claim of item {name} expired and was taken over by another worker")
+                    with self._lock:
+                        self._claims.discard(name)
+                except OSError as e:
+                    logger.debug(f"Unable to renew the claim of item {name} in {self.root}: {e}")
+
+
+def _to_item(file: File) -> dict[str, Any]:
+    return {"path": str(file.path), "lines": list(file.changed_lines) if file.changed_lines is not None else None}
+
+
+def _from_item(item: dict[str, Any]) -> File:
+    lines = item["lines"]
+    return File(Path(item["path"]), changed_lines=None if lines is None else LineRanges((x, y) for x, y in lines))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import random
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.aggregate import SpaceSaving, ViolationSummary
+from queryguard.cli import cli
+from queryguard.exceptions import RuleViolation
+from queryguard.logs import Record
+from queryguard.rules import NoDropLogin, NoDropUser
+
+
+class TestSpaceSaving:
+    def test_exact(self) -> None:
+        counter = SpaceSaving(10)
+        for key in [b"a", b"b", b"a", b"c", b"a", b"b"]:
+            counter.add(key, lambda: "example")
+
+        assert counter.top(2) == [(b"a", 3, 0, "example"), (b"b", 2, 0, "example")]
+        assert (counter.total, len(counter)) == (6, 3)
+
+    def test_heavy_hitters(self) -> None:
+        rng = random.Random(5)
+        keys = [b"hot"] * 2000 + [b"warm"] * 1000 + [str(rng.random()).encode() for _ in range(7000)]
+        rng.shuffle(keys)
+        counter = SpaceSaving(20)
+        truth: Counter[bytes] = Counter()
+        for key in keys:
+            counter.add(key, lambda: None)
+            truth[key] += 1
+            assert len(counter) <= 20
+            assert len(counter._heap) <= 80
+
+        (first, count, error, _), (second, *_) = counter.top(2)
+        assert (first, second) == (b"hot", b"warm")
+        assert count - error <= truth[b"hot"] <= count
+        assert error <= counter.total // 20
+
+    def test_example_made_once(self) -> None:
+        made = []
+        counter = SpaceSaving(1)
+        for key in [b"a", b"a", b"b"]:
+            counter.add(key, lambda key=key: made.append(key))  # type: ignore[misc]
+
+        assert made == [b"a", b"b"]
+        assert counter.top(1)[0][:3] == (b"b", 3, 2)
+
+
+class TestViolationSummary:
+    def test_shapes(self) -> None:
+        summary = ViolationSummary([NoDropUser, NoDropLogin], 5)  # type: ignore[list-item]
+        for index in range(3):
+            text = f"SELECT 1; DROP USER [u{index}] -- 'secret {index}'\n"
+            violation = RuleViolation("NoDropUser", "S015", text[10:])
+            violation.offset = 10
+            summary.add(Record(text, "a.log", index + 1), [violation])
+        summary.add(Record("SELECT 2;\n", "a.log", 4), [])
+
+        result = summary.to_dict()
+        assert result["records"] == 3
+        (rule,) = result["rules"]
+        assert (rule["id"], rule["violations"], len(rule["shapes"])) == ("S015", 3, 3)
+        assert rule["shapes"][0]["statement"] == "DROP USER [u0] --"
+        assert rule["shapes"][0]["example"] == "a.log:1"
+
+
+class TestTopCommand:
+    @pytest.fixture(autouse=True)
+    def no_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("QUERYGUARD_NO_CACHE", "true")
+
+    def test_json(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        lines = [f"DROP USER u WITH PASSWORD = 'p{i}';\n" for i in range(30)] + ["DROP LOGIN l;\n", "SELECT 1;\n"]
+        log.write_text("".join(lines))
+        args = ["ingest", str(log), "--top", "1", "--select", "S015,S002", "--output", "json"]
+        result = CliRunner(mix_stderr=False).invoke(cli, args)
+        (line,) = result.stdout.splitlines()
+        rules = json.loads(line)["summary"]["rules"]
+        assert [(x["id"], x["violations"]) for x in rules] == [("S002", 1), ("S015", 30)]
+        assert rules[1]["shapes"][0]["count"] == 30
+        assert "'p" not in line
+        assert result.exit_code == 1
+
+    def test_shared_id(self, tmp_path: Path) -> None:
+        log = tmp_path / "q.log"
+        log.write_text("SELECT 1;\nEXEC sp_configure '', 0;\nSELECT 2;\nSELECT 3;\n")
+        result = CliRunner(mix_stderr=False).invoke(cli, ["ingest", str(log), "--top", "3", "--output", "json"])
+        rules = json.loads(result.stdout)["summary"]["rules"]
+        assert [(x["name"], x["violations"]) for x in rules] == [("NoAlterServerConfiguration", 1)]
+
+    def test_sample(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_text("SELECT 1;\n")
+        result = CliRunner().invoke(cli, ["ingest", str(log), "--top", "3", "--sample", "5"])
+        assert result.exit_code == 2
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from queryguard import cache as cache_module
+from queryguard.cache import Cache, RuleResults, SegmentWriter, decode_segment, rule_fingerprint, split_segments
+from queryguard.files import File
+from queryguard.parser import SQLParser
+from queryguard.rules import BaseRule, NoBackup, NoCreateLogin, NoCreateServerRole, NoDynamicSQL
+
+
+@pytest.fixture()
+def sample_file(tmp_path: Path) -> Path:
+    file_path = tmp_path / "sample.sql"
+    file_path.write_text(
+        "SELECT 'é' FROM t;\nGO\nCREATE SERVER ROLE r;\nEXEC sp_executesql N'SELECT 1';\nGO\nCREATE LOGIN x;\n"
+    )
+    return file_path
+
+
+class TestCache:
+    def test_segment_round_trip(self) -> None:
+        statements = SQLParser.get_all_statements("SELECT 'é';\nCREATE LOGIN [x] -- comment\n;")
+        for statement in statements:
+            statement.offset += 10
+            statement.end += 10
+
+        writer = SegmentWriter()
+        writer.add(statements)
+        decoded = decode_segment(memoryview(writer.getvalue()))
+
+        assert [str(x) for x in decoded] == [str(x) for x in statements]
+        assert [(x.offset, x.end) for x in decoded] == [(x.offset, x.end) for x in statements]
+        assert [(x.ttype, x.value) for x in decoded[1].flatten()] == [
+            (x.ttype, x.value) for x in statements[1].flatten()
+        ]
+
+    def test_key(self, tmp_path: Path) -> None:
+        assert Cache(tmp_path).key(b"SELECT 1;") == Cache(tmp_path).key(b"SELECT 1;")
+        assert Cache(tmp_path).key(b"SELECT 1;") != Cache(tmp_path).key(b"SELECT 2;")
+        assert Cache(tmp_path).key(b"SELECT 1;") != Cache(tmp_path, literal_limit=10).key(b"SELECT 1;")
+
+    def test_store_and_load(self, tmp_path: Path) -> None:
+        cache = Cache(tmp_path / "cache")
+        writer = SegmentWriter()
+        writer.add(SQLParser.get_all_statements("SELECT 1;"))
+        cache.store("abcd", "cp1252", [writer.getvalue()])
+
+        assert (tmp_path / "cache" / ".gitignore").exists()
+        entry = cache.load("abcd")
+        assert entry is not None
+        assert entry[0] == "cp1252"
+        assert str(decode_segment(entry[1][0])[0]) == "SELECT 1;"
+        assert cache.load("abce") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_corrupt_entry(self, tmp_path: Path) -> None:
+        cache = Cache(tmp_path)
+        cache.store("abcd", "utf-8", [SegmentWriter().getvalue()])
+        path = tmp_path / "parse" / "ab" / "abcd"
+        path.write_bytes(path.read_bytes()[:-3])
+
+        assert cache.load("abcd") is None
+        with pytest.raises(ValueError):
+            split_segments(b"QGPC")
+
+    def test_prune(self, tmp_path: Path) -> None:
+        cache = Cache(tmp_path)
+        for i, key in enumerate(["aa01", "aa02", "ab03", "ab04"]):
+            writer = SegmentWriter()
+            writer.add(SQLParser.get_all_statements(f"SELECT '{os.urandom(500).hex()}';"))
+            cache.store(key, "utf-8", [writer.getvalue()])
+            os.utime(tmp_path / "parse" / key[:2] / key, (i, i))
+
+        cache.max_size = (tmp_path / "parse" / "aa" / "aa01").stat().st_size * 16 // 5
+
+        assert cache.load("aa01") is not None
+        assert cache.prune() == 2
+        assert sorted(x.name for x in (tmp_path / "parse").glob("*/*")) == ["aa01", "ab04"]
+
+        (tmp_path / "parse" / "ab" / "ab05").write_bytes(os.urandom(cache.max_size // 2))
+        assert cache.prune() == 0
+        assert cache.prune(interval=0) == 2
+        assert [x.name for x in (tmp_path / "parse").glob("*/*")] == ["ab05"]
+        assert cache.pruned == 4
+        assert Cache(tmp_path, max_size=0).prune(interval=0) == 0
+        assert Cache(tmp_path / "missing").prune() == 0
+        assert not (tmp_path / "missing").exists()
+
+    def test_file_evaluate_cached(self, tmp_path: Path, sample_file: Path) -> None:
+        cache = Cache(tmp_path / "cache")
+        rules = [NoCreateLogin, NoCreateServerRole, NoDynamicSQL]
+        expected = File(sample_file)
+        expected.evaluate(rules)
+
+        first = File(sample_file)
+        first.evaluate([NoCreateLogin], cache=cache)
+        assert cache.misses == 1
+
+        cached = File(sample_file)
+        with patch("sqlparse.parse") as parse:
+            cached.evaluate(rules, cache=cache)
+            parse.assert_not_called()
+
+        assert cache.hits == 1
+        assert [(x.id, x.offset, x.end, x.statement) for x in cached.violations] == [
+            (x.id, x.offset, x.end, x.statement) for x in expected.violations
+        ]
+
+    def test_file_evaluate_cached_units(self, tmp_path: Path, sample_file: Path) -> None:
+        cache = Cache(tmp_path / "cache")
+        with ProcessPoolExecutor(max_workers=2) as executor, patch("queryguard.files.UNIT_SIZE", 10):
+            File(sample_file).evaluate([NoCreateLogin], executor=executor, cache=cache)
+
+        cached = File(sample_file)
+        cached.evaluate([NoCreateLogin, NoCreateServerRole], cache=cache)
+        assert cache.hits == 1
+        assert [x.id for x in cached.violations] == ["S004", "S001"]
+
+    def test_file_evaluate_cached_encoding(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "legacy.sql"
+        file_path.write_bytes("CREATE LOGIN [café];".encode("cp1252"))
+        cache = Cache(tmp_path / "cache")
+        File(file_path).evaluate([NoCreateLogin], cache=cache)
+
+        cached = File(file_path)
+        cached.evaluate([NoCreateLogin], cache=cache)
+        assert cache.reused == 1
+        assert cached.violations[0].statement == "CREATE LOGIN [café];"
+
+
+class TestRuleResults:
+    def test_dumps_and_loads(self) -> None:
+        results = RuleResults("cp1252", "abc", ["LOGIN"], {"f1": None, "f2": [12, 30]})
+        loaded = RuleResults.loads(results.dumps())
+        assert (loaded.encoding, loaded.vocabulary, loaded.terms, loaded.outcomes) == (
+            "cp1252",
+            "abc",
+            {"LOGIN"},
+            {"f1": None, "f2": [12, 30]},
+        )
+
+        with pytest.raises(ValueError):
+            RuleResults.loads(b"{}")
+
+    def test_triggers_are_sound(self, tmp_path: Path) -> None:
+        rules = BaseRule.__subclasses__()
+        cache = Cache(tmp_path)
+        for path in sorted(Path("tests/sql").glob("*.sql")):
+            expected = File(path)
+            expected.evaluate(rules)  # type: ignore[arg-type]
+            File(path).evaluate([NoBackup], cache=cache)
+
+            cached = File(path)
+            cached.evaluate(rules, cache=cache)  # type: ignore[arg-type]
+            assert [(x.id, x.offset) for x in cached.violations] == [(x.id, x.offset) for x in expected.violations]
+
+        assert cache.skipped > 0
+
+    def test_modified_rule(self, tmp_path: Path, sample_file: Path) -> None:
+        cache = Cache(tmp_path)
+        File(sample_file).evaluate([NoCreateLogin, NoBackup, NoDynamicSQL], cache=cache)
+        assert cache.evaluated == 3
+
+        def modified(rule: type[BaseRule]) -> str:
+            return rule_fingerprint(rule) + ("-modified" if rule in (NoCreateLogin, NoBackup) else "")
+
+        cached = File(sample_file)
+        with patch.object(cache_module, "rule_fingerprint", modified), patch.object(NoBackup, "check") as check:
+            cached.evaluate([NoCreateLogin, NoBackup, NoDynamicSQL], cache=cache)
+            check.assert_not_called()
+
+        assert (cache.reused, cache.skipped, cache.evaluated) == (1, 1, 4)
+        assert [x.id for x in cached.violations] == ["S013", "S001"]
+
+
+class TestBatchResults:
+    @pytest.fixture()
+    def script(self, tmp_path: Path) -> Path:
+        file_path = tmp_path / "release.sql"
+        batches = [f"PRINT {i};\nGO\n" for i in range(20)]
+        batches[10] = "EXEC sp_executesql N'SELECT 1';\nGO\n"
+        batches[15] = "CREATE LOGIN [é];\nGO\n"
+        file_path.write_text("".join(batches))
+        return file_path
+
+    def edit(self, path: Path) -> None:
+        path.write_text(path.read_text().replace("PRINT 3;", "PRINT 'é';\nCREATE SERVER ROLE r;"))
+
+    def test_edited_batch(self, tmp_path: Path, script: Path) -> None:
+        rules = [NoCreateLogin, NoCreateServerRole, NoDynamicSQL]
+        File(script).evaluate(rules, cache=Cache(tmp_path / "cache"))
+        self.edit(script)
+        expected = File(script)
+        expected.evaluate(rules)
+
+        cache = Cache(tmp_path / "cache")
+        cached = File(script)
+        cached.evaluate(rules, cache=cache)
+        assert (cache.batches_reused, cache.batches_parsed) == (20, 1)
+        assert [(x.id, x.offset, x.end, x.statement) for x in cached.violations] == [
+            (x.id, x.offset, x.end, x.statement) for x in expected.violations
+        ]
+        assert [x.id for x in cached.violations] == ["S004", "S013", "S001"]
+
+    def test_edited_batch_units(self, tmp_path: Path, script: Path) -> None:
+        with ProcessPoolExecutor(max_workers=2) as executor, patch("queryguard.files.UNIT_SIZE", 50):
+            File(script).evaluate([NoCreateLogin], executor=executor, cache=Cache(tmp_path / "cache"))
+            self.edit(script)
+            cache = Cache(tmp_path / "cache")
+            cached = File(script)
+            cached.evaluate([NoCreateLogin, NoDynamicSQL], executor=executor, cache=cache)
+
+        assert (cache.batches_reused, cache.batches_parsed) == (20, 1)
+        assert [x.id for x in cached.violations] == ["S013", "S001"]
+        assert "CREATE LOGIN [é];" in cached.violations[1].statement
+
+    def test_first_evaluation_stores_statements(self, tmp_path: Path, script: Path) -> None:
+        cache = Cache(tmp_path / "cache")
+        File(script).evaluate([NoCreateLogin], cache=cache)
+        assert cache.batches_parsed == 21
+
+        cached = File(script)
+        cached.evaluate([NoCreateLogin, NoDynamicSQL], cache=cache)
+        assert cache.hits == 1
+        assert [x.id for x in cached.violations] == ["S013", "S001"]
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import json
+from pathlib import Path
+
 from typer.testing import CliRunner
 
 from queryguard import __version__
@@ -76,6 +79,18 @@ class TestCLI:
         assert result.exit_code == 0
         assert "DEBUG:" in result.output
 
+    def test_no_cache(self) -> None:
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            [
+                "./tests/sql/no_violations.sql",
+                "--no-cache",
+            ],
+        )
+        assert result.exit_code == 0
+        assert "Passed ✅" in result.output
+
     def test_version(self) -> None:
         runner = CliRunner()
         result = runner.invoke(
@@ -85,8 +100,73 @@ class TestCLI:
         assert result.exit_code == 0
         assert result.output.strip() == __version__
 
+    def test_help_lists_commands(self) -> None:
+        result = CliRunner().invoke(cli, ["--help"], env={"COLUMNS": "1000"})
+        assert result.exit_code == 0
+        for command in ("run", "merge", "finalize", "daemon", "ingest", "lsp"):
+            assert command in result.output
+
+        result = CliRunner().invoke(cli, ["run", "--help"], env={"COLUMNS": "1000"})
+        assert "--shard" in result.output
+
     def test_missing_path(self) -> None:
         runner = CliRunner()
         result = runner.invoke(cli)
         assert result.exit_code == 2
         assert "Error: Missing argument 'path'" in result.output
+
+    def test_multiple_paths(self) -> None:
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            [
+                "./tests/sql/no_violations.sql",
+                "./tests/sql/multiple_violations.sql",
+                "./tests/sql/no_violations.sql",
+                "--output",
+                "json",
+            ],
+            env={"COLUMNS": "1000"},
+        )
+        assert result.exit_code == 1
+        assert [x["path"] for x in json.loads(result.output)] == [
+            "tests/sql/no_violations.sql",
+            "tests/sql/multiple_violations.sql",
+        ]
+
+    def test_files_from(self, tmp_path: Path) -> None:
+        manifest = tmp_path / "files.txt"
+        manifest.write_text("tests/sql/no_violations.sql\r\n\ntests/sql/alter_app_role_1.sql\n")
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            ["--files-from", str(manifest), "--output", "json"],
+            env={"COLUMNS": "1000"},
+        )
+        assert result.exit_code == 1
+        assert [x["path"] for x in json.loads(result.output)] == [
+            "tests/sql/no_violations.sql",
+            "tests/sql/alter_app_role_1.sql",
+        ]
+
+    def test_files_from_stdin(self, tmp_path: Path) -> None:
+        odd_name = tmp_path / "line\nbreak.sql"
+        odd_name.write_text("SELECT 1;")
+        runner = CliRunner()
+        result = runner.invoke(
+            cli,
+            ["tests/sql/no_violations.sql", "--files-from", "-", "--output", "json"],
+            input=f"{odd_name}\0{tmp_path / 'missing.sql'}\0".encode(),
+            env={"COLUMNS": "1000"},
+        )
+        assert result.exit_code == 0
+        files = {x["path"]: x for x in json.loads(result.output)}
+        assert files[str(odd_name)]["status"] == "Passed"
+        assert files["tests/sql/no_violations.sql"]["status"] == "Passed"
+        assert files[str(tmp_path / "missing.sql")]["reason"] == "no such file or directory"
+
+    def test_files_from_missing_manifest(self, tmp_path: Path) -> None:
+        runner = CliRunner()
+        result = runner.invoke(cli, ["--files-from", str(tmp_path / "missing.txt")])
+        assert result.exit_code == 1
+        assert "Unable to read file list" in result.output
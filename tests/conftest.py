@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def environment(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ignores the settings of the calling environment and keeps the cache of each test in its temporary directory."""
+    for name in [x for x in os.environ if x.startswith("QUERYGUARD_")]:
+        monkeypatch.delenv(name)
+
+    monkeypatch.setenv("QUERYGUARD_CACHE_DIR", str(tmp_path / ".queryguard_cache"))
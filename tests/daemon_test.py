@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import cast
+from unittest.mock import patch
+
+import pytest
+
+from queryguard import client
+from queryguard.config import RequestParams
+from queryguard.daemon import Daemon
+from queryguard.files import File
+
+
+@pytest.fixture()
+def daemon(tmp_path: Path) -> Daemon:
+    settings = tmp_path / "queryguard.toml"
+    settings.write_text("[tool.queryguard]\nselect = ['S']\nno_cache = true\n")
+    return Daemon(cast(RequestParams, {"settings": str(settings)}), tmp_path / "daemon.sock")
+
+
+@pytest.fixture()
+def served(daemon: Daemon) -> Iterator[str]:
+    thread = threading.Thread(target=daemon.serve)
+    thread.start()
+    while not daemon.socket_path.exists():
+        time.sleep(0.01)
+
+    yield str(daemon.socket_path)
+    client.main(["--stop", "--socket", str(daemon.socket_path)])
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+class TestDaemon:
+    def test_check(self, daemon: Daemon) -> None:
+        response = daemon.handle(
+            {
+                "command": "check",
+                "cwd": str(Path.cwd()),
+                "paths": ["tests/sql/no_violations.sql", "tests/sql/create_login_1.sql"],
+                "text": "GRANT CONTROL SERVER TO u;",
+                "name": "editor.sql",
+            }
+        )
+        assert response["exit_code"] == 1
+        assert [(file.path, file.status) for file in response["files"]] == [
+            (Path("tests/sql/no_violations.sql"), "Passed ✅"),
+            (Path("tests/sql/create_login_1.sql"), "Failed ❌"),
+            (Path("editor.sql"), "Failed ❌"),
+        ]
+
+    def test_errors(self, daemon: Daemon) -> None:
+        assert daemon.handle({"command": "check", "cwd": "/", "paths": ["missing.sql"]}) == {
+            "error": "Invalid path: missing.sql",
+            "exit_code": 1,
+        }
+        assert daemon.handle({"command": "check"})["error"] == "Invalid request: KeyError('cwd')"
+        assert daemon.handle({"command": "other"})["error"] == "Unknown command other"
+
+    def test_unchanged_files_not_evaluated(self, daemon: Daemon, tmp_path: Path) -> None:
+        sql = tmp_path / "a.sql"
+        sql.write_text("SELECT 1;")
+        message = {"command": "check", "cwd": str(tmp_path), "paths": ["."]}
+        with patch.object(File, "evaluate", autospec=True, side_effect=File.evaluate) as evaluate:
+            daemon.handle(message)
+            daemon.handle(message)
+            assert evaluate.call_count == 1
+
+            sql.write_text("CREATE LOGIN a WITH PASSWORD = 'x';")
+            assert daemon.handle(message)["files"][0].status == "Failed ❌"
+            assert evaluate.call_count == 2
+
+    def test_reload(self, daemon: Daemon, tmp_path: Path) -> None:
+        message = {"command": "check", "cwd": str(Path.cwd()), "paths": ["tests/sql/create_login_1.sql"]}
+        assert daemon.handle(message)["exit_code"] == 1
+
+        (tmp_path / "queryguard.toml").write_text(
+            "[tool.queryguard]\nselect = ['S']\nignore = ['S']\nno_cache = true\n"
+        )
+        assert daemon.handle(message)["exit_code"] == 0
+        assert daemon.reloads == 1
+
+    def test_reload_invalid(self, daemon: Daemon, tmp_path: Path) -> None:
+        message = {"command": "check", "cwd": str(Path.cwd()), "paths": ["tests/sql/create_login_1.sql"]}
+        settings = tmp_path / "queryguard.toml"
+        settings.write_text("[tool.queryguard\n")
+        for _ in range(2):
+            response = daemon.handle(message)
+            assert response["error"].startswith("Unable to reload the configuration")
+            assert response["exit_code"] == 1
+
+        settings.write_text("[tool.queryguard]\nselect = ['S']\nignore = ['S']\nno_cache = true\n")
+        assert daemon.handle(message)["exit_code"] == 0
+        assert daemon.reloads == 1
+
+
+class TestClient:
+    def test_concurrent_clients(self, served: str, capsys: pytest.CaptureFixture[str]) -> None:
+        arguments = ["tests/sql/create_login_1.sql", "tests/sql/no_violations.sql", "--socket", served]
+        with ThreadPoolExecutor(8) as executor:
+            codes = list(
+                executor.map(
+                    lambda _: client.request(
+                        {"command": "check", "cwd": str(Path.cwd()), "paths": arguments[:2]}, served
+                    ),
+                    range(16),
+                )
+            )
+
+        assert {x["exit_code"] for x in codes} == {1}
+        assert client.main([*arguments, "--output", "json"]) == 1
+        assert [x["status"] for x in json.loads(capsys.readouterr().out)] == ["Failed", "Passed"]
+
+        assert client.main(["tests/sql/no_violations.sql", "--socket", served]) == 0
+        assert capsys.readouterr().out == "tests/sql/no_violations.sql: Passed\n"
+
+    def test_invalid_requests(self, served: str) -> None:
+        for request in (b"[]\n", b"not json\n"):
+            with socket.socket(socket.AF_UNIX) as connection:
+                connection.connect(served)
+                connection.sendall(request)
+                response = json.loads(connection.makefile("rb").readline())
+
+            assert response["error"].startswith("Invalid request")
+            assert response["exit_code"] == 1
+
+        message = {"command": "check", "cwd": str(Path.cwd()), "paths": ["tests/sql/no_violations.sql"]}
+        with patch.object(Daemon, "check", side_effect=RuntimeError("rule failed")):
+            response = client.request(message, served)
+
+        assert response == {"error": "Unable to check the files: RuntimeError('rule failed')", "exit_code": 1}
+        assert client.request(message, served)["exit_code"] == 0
+
+    def test_daemon_not_running(self, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+        assert client.main(["a.sql", "--socket", str(tmp_path / "missing.sock")]) == client.UNREACHABLE
+        assert "Unable to reach the QueryGuard daemon" in capsys.readouterr().err
+
+    def test_cli_imports_daemon_lazily(self) -> None:
+        command = "import sys, queryguard.cli; print('queryguard.daemon' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", command], capture_output=True, check=True, text=True).stdout  # noqa: S603
+        assert output == "False\n"
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from pathlib import Path
+from unittest.mock import patch
+
+from queryguard.diff import LineRanges, parse_unified_diff, select_changed
+from queryguard.files import File
+from queryguard.parser import SQLParser
+from queryguard.rules import NoBackup, NoCreateLogin, NoGrantExceptObject
+
+DIFF = """diff --git a/sql/legacy.sql b/sql/legacy.sql
+index 1111111..2222222 100644
+--- a/sql/legacy.sql
++++ b/sql/legacy.sql
+@@ -3 +3,2 @@ GO
+-SELECT 1;
++SELECT 1;
++CREATE LOGIN a;
+@@ -10,2 +11,0 @@ GO
+-SELECT 2;
+-SELECT 3;
+@@ -20,0 +21 @@
++SELECT 4;
+diff --git a/sql/removed.sql b/sql/removed.sql
+deleted file mode 100644
+--- a/sql/removed.sql
++++ /dev/null
+@@ -1 +0,0 @@
+-SELECT 5;
+--- old/other.sql\t2024-01-01 00:00:00
++++ new/other.sql\t2024-01-02 00:00:00
+@@ -1,3 +1,3 @@
+ SELECT 6;
+-SELECT 7;
++SELECT 8;
+ SELECT 9;
+"""
+
+
+class TestLineRanges:
+    def test_overlaps(self) -> None:
+        lines = LineRanges([(10, 12), (1, 2), (3, 4), (20, 20)])
+        assert list(lines) == [(1, 4), (10, 12), (20, 20)]
+        assert len(lines) == 3
+        assert lines.overlaps(4, 9)
+        assert lines.overlaps(12, 15)
+        assert lines.overlaps(15, 25)
+        assert not lines.overlaps(5, 9)
+        assert not lines.overlaps(13, 19)
+        assert not lines.overlaps(21, 30)
+        assert not LineRanges([]).overlaps(1, 100)
+
+
+class TestUnifiedDiff:
+    def test_parse(self) -> None:
+        changes = parse_unified_diff(DIFF)
+        assert list(changes) == ["sql/legacy.sql", "other.sql"]
+        assert list(changes["sql/legacy.sql"]) == [(3, 4), (11, 12), (21, 21)]
+        assert list(changes["other.sql"]) == [(2, 2)]
+
+    def test_select_changed(self, tmp_path: Path) -> None:
+        (tmp_path / "sql").mkdir()
+        (tmp_path / "sql" / "a.sql").write_text("SELECT 1;")
+        (tmp_path / "sql" / "b.txt").write_text("SELECT 1;")
+        (tmp_path / "c.sql").write_text("SELECT 1;")
+        changes = {"sql/a.sql": 1, "sql/b.txt": 2, "sql/missing.sql": 3, "c.sql": 4}
+
+        assert select_changed(tmp_path / "sql", tmp_path, changes) == {tmp_path / "sql" / "a.sql": 1}
+        assert select_changed(tmp_path / "c.sql", tmp_path, changes) == {tmp_path / "c.sql": 4}
+
+
+class TestChangedLines:
+    def test_evaluate_changed_lines(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "legacy.sql"
+        file_path.write_text(
+            "GRANT CONTROL SERVER TO u;\nGO\n"
+            "SELECT 1;\n\nCREATE LOGIN a;\nBACKUP DATABASE d TO DISK = 'x';\nGO\n"
+            "GRANT CONTROL SERVER TO v;\nGO\n"
+        )
+        rules = [NoBackup, NoCreateLogin, NoGrantExceptObject]
+
+        file = File(file_path, changed_lines=LineRanges([(4, 5)]))
+        file.evaluate(rules)  # type: ignore[list-item]
+        assert [x.id for x in file.violations] == [NoCreateLogin.id]
+        assert "CREATE LOGIN a;" in file.violations[0].statement
+
+        file = File(file_path, changed_lines=LineRanges([(6, 6)]))
+        file.evaluate(rules)  # type: ignore[list-item]
+        assert [x.id for x in file.violations] == [NoBackup.id]
+
+        file = File(file_path, changed_lines=LineRanges([(4, 4)]))
+        file.evaluate(rules)  # type: ignore[list-item]
+        assert file.status == "Passed ✅"
+
+    def test_unchanged_batches_not_parsed(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "large.sql"
+        file_path.write_text("".join(f"GRANT CONTROL SERVER TO u{i};\nGO\n" for i in range(100)))
+
+        file = File(file_path, changed_lines=LineRanges([(101, 101)]))
+        with patch.object(SQLParser, "get_all_statements", wraps=SQLParser.get_all_statements) as parse:
+            file.evaluate([NoGrantExceptObject])  # type: ignore[list-item]
+
+        assert parse.call_count == 1
+        assert "GRANT CONTROL SERVER TO u50;" in file.violations[0].statement
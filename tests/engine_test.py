@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import cast
+from unittest.mock import patch
 
 import pytest
 import sqlparse
@@ -13,6 +15,7 @@ from queryguard.config import RequestParams
 from queryguard.engine import RulesEngine
 from queryguard.exceptions import RuleViolation, TerminatingError
 from queryguard.files import File
+from queryguard.rules import NoCreateLogin, NoCreateServerRole
 
 
 @pytest.fixture  # type: ignore[misc]
@@ -154,3 +157,24 @@ class TestEngine:
             engine.run()
 
         assert e.value.exit_code == 1
+
+    def test_file_evaluate_split(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "large.sql"
+        batches = ["SELECT 1;\n"] * 50 + ["CREATE LOGIN test WITH PASSWORD = 'test';\n"] + ["SELECT 2;\n"] * 50
+        file_path.write_text("GO\n".join(batches) + "GO\nCREATE SERVER ROLE test_role;\n")
+        text = file_path.read_text()
+
+        sequential = File(file_path)
+        sequential.evaluate([NoCreateLogin, NoCreateServerRole])
+
+        split = File(file_path)
+        with ProcessPoolExecutor(max_workers=2) as executor, patch("queryguard.files.UNIT_SIZE", 64):
+            split.evaluate([NoCreateLogin, NoCreateServerRole], executor=executor)
+
+        assert split.status == "Failed ❌"
+        assert [str(x) for x in split.violations] == [str(x) for x in sequential.violations]
+        assert [x.offset for x in split.violations] == [x.offset for x in sequential.violations]
+        assert [x.offset for x in split.violations] == [
+            text.index("\nGO\nCREATE LOGIN"),
+            text.index("\nGO\nCREATE SERVER"),
+        ]
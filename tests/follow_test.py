@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import json
+import signal
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from click import ClickException
+from typer.testing import CliRunner
+
+from queryguard import follow
+from queryguard.cli import cli
+from queryguard.exceptions import Interrupted
+from queryguard.follow import Follower, detect_follow_format
+
+
+def texts(follower: Follower) -> list[str]:
+    return [record.text for record in follower.poll()]
+
+
+class TestFollower:
+    def test_lines(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_bytes(b"\xef\xbb\xbfSELECT 1;\n\nSELECT 2")
+        with Follower(log, "lines") as follower:
+            records = follower.poll()
+            assert [(record.text, record.position) for record in records] == [("SELECT 1;\n", 1)]
+            with log.open("a") as f:
+                f.write(";\nSELECT 3;\n")
+
+            records = follower.poll()
+            assert [(record.text, record.position) for record in records] == [("SELECT 2;\n", 3), ("SELECT 3;\n", 4)]
+            assert follower.poll() == []
+            assert follower.lag == 0
+
+    def test_batches(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_text("SELECT 1;\nGO\n\nSELECT 2;\nSELECT 3;\n")
+        with Follower(log, "go") as follower:
+            assert texts(follower) == ["SELECT 1;\n"]
+            with log.open("a") as f:
+                f.write("go\n")
+
+            records = follower.poll()
+            assert [(record.text, record.position) for record in records] == [("SELECT 2;\nSELECT 3;\n", 4)]
+
+    def test_limit(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_text("".join(f"SELECT {i};\n" for i in range(5)))
+        with Follower(log, "lines") as follower:
+            assert len(follower.poll(limit=3)) == 3
+            assert texts(follower) == ["SELECT 3;\n", "SELECT 4;\n"]
+
+    def test_long_record(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(follow, "READ_SIZE", 4)
+        log = tmp_path / "a.log"
+        log.write_text("SELECT 123456789;\nSELECT 2;\n")
+        with Follower(log, "lines") as follower:
+            assert texts(follower) == ["SELECT 123456789;\n", "SELECT 2;\n"]
+
+    def test_checkpoint(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        checkpoint = tmp_path / "state" / "offsets.json"
+        log.write_text("SELECT 1;\nSELECT 2;\n")
+        with Follower(log, "lines", checkpoint) as follower:
+            assert len(follower.poll()) == 2
+            follower.commit()
+
+        with log.open("a") as f:
+            f.write("SELECT 3;\n")
+
+        with Follower(log, "lines", checkpoint) as follower:
+            records = follower.poll()
+            assert [(record.text, record.position) for record in records] == [("SELECT 3;\n", 3)]
+
+    def test_checkpoint_of_replaced_file(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        checkpoint = tmp_path / "offsets.json"
+        log.write_text("SELECT 1;\n")
+        with Follower(log, "lines", checkpoint) as follower:
+            follower.poll()
+            follower.commit()
+
+        # A file that reuses the inode but has other contents is read from its start.
+        data = json.loads(checkpoint.read_text())
+        data["files"][0]["head"] = b"DROP".hex()
+        checkpoint.write_text(json.dumps(data))
+        with Follower(log, "lines", checkpoint) as follower:
+            assert texts(follower) == ["SELECT 1;\n"]
+
+    def test_invalid_checkpoint(self, tmp_path: Path) -> None:
+        checkpoint = tmp_path / "offsets.json"
+        checkpoint.write_text("{")
+        with pytest.raises(ClickException, match="Unable to read checkpoint"):
+            Follower(tmp_path, "lines", checkpoint)
+
+    def test_rotation(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_text("SELECT 1;\n")
+        with Follower(log, "go") as follower:
+            assert texts(follower) == []
+            with log.open("a") as f:
+                f.write("SELECT 2;\n")
+
+            log.rename(tmp_path / "a.log.1")
+            log.write_text("SELECT 3;\nGO\n")
+            assert texts(follower) == ["SELECT 1;\nSELECT 2;\n", "SELECT 3;\n"]
+            assert (follower.files, follower.rotations) == (1, 1)
+
+    def test_truncation(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_text("SELECT 1;\nSELECT 2;\n")
+        with Follower(log, "lines") as follower:
+            assert len(follower.poll()) == 2
+            log.write_text("SELECT 3;\n")
+            assert texts(follower) == ["SELECT 3;\n"]
+            assert follower.truncations == 1
+
+    def test_directory(self, tmp_path: Path) -> None:
+        (tmp_path / "a.log").write_text("SELECT 1;\n")
+        (tmp_path / "a.log.1.gz").write_bytes(b"\x1f\x8b")
+        (tmp_path / ".a.log.swp").write_text("SELECT 2;\n")
+        with Follower(tmp_path, "lines") as follower:
+            assert texts(follower) == ["SELECT 1;\n"]
+            (tmp_path / "b.log").write_text("SELECT 3;\n")
+            assert texts(follower) == ["SELECT 3;\n"]
+            assert follower.files == 2
+
+    def test_format(self, tmp_path: Path) -> None:
+        with pytest.raises(ClickException, match="can be followed, not csv"):
+            Follower(tmp_path, "csv")
+
+    def test_detect_format(self, tmp_path: Path) -> None:
+        assert detect_follow_format(tmp_path) == "lines"
+        (tmp_path / "a.log").write_text("")
+        (tmp_path / "b.log").write_text("SELECT 1;\nGO\n")
+        assert detect_follow_format(tmp_path) == "go"
+
+
+class TestFollowCommand:
+    def test_follow(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        checkpoint = tmp_path / "offsets.json"
+        log.write_text("SELECT 1;\nDROP LOGIN x;\n")
+        appends = ["CREATE LOGIN y WITH PASSWORD = 'z';\n"]
+
+        def sleep(seconds: float) -> None:
+            if not appends:
+                raise Interrupted(signal.SIGINT)
+
+            with log.open("a") as f:
+                f.write(appends.pop(0))
+
+        args = ["ingest", str(log), "--follow", "--checkpoint", str(checkpoint), "--output", "json"]
+        with patch("queryguard.engine.time.sleep", side_effect=sleep):
+            result = CliRunner(mix_stderr=False).invoke(cli, args)
+
+        assert result.exit_code == 1
+        lines = [json.loads(line) for line in result.stdout.splitlines()]
+        assert [(x["position"], x["violations"][0]["id"]) for x in lines] == [(2, "S002"), (3, "S001")]
+        assert "3 records checked, 2 with violations" in result.stderr
+        assert json.loads(checkpoint.read_text())["files"][0]["offset"] == log.stat().st_size
+
+    def test_follow_one_log(self, tmp_path: Path) -> None:
+        result = CliRunner().invoke(cli, ["ingest", str(tmp_path), str(tmp_path), "--follow"])
+        assert result.exit_code == 2
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from click import ClickException
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.git import INDEX, CatFile, get_blob_sizes, get_changed_lines, get_changed_paths, list_blobs
+
+
+def git(repository: Path, *arguments: str) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *arguments],  # noqa: S603, S607
+        cwd=repository,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.fixture()
+def repository(tmp_path: Path) -> Path:
+    repository = tmp_path / "repository"
+    (repository / "sql" / "nested").mkdir(parents=True)
+    git(repository, "init", "-q", "-b", "main")
+    (repository / "sql" / "modified.sql").write_text("SELECT 1;")
+    (repository / "sql" / "deleted.sql").write_text("SELECT 2;")
+    (repository / "sql" / "unchanged.sql").write_text("CREATE LOGIN a;")
+    (repository / "sql" / "old_name.sql").write_text("SELECT 3;\nSELECT 4;\nSELECT 5;\n")
+    git(repository, "add", ".")
+    git(repository, "commit", "-q", "-m", "base")
+
+    git(repository, "checkout", "-q", "-b", "feature")
+    (repository / "sql" / "modified.sql").write_text("CREATE LOGIN b;")
+    (repository / "sql" / "deleted.sql").unlink()
+    git(repository, "mv", "sql/old_name.sql", "sql/nested/new_name.sql")
+    (repository / "sql" / "nested" / "added.sql").write_text("SELECT 6;")
+    (repository / "sql" / "notes.txt").write_text("CREATE LOGIN c;")
+    git(repository, "add", "-A")
+    git(repository, "commit", "-q", "-m", "feature")
+
+    (repository / "sql" / "staged.sql").write_text("SELECT 7;")
+    git(repository, "add", "sql/staged.sql")
+    (repository / "sql" / "unchanged.sql").write_text("CREATE LOGIN d;")
+    (repository / "sql" / "untracked.sql").write_text("SELECT 8;")
+    return repository
+
+
+class TestChangedPaths:
+    def test_committed(self, repository: Path) -> None:
+        paths = get_changed_paths(repository / "sql", "main")
+        assert paths == [
+            repository / "sql" / "modified.sql",
+            repository / "sql" / "nested" / "added.sql",
+            repository / "sql" / "nested" / "new_name.sql",
+        ]
+
+    def test_uncommitted(self, repository: Path) -> None:
+        paths = get_changed_paths(repository / "sql", "main", uncommitted=True)
+        assert [x.name for x in paths] == [
+            "modified.sql",
+            "added.sql",
+            "new_name.sql",
+            "staged.sql",
+            "unchanged.sql",
+            "untracked.sql",
+        ]
+
+    def test_path_filter(self, repository: Path) -> None:
+        assert get_changed_paths(repository / "sql" / "nested", "main") == [
+            repository / "sql" / "nested" / "added.sql",
+            repository / "sql" / "nested" / "new_name.sql",
+        ]
+        assert get_changed_paths(repository / "sql" / "modified.sql", "main") == [repository / "sql" / "modified.sql"]
+        assert get_changed_paths(repository / "sql" / "unchanged.sql", "main") == []
+
+    def test_invalid_ref(self, repository: Path) -> None:
+        with pytest.raises(ClickException, match="unknown-branch"):
+            get_changed_paths(repository, "unknown-branch")
+
+    def test_cli(self, repository: Path) -> None:
+        runner = CliRunner()
+        result = runner.invoke(
+            cli, [str(repository / "sql"), "--changed-since", "main", "--no-cache", "--output", "json"]
+        )
+        assert result.exit_code == 1
+        assert "modified.sql" in result.output
+        assert "unchanged.sql" not in result.output
+
+        result = runner.invoke(
+            cli, [str(repository / "sql"), "--changed-since", "HEAD", "--no-cache", "--output", "json"]
+        )
+        assert result.exit_code == 0
+
+        result = runner.invoke(
+            cli, [str(repository / "sql"), "--changed-since", "HEAD", "--uncommitted", "--no-cache", "--output", "json"]
+        )
+        assert result.exit_code == 1
+        assert "unchanged.sql" in result.output
+
+    def test_changed_lines(self, repository: Path) -> None:
+        lines = get_changed_lines(repository / "sql", "main")
+        assert list(lines) == [repository / "sql" / "modified.sql", repository / "sql" / "nested" / "added.sql"]
+        assert [list(x) for x in lines.values() if x is not None] == [[(1, 1)], [(1, 1)]]
+
+        lines = get_changed_lines(repository / "sql", "main", uncommitted=True)
+        assert lines[repository / "sql" / "untracked.sql"] is None
+        assert list(lines[repository / "sql" / "staged.sql"] or ()) == [(1, 1)]
+
+    def test_hunks(self, repository: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        legacy = repository / "sql" / "legacy.sql"
+        legacy.write_text("GRANT CONTROL SERVER TO u;\nGO\nSELECT 1;\nGO\n")
+        git(repository, "add", "sql/legacy.sql")
+        git(repository, "commit", "-q", "-m", "legacy")
+        legacy.write_text("GRANT CONTROL SERVER TO u;\nGO\nSELECT 1;\nCREATE LOGIN x;\nGO\n")
+
+        runner = CliRunner()
+        arguments = [str(legacy), "--changed-since", "HEAD", "--uncommitted", "--no-cache", "--output", "json"]
+        result = runner.invoke(cli, arguments)
+        assert "S024" in result.output
+
+        result = runner.invoke(cli, [*arguments, "--hunks"])
+        assert result.exit_code == 1
+        assert "S001" in result.output
+        assert "S024" not in result.output
+
+        (repository / "changes.diff").write_bytes(
+            subprocess.run(["git", "diff", "HEAD"], cwd=repository, capture_output=True, check=True).stdout  # noqa: S603, S607
+        )
+        monkeypatch.chdir(repository)
+        arguments = ["sql", "--diff-file", "changes.diff", "--no-cache", "--output", "json"]
+        result = runner.invoke(cli, [*arguments, "--hunks"])
+        assert result.exit_code == 1
+        assert "legacy.sql" in result.output
+        assert "S024" not in result.output
+        assert "staged.sql" not in result.output
+
+        result = runner.invoke(cli, arguments)
+        assert "S024" in result.output
+
+
+class TestRevisions:
+    def test_list_blobs(self, repository: Path) -> None:
+        assert [name for name, _ in list_blobs(repository, "main")] == [
+            "sql/deleted.sql",
+            "sql/modified.sql",
+            "sql/old_name.sql",
+            "sql/unchanged.sql",
+        ]
+        assert [name for name, _ in list_blobs(repository / "sql" / "nested", "HEAD")] == [
+            "sql/nested/added.sql",
+            "sql/nested/new_name.sql",
+        ]
+        assert "sql/staged.sql" in [name for name, _ in list_blobs(repository / "sql", INDEX)]
+        assert list_blobs(repository / "sql" / "deleted.sql", "main")[0][0] == "sql/deleted.sql"
+
+    def test_cat_file(self, repository: Path) -> None:
+        blobs = dict(list_blobs(repository, "main"))
+        with CatFile(repository) as cat_file:
+            assert cat_file.read(blobs["sql/unchanged.sql"]) == b"CREATE LOGIN a;"
+            assert cat_file.read(blobs["sql/deleted.sql"]) == b"SELECT 2;"
+            with pytest.raises(ClickException):
+                cat_file.read("0" * 40)
+
+            assert cat_file.reads == 2
+
+    def test_blob_sizes(self, repository: Path) -> None:
+        blobs = dict(list_blobs(repository, "main"))
+        sizes = get_blob_sizes(repository, [blobs["sql/unchanged.sql"], blobs["sql/old_name.sql"], "0" * 40])
+        assert sizes == {blobs["sql/unchanged.sql"]: 15, blobs["sql/old_name.sql"]: 30}
+
+    def test_cli(self, repository: Path) -> None:
+        (repository / "sql" / "unchanged.sql").unlink()
+        arguments = [str(repository), "--rev", "main", "--rev", "HEAD", "--rev", ":", "--no-cache", "--output", "json"]
+        with patch.object(CatFile, "read", autospec=True, side_effect=CatFile.read) as read:
+            result = CliRunner().invoke(cli, arguments, env={"COLUMNS": "1000"})
+
+        assert result.exit_code == 1
+        assert read.call_count == 7
+        files = {x["path"]: x for x in json.loads(result.output)}
+        assert len(files) == 13
+        assert files["main:sql/unchanged.sql"]["violations"][0]["statement"] == "CREATE LOGIN a;"
+        assert files[":sql/unchanged.sql"]["violations"] == files["main:sql/unchanged.sql"]["violations"]
+        assert files["HEAD:sql/modified.sql"]["violations"][0]["statement"] == "CREATE LOGIN b;"
+        assert files["main:sql/modified.sql"]["status"] == "Passed"
+        assert ":sql/staged.sql" in files
+
+    def test_cli_shard(self, repository: Path) -> None:
+        arguments = [str(repository), "--rev", "main", "--rev", "HEAD", "--no-cache", "--output", "json"]
+        checked = []
+        for shard in ("1/2", "2/2"):
+            with patch.object(CatFile, "read", autospec=True, side_effect=CatFile.read) as read:
+                result = CliRunner().invoke(cli, [*arguments, "--shard", shard], env={"COLUMNS": "1000"})
+
+            files = [x["path"] for x in json.loads(result.output)]
+            assert 0 < read.call_count <= len(files) < 10
+            assert "main:sql/old_name.sql" in files or "HEAD:sql/nested/new_name.sql" in files
+            checked += files
+
+        assert sorted(checked) == sorted(x["path"] for x in json.loads(CliRunner().invoke(cli, arguments).output))
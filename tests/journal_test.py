@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import os
+import signal
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.files import File
+from queryguard.journal import Journal
+from queryguard.rules import NoCreateLogin
+
+
+def make_files(directory: Path, count: int) -> list[Path]:
+    paths = []
+    for i in range(count):
+        paths.append(directory / f"{i}.sql")
+        paths[-1].write_text("CREATE LOGIN a WITH PASSWORD = 'x';" if i % 2 else "SELECT 1;")
+
+    return paths
+
+
+class TestJournal:
+    def test_resume(self, tmp_path: Path) -> None:
+        paths = make_files(tmp_path, 3)
+        journal = Journal(tmp_path / "journal.jsonl", "abc")
+        files = [File(path) for path in paths]
+        journal.start(files)
+        for file in files[:2]:
+            file.evaluate([NoCreateLogin])  # type: ignore[list-item]
+            journal.record(file)
+
+        journal.close()
+
+        files = [File(path) for path in paths]
+        journal.start(files, resume=True)
+        journal.close()
+        assert journal.restored == 2
+        assert [file.status for file in files] == ["Passed ✅", "Failed ❌", "Not Run"]
+        assert [x.id for x in files[1].violations] == [NoCreateLogin.id]
+
+    def test_changed_files_not_restored(self, tmp_path: Path) -> None:
+        paths = make_files(tmp_path, 2)
+        journal = Journal(tmp_path / "journal.jsonl", "abc")
+        files = [File(path) for path in paths]
+        journal.start(files)
+        for file in files:
+            file.evaluate([NoCreateLogin])  # type: ignore[list-item]
+            journal.record(file)
+
+        journal.close()
+        paths[1].write_text("SELECT 2;")
+        with (tmp_path / "journal.jsonl").open("a") as f:
+            f.write('{"file": {"pa')
+
+        files = [File(path) for path in paths]
+        journal.start(files, resume=True)
+        journal.close()
+        assert [file.status for file in files] == ["Passed ✅", "Not Run"]
+
+        files = [File(path) for path in paths]
+        Journal(tmp_path / "journal.jsonl", "other").start(files, resume=True)
+        assert [file.status for file in files] == ["Not Run", "Not Run"]
+
+    def test_complete(self, tmp_path: Path) -> None:
+        kept, removed = Journal(tmp_path / "kept.jsonl", "abc"), Journal(tmp_path / "removed.jsonl", "abc", keep=False)
+        for journal in (kept, removed):
+            journal.start([])
+            journal.close(complete=True)
+
+        assert kept.path.exists()
+        assert not removed.path.exists()
+
+
+class TestInterrupt:
+    def test_interrupt_and_resume(self, tmp_path: Path) -> None:
+        make_files(tmp_path, 6)
+        evaluated: list[Path] = []
+        evaluate = File.evaluate
+
+        def stop_after_three(self: File, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+            if len(evaluated) == 3:
+                os.kill(os.getpid(), signal.SIGTERM)
+
+            evaluated.append(self.path)
+            evaluate(self, *args, **kwargs)
+
+        runner = CliRunner(mix_stderr=False)
+        command = [str(tmp_path), "--journal", str(tmp_path / "journal.jsonl"), "--no-cache", "--output", "json"]
+        with patch.object(File, "evaluate", stop_after_three):
+            result = runner.invoke(cli, command)
+
+        assert result.exit_code == 128 + signal.SIGTERM
+        assert len(json.loads(result.stdout)) == 3
+        assert "Interrupted: 3 of 6 files checked, 1 with violations. Run again with --resume" in result.stderr
+
+        evaluated.clear()
+        with patch.object(File, "evaluate", autospec=True, side_effect=evaluate) as resumed:
+            result = runner.invoke(cli, [*command, "--resume"])
+
+        assert result.exit_code == 1
+        assert resumed.call_count == 3
+        assert sorted(x["status"] for x in json.loads(result.stdout)) == ["Failed"] * 3 + ["Passed"] * 3
+
+    def test_default_journal_removed(self, tmp_path: Path) -> None:
+        make_files(tmp_path, 2)
+        result = CliRunner().invoke(
+            cli, [str(tmp_path), "--resume"], env={"QUERYGUARD_CACHE_DIR": str(tmp_path / "cache")}
+        )
+        assert result.exit_code == 1
+        assert not list((tmp_path / "cache" / "journals").iterdir())
+
+    def test_unusable_cache_directory(self, tmp_path: Path) -> None:
+        make_files(tmp_path, 2)
+        (tmp_path / "file").write_text("")
+        result = CliRunner(mix_stderr=False).invoke(
+            cli, [str(tmp_path), "--output", "json"], env={"QUERYGUARD_CACHE_DIR": str(tmp_path / "file" / "cache")}
+        )
+        assert isinstance(result.exception, SystemExit)
+        assert result.exit_code == 1
+        assert sorted(x["status"] for x in json.loads(result.stdout)) == ["Failed", "Passed"]
+
+    def test_resume_without_journal(self, tmp_path: Path) -> None:
+        result = CliRunner().invoke(cli, [str(tmp_path), "--resume", "--no-cache"])
+        assert result.exit_code == 1
+        assert "Resuming needs a journal" in result.output
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from click import ClickException
+from typer.testing import CliRunner
+
+from queryguard import logs
+from queryguard.cli import cli
+from queryguard.logs import LogChecker, Record, detect_format, open_log, read_log
+from queryguard.rules import NoCreateLogin, NoDropUser, NoDynamicSQL
+
+LOGS = Path("tests/logs")
+
+
+def read(name: str, format: str = "auto") -> list[Record]:
+    with open_log(str(LOGS / name)) as stream:
+        return list(read_log(stream, name, format))
+
+
+class TestReaders:
+    def test_xevents(self) -> None:
+        records = read("xevents.xml")
+        assert [record.text for record in records] == [
+            "SELECT name FROM sys.databases;",
+            "CREATE LOGIN intruder WITH PASSWORD = 'x';",
+        ]
+        assert records[0].metadata() == {
+            "time": "2024-05-01T08:00:00.123Z",
+            "login": "app",
+            "host": "WEB01",
+            "database": "master",
+        }
+        assert records[1].position == 2
+
+    def test_profiler_utf_16(self) -> None:
+        records = read("profiler.xml")
+        assert [(record.text, record.login, record.host) for record in records] == [
+            ("EXEC sp_executesql N'SELECT 1';", "app", "WEB02"),
+            ("SELECT * FROM dbo.orders;", "app", None),
+        ]
+        assert records[0].database == "sales"
+
+    def test_query_store_csv(self) -> None:
+        records = read("querystore.csv")
+        assert [(record.position, record.time) for record in records] == [
+            (1, "2024-05-01 10:00:00"),
+            (2, "2024-05-01 10:05:00"),
+            (3, "2024-05-01 10:06:00"),
+        ]
+        assert records[1].text == "GRANT CONTROL SERVER TO [reporting]"
+
+    def test_csv_without_text(self) -> None:
+        with pytest.raises(ClickException, match="no column with sql text"):
+            list(read_log(io.BufferedReader(io.BytesIO(b"a,b\n1,2\n")), "x.csv", "csv"))  # type: ignore[arg-type]
+
+    def test_batches(self) -> None:
+        records = read("proxy.log")
+        assert [record.position for record in records] == [1, 3, 6]
+        assert records[2].text == "ALTER LOGIN app WITH PASSWORD = 'y';\nSELECT 2;\n"
+
+    def test_lines(self) -> None:
+        records = read("proxy.log", "lines")
+        assert [record.position for record in records] == [1, 3, 6, 7]
+
+    def test_invalid_xml(self) -> None:
+        stream = io.BufferedReader(io.BytesIO(b"<events><event name='a'>"))  # type: ignore[arg-type]
+        with pytest.raises(ClickException, match="Unable to read broken.xml"):
+            list(read_log(stream, "broken.xml"))
+
+    def test_xml_events_discarded(self) -> None:
+        events = "".join(f"<event><data name='statement'><value>SELECT {i};</value></data></event>" for i in range(5))
+        stream = io.BytesIO(f"<events>{events}</events>".encode())
+        parsers = []
+        iterparse = logs.ET.iterparse
+
+        def spy(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+            parsers.append(iterparse(*args, **kwargs))
+            return parsers[-1]
+
+        with patch.object(logs.ET, "iterparse", spy):
+            records = logs.read_xml(stream, "a.xml")  # type: ignore[arg-type]
+            assert next(records).text == "SELECT 0;"
+            assert len(list(records)) == 4
+
+        assert len(parsers[0].root) == 0
+
+    @pytest.mark.parametrize(
+        ("head", "source", "expected"),
+        [
+            (b"<?xml version='1.0'?><events>", "-", "xml"),
+            ("<TraceData>".encode("utf-16"), "trace", "xml"),
+            (b"query_id,query_sql_text\n1,SELECT 1", "-", "csv"),
+            (b"SELECT 1", "dump.csv", "csv"),
+            (b"SELECT 1;\nGO\nSELECT 2;", "-", "go"),
+            (b"SELECT 1;\nSELECT 2;", "-", "lines"),
+        ],
+    )
+    def test_detect_format(self, head: bytes, source: str, expected: str) -> None:
+        assert detect_format(head, source) == expected
+
+
+class TestLogChecker:
+    def test_check(self) -> None:
+        checker = LogChecker([NoCreateLogin, NoDynamicSQL])  # type: ignore[list-item]
+        results = list(checker.check(read("xevents.xml") + read("profiler.xml")))
+        assert [[x.id for x in violations] for _, violations in results] == [[], ["S001"], ["S013"], []]
+        assert (checker.records, checker.parsed, checker.failed) == (4, 2, 2)
+        assert checker.counts == {"S001": 1, "S013": 1}
+
+    def test_check_on_executor(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(logs, "CHUNK_SIZE", 2)
+        records = [Record(f"DROP USER u{i};" if i % 3 == 0 else f"SELECT {i};", "a.log", i) for i in range(30)]
+        checker = LogChecker([NoDropUser])  # type: ignore[list-item]
+        with ThreadPoolExecutor(2) as executor:
+            results = list(checker.check(records, executor))
+
+        assert [record.position for record, _ in results] == list(range(30))
+        assert [record.position for record, violations in results if violations] == list(range(0, 30, 3))
+        assert (checker.parsed, checker.failed) == (10, 10)
+
+
+class TestIngestCommand:
+    def test_json(self) -> None:
+        result = CliRunner(mix_stderr=False).invoke(
+            cli, ["ingest", str(LOGS / "querystore.csv"), str(LOGS / "xevents.xml"), "--output", "json"]
+        )
+        assert result.exit_code == 1
+        lines = [json.loads(line) for line in result.stdout.splitlines()]
+        assert [(x["position"], [v["id"] for v in x["violations"]]) for x in lines] == [
+            (2, ["S024"]),
+            (3, ["S015"]),
+            (2, ["S001"]),
+        ]
+        assert lines[2]["login"] == "dba"
+        assert lines[2]["host"] == "ADMIN02"
+        assert "Checked 5 records" in result.stderr
+
+    def test_standard_input(self) -> None:
+        result = CliRunner(mix_stderr=False).invoke(
+            cli, ["ingest", "-", "--format", "lines"], input="SELECT 1;\nDROP LOGIN x;\n"
+        )
+        assert result.exit_code == 1
+        assert result.stdout == "-:2: NoDropLogin (S002): DROP LOGIN x;\n"
+
+    def test_no_violations(self, tmp_path: Path) -> None:
+        log = tmp_path / "a.log"
+        log.write_text("SELECT 1;\n")
+        result = CliRunner().invoke(cli, ["ingest", str(log)])
+        assert result.exit_code == 0
+
+    def test_unknown_format(self) -> None:
+        result = CliRunner().invoke(cli, ["ingest", "-", "--format", "evtx"])
+        assert result.exit_code == 2
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+from typing import Any
+
+import pytest
+
+from queryguard import rules
+from queryguard.lsp import Document, LanguageServer, read_message, write_message
+
+
+def frame(*messages: dict[str, Any]) -> bytes:
+    output = io.BytesIO()
+    for message in messages:
+        write_message(output, {"jsonrpc": "2.0", **message})
+
+    return output.getvalue()
+
+
+class TestDocument:
+    def test_apply_range(self) -> None:
+        document = Document("file:///a.sql", "SELECT 1;\nSELECT 2;\n")
+        document.apply(
+            {"range": {"start": {"line": 1, "character": 7}, "end": {"line": 1, "character": 8}}, "text": "42"}
+        )
+        assert document.text == "SELECT 1;\nSELECT 42;\n"
+
+    def test_apply_full(self) -> None:
+        document = Document("file:///a.sql", "SELECT 1;")
+        document.apply({"text": "SELECT 2;\nGO\n"})
+        assert document.text == "SELECT 2;\nGO\n"
+        assert document.offset({"line": 1, "character": 2}) == 12
+
+    def test_utf16_positions(self) -> None:
+        document = Document("file:///a.sql", "SELECT '😀', 1;\r\nSELECT 2;")
+        assert document.offset({"line": 0, "character": 10}) == 9
+        assert document.position(9) == {"line": 0, "character": 10}
+        assert document.position(document.text.index("SELECT 2")) == {"line": 1, "character": 0}
+
+    def test_offset_clamped(self) -> None:
+        document = Document("file:///a.sql", "SELECT 1;\nSELECT 2;")
+        assert document.offset({"line": 0, "character": 99}) == 9
+        assert document.offset({"line": 5, "character": 0}) == len(document.text)
+
+
+class TestLanguageServer:
+    @pytest.fixture()
+    def server(self) -> LanguageServer:
+        return LanguageServer([rules.NoCreateLogin, rules.NoDropLogin])
+
+    def test_check_ranges(self, server: LanguageServer) -> None:
+        document = Document("file:///a.sql", "SELECT 1;\nGO\n\nCREATE LOGIN x WITH PASSWORD = 'p';\nGO\n")
+        diagnostics = server.check(document)
+        assert [(x["code"], x["range"]) for x in diagnostics] == [
+            ("S001", {"start": {"line": 3, "character": 0}, "end": {"line": 3, "character": 35}})
+        ]
+
+    def test_check_reuses_unchanged_batches(self, server: LanguageServer) -> None:
+        text = "".join(f"SELECT {i};\nGO\n" for i in range(5)) + "CREATE LOGIN x WITH PASSWORD = 'p';\n"
+        document = Document("file:///a.sql", text)
+        server.check(document)
+        assert (server.parsed, server.reused) == (6, 0)
+
+        document.apply(
+            {"range": {"start": {"line": 0, "character": 7}, "end": {"line": 0, "character": 8}}, "text": "10"}
+        )
+        diagnostics = server.check(document)
+        assert (server.parsed, server.reused) == (7, 5)
+        assert [x["range"]["start"] for x in diagnostics] == [{"line": 10, "character": 0}]
+
+    def test_unknown_request(self, server: LanguageServer) -> None:
+        output = io.BytesIO()
+        server._output = output
+        server.handle({"id": 3, "method": "textDocument/hover", "params": {}})
+        output.seek(0)
+        assert read_message(output) == {
+            "jsonrpc": "2.0",
+            "id": 3,
+            "error": {"code": -32601, "message": "Unknown method textDocument/hover"},
+        }
+
+    def test_serve(self, server: LanguageServer) -> None:
+        uri = "file:///a.sql"
+        input = io.BytesIO(
+            frame(
+                {"id": 1, "method": "initialize", "params": {}},
+                {"method": "textDocument/didOpen", "params": {"textDocument": {"uri": uri, "version": 1, "text": ""}}},
+                {"id": 2, "method": "shutdown"},
+                {"method": "exit"},
+            )
+        )
+        output = io.BytesIO()
+        assert server.serve(input, output) == 0
+        output.seek(0)
+        assert read_message(output)["result"]["capabilities"]["textDocumentSync"]["change"] == 2  # type: ignore[index]
+
+
+class TestCommand:
+    def test_session(self) -> None:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "queryguard", "lsp", "--debounce", "10"],  # noqa: S603
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        assert process.stdin and process.stdout
+        uri = "file:///editor.sql"
+
+        def send(*messages: dict[str, Any]) -> None:
+            process.stdin.write(frame(*messages))  # type: ignore[union-attr]
+            process.stdin.flush()  # type: ignore[union-attr]
+
+        def diagnostics() -> dict[str, Any]:
+            while True:
+                message = read_message(process.stdout)  # type: ignore[arg-type]
+                assert message is not None
+                if message.get("method") == "textDocument/publishDiagnostics":
+                    params: dict[str, Any] = message["params"]
+                    return params
+
+        send(
+            {"id": 1, "method": "initialize", "params": {}},
+            {"method": "initialized", "params": {}},
+            {
+                "method": "textDocument/didOpen",
+                "params": {"textDocument": {"uri": uri, "version": 1, "text": "SELECT 1;"}},
+            },
+        )
+        assert diagnostics() == {"uri": uri, "version": 1, "diagnostics": []}
+
+        change = {
+            "range": {"start": {"line": 0, "character": 0}, "end": {"line": 0, "character": 9}},
+            "text": "DROP LOGIN x;",
+        }
+        send(
+            {
+                "method": "textDocument/didChange",
+                "params": {"textDocument": {"uri": uri, "version": 2}, "contentChanges": [change]},
+            }
+        )
+        published = diagnostics()
+        assert published["version"] == 2
+        assert [x["code"] for x in published["diagnostics"]] == ["S002"]
+
+        send({"id": 2, "method": "shutdown"}, {"method": "exit"})
+        assert process.wait(10) == 0
+        process.stdout.close()
+        process.stdin.close()
@@ -87,3 +87,15 @@ class TestConsoleJson:
         assert isinstance(json_output, list)
         assert json_output[0]["status"] == "Failed"
         assert json_output[1]["status"] == "Passed"
+
+    def test_process_result_skipped(self, capsys: pytest.CaptureFixture) -> None:
+        console_text = ConsoleJson()
+        files = [File(Path("file1.sql"))]
+        files[0].skip("binary file")
+
+        console_text.process_result(files)
+        captured = capsys.readouterr()
+
+        json_output = json.loads(captured.out.strip().replace("\n", ""))
+        assert json_output[0]["status"] == "Skipped"
+        assert json_output[0]["reason"] == "binary file"
@@ -15,3 +15,58 @@ class TestParser:
         token = statements[0].tokens[-1]
         next_token = SQLParser.get_next_token(statements[0], token)
         assert next_token is None
+
+    def test_elide_values_rows(self) -> None:
+        query = "INSERT INTO t VALUES (1, 'a'), (2, N'b''c'), (-3.5, NULL);\nGO\nCREATE LOGIN x WITH PASSWORD = 'y';"
+        elided = SQLParser.elide_data_sections(query)
+        assert elided.text == "INSERT INTO t VALUES (NULL);\nGO\nCREATE LOGIN x WITH PASSWORD = 'y';"
+        assert len(SQLParser.get_all_statements(query)) == len(SQLParser.get_all_statements(query, literal_limit=None))
+
+    def test_elide_values_keeps_expressions(self) -> None:
+        query = "INSERT INTO t VALUES (1), (dbo.fn(2));"
+        elided = SQLParser.elide_data_sections(query)
+        assert elided.text == "INSERT INTO t VALUES (NULL), (dbo.fn(2));"
+
+    def test_elide_ignores_comments_and_strings(self) -> None:
+        query = "-- VALUES (1)\nSELECT 'VALUES (2)' /* VALUES (3) */;"
+        elided = SQLParser.elide_data_sections(query)
+        assert elided.text == query
+        assert elided.spans == []
+
+    def test_elide_skips_quoted_identifiers(self) -> None:
+        for first in ("SELECT [Customer's Name] FROM t;\n", 'SELECT "Customer\'s Name" FROM t;\n'):
+            query = first + "SELECT 1;\n" * 500 + "GRANT CONTROL SERVER TO bob;\nSELECT 'x';"
+            elided = SQLParser.elide_data_sections(query)
+            assert elided.text == query
+            statements = SQLParser.get_all_statements(query)
+            assert any(str(statement).strip().startswith("GRANT CONTROL SERVER") for statement in statements)
+
+    def test_elide_oversized_literal(self) -> None:
+        query = "EXEC sp_configure '" + "x" * 100 + "', 1;\nSELECT 'short';"
+        elided = SQLParser.elide_data_sections(query, literal_limit=10)
+        assert elided.text == "EXEC sp_configure '', 1;\nSELECT 'short';"
+        assert elided.original_offset(0) == 0
+        assert elided.original_offset(18) == 18
+        assert elided.original_offset(elided.text.index("SELECT")) == query.index("SELECT")
+
+    def test_normalize(self) -> None:
+        query = "SELECT  t1.a FROM [t 2] -- user 42\n   WHERE id = 0x1F AND name = N'bob''s' /* req 7 */;"
+        shape = SQLParser.normalize(query)
+        assert shape.text == "SELECT t1.a FROM [t 2] --\nWHERE id = 0 AND name = N'' /**/;"
+        assert shape.original_offset(shape.text.index("WHERE")) == query.index("WHERE")
+        assert SQLParser.normalize("SELECT 'a', 1;").text == SQLParser.normalize("SELECT 'bc', 23;").text
+
+    def test_split_batches(self) -> None:
+        query = "SELECT 'a\nGO\n';\r\nGO\r\n/*\ngo\n*/\nSELECT 1\ngo 5\nSELECT 2"
+        batches = SQLParser.split_batches(query)
+        assert [text for _, text in batches] == [
+            "SELECT 'a\nGO\n';",
+            "\r\nGO\r\n/*\ngo\n*/\nSELECT 1",
+            "\ngo 5\nSELECT 2",
+        ]
+        assert all(query[offset : offset + len(text)] == text for offset, text in batches)
+
+    def test_split_batches_skips_quoted_identifiers(self) -> None:
+        query = "SELECT [a'b] FROM t\nGO\nSELECT 'c'\nGO\nSELECT [d\nGO\n]"
+        batches = SQLParser.split_batches(query)
+        assert [text for _, text in batches] == ["SELECT [a'b] FROM t", "\nGO\nSELECT 'c'", "\nGO\nSELECT [d\nGO\n]"]
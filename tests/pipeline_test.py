@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from queryguard.exceptions import SkippedFile
+from queryguard.files import File
+from queryguard.pipeline import BufferPool, ReadAhead
+from queryguard.rules import NoCreateLogin
+
+
+class TestBufferPool:
+    def test_reuse(self) -> None:
+        pool = BufferPool()
+        buffer = pool.acquire(100)
+        pool.release(buffer)
+        assert pool.acquire(50) is buffer
+        assert pool.allocations == 1
+
+    def test_grow(self) -> None:
+        pool = BufferPool()
+        pool.release(pool.acquire(10))
+        assert len(pool.acquire(100)) == 100
+        assert pool.allocations == 2
+        assert repr(pool) == "BufferPool(buffers=0, allocations=2)"
+
+
+class TestReadAhead:
+    @pytest.fixture()
+    def paths(self, tmp_path: Path) -> list[Path]:
+        paths = []
+        for index in range(5):
+            path = tmp_path / f"{index}.sql"
+            path.write_text(f"SELECT {index};\nGO\nCREATE LOGIN login_{index};")
+            paths.append(path)
+
+        return paths
+
+    @pytest.mark.parametrize("depth", [0, 2, 8])
+    def test_read(self, paths: list[Path], depth: int) -> None:
+        with ReadAhead(paths, depth=depth, threads=2) as read_ahead:
+            for path in paths:
+                with read_ahead.read(path) as source:
+                    assert source.text == path.read_text()
+
+        assert read_ahead.stats.files == len(paths)
+        assert read_ahead.stats.bytes == sum(path.stat().st_size for path in paths)
+        assert read_ahead._pool.allocations <= depth + 1
+
+    def test_evaluate(self, paths: list[Path]) -> None:
+        files = [File(path) for path in paths]
+        with ReadAhead(paths, depth=2, threads=2) as read_ahead:
+            for file in files:
+                file.evaluate([NoCreateLogin], reader=read_ahead.read)
+
+        for file in files:
+            assert [x.id for x in file.violations] == ["S001"]
+            assert "CREATE LOGIN login_" in file.violations[0].statement
+
+    def test_skipped(self, paths: list[Path]) -> None:
+        paths[1].write_bytes(b"\x00\x01\x02\x03\x00\x00\x00\x00\x00")
+        with ReadAhead(paths, depth=4, max_size=1000) as read_ahead:
+            read_ahead.read(paths[0]).close()
+            with pytest.raises(SkippedFile, match="binary file"):
+                read_ahead.read(paths[1])
+
+        paths[2].write_text("SELECT 1;" * 200)
+        with ReadAhead(paths, depth=4, max_size=1000) as read_ahead, pytest.raises(SkippedFile, match="larger than"):
+            read_ahead.read(paths[2])
+
+    def test_close_unread(self, paths: list[Path]) -> None:
+        with ReadAhead(paths, depth=4) as read_ahead:
+            read_ahead.read(paths[0]).close()
+
+        assert read_ahead._futures == {}
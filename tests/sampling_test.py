@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import random
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.rules import NoDropLogin, NoDropUser
+from queryguard.sampling import Estimator, Reservoir, get_sample_size, wilson
+
+
+class TestReservoir:
+    def test_uniform(self) -> None:
+        rng = random.Random(7)
+        counts: Counter[int] = Counter()
+        for _ in range(2000):
+            reservoir: Reservoir[int] = Reservoir(10, rng)
+            for item in range(1000):
+                reservoir.add(item)
+            counts.update(item // 100 for item in reservoir.items)
+
+        assert reservoir.seen == 1000
+        assert all(1700 < counts[decile] < 2300 for decile in range(10))
+
+    def test_small_stream(self) -> None:
+        reservoir: Reservoir[int] = Reservoir(10, random.Random(1))
+        for item in range(3):
+            reservoir.add(item)
+        assert reservoir.items == [0, 1, 2]
+
+
+class TestEstimator:
+    def test_wilson(self) -> None:
+        assert wilson(0.5, 100) == pytest.approx((0.4038, 0.5962), abs=1e-4)
+        assert wilson(0.0, 100) == pytest.approx((0.0, 0.0370), abs=1e-4)
+        assert get_sample_size(0.01) == 9604
+
+    def test_records(self) -> None:
+        estimator = Estimator([NoDropUser, NoDropLogin], 10000, 10000)  # type: ignore[list-item]
+        for index in range(400):
+            counts = Counter({("NoDropUser", "S015"): 1} if index % 10 == 0 else {})
+            estimator.add("a.log" if index < 200 else "b.log", 1, counts)
+
+        user, login = estimator.estimates()
+        assert (user.violations, user.rate, round(user.rate * user.records)) == (40, 0.1, 1000)
+        assert 0.07 < user.low < 0.1 < user.high < 0.14
+        assert (login.rate, login.low) == (0.0, 0.0)
+        assert 0 < login.high < 0.01
+        assert estimator.strata == {"a.log": 20, "b.log": 20}
+        assert estimator.precise(0.05)
+        assert not estimator.precise(0.01)
+
+    def test_logs(self) -> None:
+        clustered = Estimator([NoDropUser], 100)  # type: ignore[list-item]
+        spread = Estimator([NoDropUser], 100)  # type: ignore[list-item]
+        for index in range(10):
+            clustered.add(f"{index}.log", 100, Counter({("NoDropUser", "S015"): 100} if index == 0 else {}))
+            spread.add(f"{index}.log", 100, Counter({("NoDropUser", "S015"): 10}))
+
+        assert clustered.estimates()[0].rate == spread.estimates()[0].rate == 0.1
+        assert clustered.estimates()[0].high > spread.estimates()[0].high
+        assert clustered.estimates()[0].records == 10000
+
+    def test_census(self) -> None:
+        estimator = Estimator([NoDropUser], 2)  # type: ignore[list-item]
+        estimator.add("a.log", 5, Counter({("NoDropUser", "S015"): 1}))
+        estimator.add("b.log", 5, Counter())
+        estimate = estimator.estimates()[0]
+        assert estimate.low == estimate.rate == estimate.high == 0.1
+
+
+class TestSampleCommand:
+    @pytest.fixture(autouse=True)
+    def no_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("QUERYGUARD_NO_CACHE", "true")
+
+    @pytest.fixture()
+    def logs(self, tmp_path: Path) -> list[str]:
+        paths = []
+        for index in range(4):
+            path = tmp_path / f"{index}.log"
+            lines = [f"SELECT {i};\n" for i in range(50)]
+            if index == 2:
+                lines[7] = "DROP USER u;\n"
+            path.write_text("".join(lines))
+            paths.append(str(path))
+        return paths
+
+    def test_records(self, logs: list[str]) -> None:
+        args = ["ingest", *logs, "--sample", "500", "--seed", "3", "--select", "S015", "--output", "json"]
+        result = CliRunner(mix_stderr=False).invoke(cli, args)
+        record, estimates = (json.loads(line) for line in result.stdout.splitlines())
+        assert (record["source"], record["position"]) == (logs[2], 8)
+        sample = estimates["sample"]
+        assert (sample["units"], sample["population"], sample["total"]) == (200, 200, 200)
+        assert sample["estimates"][0]["rate"] == pytest.approx(1 / 200)
+        assert "Sampled 200 of 200 records" in result.stderr
+        assert result.exit_code == 1
+
+    def test_escalate(self, logs: list[str]) -> None:
+        args = ["ingest", *logs, "--sample", "100", "--escalate", "--select", "S015", "--output", "json", "--seed"]
+        for seed in range(20):
+            result = CliRunner(mix_stderr=False).invoke(cli, [*args, str(seed)])
+            estimates, *records = (json.loads(line) for line in result.stdout.splitlines())
+            if estimates["sample"]["strata"]:
+                break
+
+        assert estimates["sample"]["strata"] == {logs[2]: 1}
+        assert [(x["source"], x["position"]) for x in records] == [(logs[2], 8)]
+        assert "50 records of 1 logs checked in full, 1 with violations" in result.stderr
+        assert result.exit_code == 1
+
+    def test_logs(self, logs: list[str]) -> None:
+        args = ["ingest", *logs, "--sample", "2", "--sample-by", "logs", "--seed", "1", "--select", "S015"]
+        result = CliRunner(mix_stderr=False).invoke(cli, args)
+        assert "100 records checked in 2 of 4 logs" in " ".join(result.stdout.split())
+        assert "Sampled 2 of 4 logs" in result.stderr
+
+    def test_shared_id(self, tmp_path: Path) -> None:
+        log = tmp_path / "q.log"
+        log.write_text("SELECT 1;\nEXEC sp_configure 'show advanced options', 1;\nSELECT 2;\nSELECT 3;\n")
+        result = CliRunner(mix_stderr=False).invoke(cli, ["ingest", str(log), "--sample", "4", "--output", "json"])
+        estimates = json.loads(result.stdout.splitlines()[-1])["sample"]["estimates"]
+        violations = {x["name"]: x["violations"] for x in estimates if x["id"] == "S021"}
+        assert violations == {"NoAlterServerConfiguration": 1, "NoAlterAuthExceptObject": 0}
+
+    def test_standard_input(self) -> None:
+        result = CliRunner().invoke(cli, ["ingest", "-", "--sample", "5", "--escalate"], input="SELECT 1;\n")
+        assert result.exit_code == 2
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import click
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.shard import parse_shard, partition
+
+
+class TestPartition:
+    def test_balanced(self) -> None:
+        items = [(f"{i}.sql", size) for i, size in enumerate([900, 500, 400, 300, 300, 200, 100, 100])]
+        shards = partition(items, 3)
+        totals = [sum(size for (_, size), shard in zip(items, shards) if shard == x) for x in range(3)]
+        assert sorted(totals) == [900, 900, 1000]
+
+    def test_independent_of_order(self) -> None:
+        items = [(f"{i}.sql", i % 7 * 100) for i in range(50)]
+        shards = dict(zip(items, partition(items, 4)))
+        reordered = list(reversed(items))
+        assert dict(zip(reordered, partition(reordered, 4))) == shards
+        assert set(shards.values()) == {0, 1, 2, 3}
+
+    def test_more_shards_than_items(self) -> None:
+        assert partition([("a.sql", 10)], 3) == [0]
+
+
+class TestParseShard:
+    def test_valid(self) -> None:
+        assert parse_shard("1/4") == (0, 4)
+        assert parse_shard("4/4") == (3, 4)
+
+    @pytest.mark.parametrize("value", ["", "1", "0/4", "5/4", "a/b", "1/2/3"])
+    def test_invalid(self, value: str) -> None:
+        with pytest.raises(click.ClickException):
+            parse_shard(value)
+
+
+class TestMerge:
+    def test_shard_and_merge(self, tmp_path: Path) -> None:
+        runner = CliRunner()
+        env = {"COLUMNS": "1000"}
+        all_files = runner.invoke(cli, ["./tests/sql", "--output", "json", "--no-cache"], env=env)
+        reports = []
+        for index in range(1, 4):
+            result = runner.invoke(
+                cli, ["./tests/sql", "--shard", f"{index}/3", "--output", "json", "--no-cache"], env=env
+            )
+            reports.append(tmp_path / f"{index}.json")
+            reports[-1].write_text(result.output)
+
+        shards = [{x["path"] for x in json.loads(report.read_text())} for report in reports]
+        assert all(shards)
+        assert set.union(*shards) == {x["path"] for x in json.loads(all_files.output)}
+        assert sum(len(x) for x in shards) == len(json.loads(all_files.output))
+
+        result = runner.invoke(cli, ["merge", *map(str, reports), "--output", "json"], env=env)
+        assert result.exit_code == 1
+        merged = {x["path"]: x for x in json.loads(result.output)}
+        expected = {x["path"]: x for x in json.loads(all_files.output)}
+        assert merged.keys() == expected.keys()
+        for path, file in merged.items():
+            assert file["status"] == expected[path]["status"]
+            assert [(x["id"], x["statement"]) for x in file["violations"]] == [
+                (x["id"], x["statement"]) for x in expected[path]["violations"]
+            ]
+
+    def test_merge_passed(self, tmp_path: Path) -> None:
+        runner = CliRunner()
+        result = runner.invoke(cli, ["./tests/sql/no_violations.sql", "--output", "json"], env={"COLUMNS": "1000"})
+        report = tmp_path / "report.json"
+        report.write_text(result.output)
+
+        result = runner.invoke(cli, ["merge", str(report), str(report)])
+        assert result.exit_code == 0
+        assert "Passed" in result.output
+
+    def test_merge_invalid_report(self, tmp_path: Path) -> None:
+        report = tmp_path / "report.json"
+        report.write_text("not json")
+        result = CliRunner().invoke(cli, ["merge", str(report)])
+        assert result.exit_code == 1
+        assert "Invalid report" in result.output
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import codecs
+import pickle
+from pathlib import Path
+
+import pytest
+
+from queryguard.exceptions import SkippedFile
+from queryguard.files import File
+from queryguard.rules import NoCreateLogin, NoCreateServerRole
+from queryguard.source import Source, sniff_encoding
+
+
+class TestSource:
+    def test_sniff_bom(self) -> None:
+        assert sniff_encoding(codecs.BOM_UTF8 + b"select 1") == ("utf-8", 3)
+        assert sniff_encoding(codecs.BOM_UTF16_LE + "select 1".encode("utf-16-le")) == ("utf-16-le", 2)
+        assert sniff_encoding(codecs.BOM_UTF32_BE + "select 1".encode("utf-32-be")) == ("utf-32-be", 4)
+
+    def test_sniff_utf_16_without_bom(self) -> None:
+        assert sniff_encoding("select 1".encode("utf-16-le")) == ("utf-16-le", 0)
+        assert sniff_encoding("select 1".encode("utf-16-be")) == ("utf-16-be", 0)
+        assert sniff_encoding(b"select 1") == (None, 0)
+
+    def test_sniff_binary(self) -> None:
+        with pytest.raises(SkippedFile):
+            sniff_encoding(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR\x00\x00\x04\x2b\x00\x00\x01\x18\x08\x06")
+
+    def test_decode_fallback(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "legacy.sql"
+        file_path.write_bytes("SELECT 'café €';".encode("cp1252"))
+        source = Source(file_path)
+        assert source.text == "SELECT 'café €';"
+        assert source.encoding == "cp1252"
+
+        with pytest.raises(SkippedFile):
+            Source(file_path, encodings=()).text  # noqa: B018
+
+    def test_read_oversized(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "large.sql"
+        file_path.write_text("SELECT 1;")
+        assert Source.read(file_path, max_size=100).text == "SELECT 1;"
+
+        with pytest.raises(SkippedFile):
+            Source.read(file_path, max_size=5)
+
+    def test_batches_and_snippets(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "batches.sql"
+        file_path.write_bytes(codecs.BOM_UTF8 + "SELECT 'é';\r\nGO\r\nCREATE LOGIN x;".encode())
+
+        with Source.read(file_path) as source:
+            batches = list(source.batches())
+            assert batches == [(3, "SELECT 'é';"), (15, "\r\nGO\r\nCREATE LOGIN x;")]
+            assert source.byte_offset(15, batches[1][1], 6) == 21
+
+        assert source.snippet(21, length=12) == "CREATE LOGIN"
+        assert pickle.loads(pickle.dumps(source)).snippet(3, length=4) == "SELE"  # noqa: S301
+
+    def test_batches_utf_16(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "utf_16.sql"
+        file_path.write_text("SELECT 1;\nGO\nCREATE LOGIN x;", encoding="utf-16")
+
+        with Source.read(file_path) as source:
+            assert list(source.batches()) == [(2, "SELECT 1;"), (20, "\nGO\nCREATE LOGIN x;")]
+            assert source.snippet(28, length=12) == "CREATE LOGIN"
+
+    def test_file_evaluate_offsets(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "violations.sql"
+        file_path.write_text("INSERT INTO t VALUES ('é'), ('ü');\nGO\nCREATE SERVER ROLE r;\nCREATE LOGIN x;")
+
+        file = File(file_path)
+        file.evaluate([NoCreateLogin, NoCreateServerRole])
+
+        data = file_path.read_bytes()
+        assert [x.offset for x in file.violations] == [data.index(b"\nGO"), data.index(b"\nCREATE LOGIN")]
+        assert file.violations[1].statement.strip() == "CREATE LOGIN x;"
+
+    def test_file_evaluate_statement_bounds(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "violations.sql"
+        file_path.write_text("CREATE LOGIN x WITH PASSWORD='a';\nSELECT 1;\nSELECT 2;\nSELECT 3;\n", encoding="utf-16")
+
+        file = File(file_path)
+        file.evaluate([NoCreateLogin])
+        file_path.write_text("SELECT 4;\n")
+
+        assert file.violations[0].statement.strip() == "CREATE LOGIN x WITH PASSWORD='a';"
+        assert pickle.loads(pickle.dumps(file.violations[0])).statement == file.violations[0].statement  # noqa: S301
+
+    def test_file_evaluate_skipped(self, tmp_path: Path) -> None:
+        file_path = tmp_path / "binary.sql"
+        file_path.write_bytes(b"\x00\x01\x02\x03\x00\x00\x00\x00\x00")
+        file = File(file_path)
+        file.evaluate([])
+        assert file.status == "Skipped ⚠️"
+        assert file.reason == "binary file"
+        assert file.violations == []
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from queryguard.files import File
+from queryguard.rules import NoCreateLogin
+from queryguard.tree import TreeCache
+
+
+@pytest.fixture()
+def sample_tree(tmp_path: Path) -> Path:
+    root = tmp_path / "root"
+    (root / "sub" / "deep").mkdir(parents=True)
+    (root / "a.sql").write_text("SELECT 1;\nCREATE LOGIN a;")
+    (root / "sub" / "b.sql").write_text("SELECT 2;")
+    (root / "sub" / "deep" / "c.sql").write_text("CREATE LOGIN c;")
+    (root / "sub" / "notes.txt").write_text("CREATE LOGIN x;")
+    return root
+
+
+def evaluate(tree: TreeCache) -> list[File]:
+    files = tree.get_files()
+    pending = [file for file in files if file.status == "Not Run"]
+    for file in pending:
+        file.evaluate([NoCreateLogin])
+
+    tree.update(pending)
+    return files
+
+
+def verdicts(files: list[File]) -> list[tuple[str, str, list[tuple[str, None | int, str]]]]:
+    return sorted((str(x.path), x.status, [(v.id, v.offset, v.statement.strip()) for v in x.violations]) for x in files)
+
+
+class TestTreeCache:
+    def test_file_round_trip(self, sample_tree: Path) -> None:
+        file = File(sample_tree / "a.sql")
+        file.evaluate([NoCreateLogin])
+        restored = File.from_dict(file.to_dict())
+        assert restored.to_dict() == file.to_dict()
+        assert restored.violations[0].statement.strip() == "CREATE LOGIN a;"
+
+    def test_unchanged_tree(self, tmp_path: Path, sample_tree: Path) -> None:
+        first = TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60)
+        files = evaluate(first)
+        assert len(files) == 3
+        assert first.scanned == 3
+        assert first.digest
+
+        second = TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60)
+        with patch.object(File, "evaluate") as evaluate_file:
+            cached = evaluate(second)
+            evaluate_file.assert_not_called()
+
+        assert (second.scanned, second.reused) == (0, 3)
+        assert verdicts(cached) == verdicts(files)
+        assert second.digest == first.digest
+
+        other = TreeCache(tmp_path / "cache", sample_tree, "other rules", max_age=60)
+        other.get_files()
+        assert other.scanned == 3
+
+    def test_added_file(self, tmp_path: Path, sample_tree: Path) -> None:
+        evaluate(TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60))
+        (sample_tree / "new.sql").write_text("CREATE LOGIN n;")
+
+        tree = TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60)
+        files = evaluate(tree)
+        assert (tree.scanned, tree.reused) == (1, 3)
+        assert [x.status for x in files if x.path.name == "new.sql"] == ["Failed ❌"]
+
+    def test_revalidation(self, tmp_path: Path, sample_tree: Path) -> None:
+        first = TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60)
+        evaluate(first)
+        (sample_tree / "sub" / "b.sql").write_text("SELECT 2;\nCREATE LOGIN b;")
+
+        tree = TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60)
+        assert [x.status for x in tree.get_files() if x.path.name == "b.sql"] == ["Passed ✅"]
+
+        tree = TreeCache(tmp_path / "cache", sample_tree, "salt", max_age=60)
+        with patch("queryguard.tree.time.time", return_value=time.time() + 61):
+            files = evaluate(tree)
+
+        assert (tree.scanned, tree.reused) == (3, 2)
+        assert [x.status for x in files if x.path.name == "b.sql"] == ["Failed ❌"]
+        assert tree.digest != first.digest
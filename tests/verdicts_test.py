@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.logs import LogChecker, Record
+from queryguard.rules import NoCreateLogin, NoDropUser, NoDynamicSQL
+from queryguard.verdicts import VerdictStore, get_shape, get_verdict, get_violations
+
+
+def records(*texts: str) -> list[Record]:
+    return [Record(text, "a.log", position) for position, text in enumerate(texts, 1)]
+
+
+class TestShapes:
+    def test_same_shape(self) -> None:
+        first, _ = get_shape("DROP USER u1; -- ticket 12\nSELECT 'a' + 'b';")
+        second, _ = get_shape("DROP USER u1; -- ticket 345\nSELECT 'cd' + 'e';")
+        assert first == second
+        assert get_shape("DROP USER u2;")[0] != first
+
+    def test_violations(self) -> None:
+        text = "SELECT 'a long literal';\n   DROP USER u1;\nSELECT 1;"
+        _, shape = get_shape(text)
+        verdict = get_verdict(shape.text, [NoCreateLogin, NoDropUser])  # type: ignore[list-item]
+        assert [x[:2] for x in verdict] == [("NoDropUser", "S015")]
+        violations = get_violations(verdict, text, shape)
+        assert [(str(x), x.statement.strip(), x.offset) for x in violations] == [
+            ("NoDropUser (S015)", "DROP USER u1;", text.index("\n"))
+        ]
+
+
+class TestVerdictStore:
+    def test_persistence(self, tmp_path: Path) -> None:
+        path = tmp_path / "cache" / "verdicts.db"
+        verdict = (("NoDropUser", "S015", 0, 13),)
+        with VerdictStore(path, [NoDropUser]) as store:  # type: ignore[list-item]
+            store.put({b"a": verdict, b"b": ()})
+            assert store.get([b"a", b"c"]) == {b"a": verdict}
+            assert (store.hits, store.misses) == (1, 1)
+
+        with VerdictStore(path, [NoDropUser]) as store:  # type: ignore[list-item]
+            assert store.get([b"a", b"b", b"a"]) == {b"a": verdict, b"b": ()}
+            assert store.get([b"b"]) == {b"b": ()}
+            assert (store.hits, store.loaded, store.misses) == (1, 2, 0)
+
+        with VerdictStore(path, [NoDropUser, NoCreateLogin]) as store:  # type: ignore[list-item]
+            assert store.get([b"a"]) == {}
+
+    def test_front_size(self, tmp_path: Path) -> None:
+        with VerdictStore(tmp_path / "verdicts.db", [NoDropUser], front_size=1) as store:  # type: ignore[list-item]
+            store.put({b"a": (), b"b": ()})
+            assert store.get([b"a", b"b"]) == {b"a": (), b"b": ()}
+            assert (store.hits, store.loaded) == (1, 1)
+
+
+class TestLogChecker:
+    def test_reuses_verdicts(self, tmp_path: Path) -> None:
+        rules = [NoDropUser, NoDynamicSQL]
+        texts = ("SELECT 1;", "DROP USER a; -- 1", "DROP USER bb; -- 2", "EXEC ('SELECT ' + @x);", "DROP USER a; --")
+        expected = [[str(x) for x in violations] for _, violations in LogChecker(rules).check(records(*texts))]  # type: ignore[arg-type]
+        with VerdictStore(tmp_path / "verdicts.db", rules) as store:  # type: ignore[arg-type]
+            checker = LogChecker(rules, store=store)  # type: ignore[arg-type]
+            results = list(checker.check(records(*texts)))
+            assert [[str(x) for x in violations] for _, violations in results] == expected
+            assert results[2][1][0].statement == "DROP USER bb; -- 2"
+            assert (checker.records, checker.parsed, checker.reused, checker.failed) == (5, 3, 0, 4)
+
+            checker = LogChecker(rules, store=store)  # type: ignore[arg-type]
+            results = list(checker.check(records(*texts)))
+            assert [[str(x) for x in violations] for _, violations in results] == expected
+            assert (checker.parsed, checker.reused) == (0, 4)
+
+
+class TestIngestCommand:
+    def test_stored_verdicts(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("QUERYGUARD_CACHE_DIR", str(tmp_path / "cache"))
+        log = tmp_path / "a.log"
+        log.write_text("DROP LOGIN x;\nDROP LOGIN y;\nSELECT 1;\n")
+        outputs = []
+        for _ in range(2):
+            result = CliRunner(mix_stderr=False).invoke(cli, ["ingest", str(log)])
+            assert result.exit_code == 1
+            outputs.append(result.stdout)
+
+        assert (
+            outputs[0]
+            == outputs[1]
+            == "".join(f"{log}:{i}: NoDropLogin (S002): DROP LOGIN {x};\n" for i, x in [(1, "x"), (2, "y")])
+        )
+        assert "0 parsed, 2 from stored verdicts" in result.stderr
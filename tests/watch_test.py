@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import signal
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.exceptions import Interrupted
+from queryguard.watch import Changes, InotifyWatcher, PollingWatcher, get_watcher, wait_for_changes
+
+
+class FakeWatcher:
+    def __init__(self, changes: list[Changes]) -> None:
+        self.changes = changes
+        self.timeouts: list[None | float] = []
+
+    def read(self, timeout: None | float) -> Changes:
+        self.timeouts.append(timeout)
+        return self.changes.pop(0) if self.changes else set()
+
+
+@pytest.fixture()
+def tree(tmp_path: Path) -> Path:
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.sql").write_text("SELECT 1;")
+    (tmp_path / "sub" / "b.sql").write_text("SELECT 2;")
+    return tmp_path
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher(request: pytest.FixtureRequest, tree: Path) -> Iterator[InotifyWatcher | PollingWatcher]:
+    if request.param == "polling":
+        with PollingWatcher([tree], interval=0.01) as polling:
+            yield polling
+    elif not sys.platform.startswith("linux"):
+        pytest.skip("inotify is only available on Linux")
+    else:
+        with InotifyWatcher([tree]) as inotify:
+            yield inotify
+
+
+class TestWatchers:
+    def test_modified_created_and_deleted(self, watcher: InotifyWatcher | PollingWatcher, tree: Path) -> None:
+        assert watcher.read(0.05) == set()
+        (tree / "a.sql").write_text("SELECT 3;")
+        (tree / "sub" / "b.sql").unlink()
+        (tree / "notes.txt").write_text("ignored")
+        (tree / "new").mkdir()
+        (tree / "new" / "c.sql").write_text("SELECT 4;")
+        assert wait_for_changes(watcher, 0.1) == {tree / "a.sql", tree / "sub" / "b.sql", tree / "new" / "c.sql"}
+
+    def test_file(self, tree: Path) -> None:
+        with get_watcher([tree / "a.sql"]) as watcher:
+            (tree / "b.sql").write_text("SELECT 5;")
+            (tree / "a.sql").write_text("SELECT 6;")
+            assert wait_for_changes(watcher, 0.1) == {tree / "a.sql"}
+
+
+class TestWaitForChanges:
+    def test_debounce(self, tmp_path: Path) -> None:
+        watcher = FakeWatcher([{tmp_path / "a.sql"}, {tmp_path / "b.sql"}, set(), {tmp_path / "c.sql"}])
+        assert wait_for_changes(watcher, 0.2) == {tmp_path / "a.sql", tmp_path / "b.sql"}  # type: ignore[arg-type]
+        assert watcher.timeouts == [None, 0.2, 0.2]
+
+    def test_rescan(self, tmp_path: Path) -> None:
+        watcher = FakeWatcher([{tmp_path / "a.sql"}, None, {tmp_path / "b.sql"}])
+        assert wait_for_changes(watcher, 0.2) is None  # type: ignore[arg-type]
+
+    def test_max_delay(self, tmp_path: Path) -> None:
+        watcher = FakeWatcher([{tmp_path / "a.sql"}] * 1000)
+        assert wait_for_changes(watcher, 0, max_delay=0.01) == {tmp_path / "a.sql"}  # type: ignore[arg-type]
+
+
+class TestWatchCommand:
+    def test_checks_changed_files(self, tree: Path) -> None:
+        def edit(watcher: InotifyWatcher | PollingWatcher, debounce: float) -> Changes:
+            if edits:
+                return edits.pop(0)()
+
+            raise Interrupted(signal.SIGINT)
+
+        def first() -> Changes:
+            (tree / "a.sql").write_text("CREATE LOGIN a WITH PASSWORD = 'x';")
+            (tree / "sub" / "b.sql").unlink()
+            return {tree / "a.sql", tree / "sub" / "b.sql"}
+
+        def second() -> Changes:
+            (tree / "c.sql").write_text("SELECT 7;")
+            return None
+
+        edits = [first, second]
+        with patch("queryguard.engine.wait_for_changes", side_effect=edit):
+            result = CliRunner().invoke(cli, [str(tree), "--watch", "--no-cache", "--output", "json"])
+
+        assert result.exit_code == 1
+        reports = [json.loads(f"{x}]") for x in result.output.split("\n]")[:-1]]
+        assert [{Path(x["path"]).name: x["status"] for x in report} for report in reports] == [
+            {"a.sql": "Passed", "b.sql": "Passed"},
+            {"a.sql": "Failed"},
+            {"a.sql": "Failed", "c.sql": "Passed"},
+        ]
+
+    def test_rejects_other_inputs(self, tree: Path) -> None:
+        result = CliRunner().invoke(cli, [str(tree), "--watch", "--no-cache", "--shard", "1/2"])
+        assert result.exit_code == 1
+        assert "can't be combined with shard" in result.output
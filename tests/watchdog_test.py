@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.files import File
+from queryguard.rules import NoCreateLogin
+from queryguard.watchdog import Watchdog
+
+# The workers inherit the patched File.evaluate when they are forked.
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="needs forked workers")
+
+evaluate = File.evaluate
+
+
+def pathological(self: File, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401
+    if self.path.name == "slow.sql":
+        time.sleep(30)
+    elif self.path.name == "large.sql":
+        bytearray(4 << 30)
+    elif self.path.name == "crash.sql":
+        os._exit(3)
+    elif self.path.name == "killed.sql":
+        os.kill(os.getpid(), signal.SIGKILL)
+    elif self.path.name == "error.sql":
+        raise ValueError("unexpected token")
+
+    evaluate(self, *args, **kwargs)
+
+
+@pytest.fixture()
+def paths(tmp_path: Path) -> Iterator[list[Path]]:
+    paths = []
+    for name in ("a.sql", "slow.sql", "b.sql", "large.sql", "crash.sql", "killed.sql", "error.sql", "c.sql"):
+        paths.append(tmp_path / name)
+        paths[-1].write_text("CREATE LOGIN a WITH PASSWORD = 'x';")
+
+    with patch.object(File, "evaluate", pathological):
+        yield paths
+
+
+class TestWatchdog:
+    def test_budgets(self, paths: list[Path]) -> None:
+        watchdog = Watchdog([NoCreateLogin], 1000, timeout=2, memory=2 << 30, workers=2)  # type: ignore[list-item]
+        started = time.monotonic()
+        files = dict(watchdog.evaluate((file.path.name, file) for file in map(File, paths)))
+        assert time.monotonic() - started < 10
+
+        assert list(files)[-1] == "slow.sql"
+        assert [files[name].status for name in ("a.sql", "b.sql", "c.sql")] == ["Failed ❌"] * 3
+        assert files["slow.sql"].reason == "budget exceeded: took longer than 2 s"
+        assert files["large.sql"].reason == "budget exceeded: used more than 2048 MB"
+        assert files["killed.sql"].reason == "budget exceeded: the worker was stopped by SIGKILL"
+        assert files["crash.sql"].reason == "the worker crashed with exit code 3"
+        assert files["error.sql"].reason == "the worker failed: ValueError('unexpected token')"
+        assert watchdog.exceeded == 3
+
+    def test_recycle(self, tmp_path: Path) -> None:
+        files = []
+        for i in range(5):
+            (tmp_path / f"{i}.sql").write_text("SELECT 1;")
+            files.append(File(tmp_path / f"{i}.sql"))
+
+        watchdog = Watchdog([NoCreateLogin], 1000, recycle=2)  # type: ignore[list-item]
+        assert [file.status for _, file in watchdog.evaluate((None, file) for file in files)] == ["Passed ✅"] * 5
+        assert watchdog.started == 3
+
+
+class TestWatchdogCLI:
+    def test_budget_exceeded(self, paths: list[Path]) -> None:
+        result = CliRunner().invoke(
+            cli,
+            [str(paths[0].parent), "--output", "json", "--no-cache"],
+            env={"QUERYGUARD_FILE_TIMEOUT": "2", "QUERYGUARD_WORKERS": "3"},
+        )
+        assert result.exit_code == 1
+        files = {x["path"]: x for x in json.loads(result.output)}
+        assert files[str(paths[1])]["status"] == "Skipped"
+        assert files[str(paths[1])]["reason"] == "budget exceeded: took longer than 2 s"
+        assert files[str(paths[0])]["status"] == "Failed"
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+import pytest
+from typer.testing import CliRunner
+
+from queryguard.cli import cli
+from queryguard.diff import LineRanges
+from queryguard.files import File
+from queryguard.rules import NoCreateLogin
+from queryguard.workqueue import WorkQueue
+
+
+class TestWorkQueue:
+    def test_claim_once(self, tmp_path: Path) -> None:
+        files = [File(Path(f"{i}.sql")) for i in range(4)]
+        files[3].changed_lines = LineRanges([(2, 3)])
+        first, second = WorkQueue(tmp_path / "queue", "first"), WorkQueue(tmp_path / "queue", "second")
+        assert first.create(files, [10, 40, 20, 30])
+        assert not second.create(files, [10, 40, 20, 30])
+
+        claimed = []
+        for (name, file), other in zip(first.claim(), second.claim()):
+            claimed += [file.path, other[1].path]
+            first.finish(name, file)
+            second.finish(*other)
+
+        assert claimed == [Path("1.sql"), Path("3.sql"), Path("2.sql"), Path("0.sql")]
+        assert first.claimed == second.claimed == 2
+        assert [file.path for file in first.results()] == claimed
+
+    def test_changed_lines(self, tmp_path: Path) -> None:
+        file = File(Path("a.sql"), changed_lines=LineRanges([(2, 3), (7, 7)]))
+        queue = WorkQueue(tmp_path / "queue")
+        queue.create([file], [1])
+        [(_, claimed)] = queue.claim()
+        assert list(claimed.changed_lines or []) == [(2, 3), (7, 7)]
+
+    def test_evaluated_files_stored(self, tmp_path: Path) -> None:
+        file = File(Path("a.sql"))
+        file.skip("binary file")
+        queue = WorkQueue(tmp_path / "queue")
+        queue.create([file, File(Path("b.sql"))], [1, 1])
+        assert [file.path for _, file in queue.claim()] == [Path("b.sql")]
+        with pytest.raises(click.ClickException, match="1 of 2 items have no result"):
+            queue.results()
+
+    def test_existing_directory(self, tmp_path: Path) -> None:
+        (tmp_path / "queue").mkdir()
+        (tmp_path / "queue" / "other.txt").write_text("")
+        with pytest.raises(click.ClickException, match="Unable to create work queue"):
+            WorkQueue(tmp_path / "queue").create([File(Path("a.sql"))], [1])
+
+        with pytest.raises(click.ClickException, match="Invalid work queue"):
+            WorkQueue(tmp_path / "queue").results()
+
+    def test_results(self, tmp_path: Path) -> None:
+        sql = tmp_path / "login.sql"
+        sql.write_text("CREATE LOGIN a WITH PASSWORD = 'x';")
+        queue = WorkQueue(tmp_path / "queue")
+        queue.create([File(sql)], [1])
+        for name, file in queue.claim():
+            file.evaluate([NoCreateLogin])  # type: ignore[list-item]
+            queue.finish(name, file)
+
+        [file] = queue.results()
+        assert file.status == "Failed ❌"
+        assert [x.id for x in file.violations] == [NoCreateLogin.id]
+
+    def test_renewed_claim_kept(self, tmp_path: Path) -> None:
+        first, second = WorkQueue(tmp_path / "queue", "first", 0.2), WorkQueue(tmp_path / "queue", "second", 0.2)
+        first.create([File(Path("a.sql"))], [1])
+        [(name, file)] = first.claim()
+        time.sleep(0.5)
+        assert list(second.claim()) == []
+
+        first.finish(name, file)
+        first.release()
+        assert second.reclaimed == 0
+        assert [file.path for file in second.results()] == [Path("a.sql")]
+
+
+class TestWorkers:
+    def test_several_processes(self, tmp_path: Path) -> None:
+        queue = tmp_path / "queue"
+        command = [sys.executable, "-m", "queryguard", "tests/sql", "--queue", str(queue), "--no-cache"]
+        workers = [
+            subprocess.Popen([*command, "--output", "json"], stdout=subprocess.PIPE)  # noqa: S603
+            for _ in range(3)
+        ]
+        reports = [json.loads(worker.communicate()[0]) for worker in workers]
+        checked = [x["path"] for report in reports for x in report]
+        expected = sorted(str(x) for x in Path("tests/sql").glob("**/*.sql"))
+        assert sorted(checked) == expected
+
+        result = CliRunner().invoke(cli, ["finalize", str(queue), "--output", "json"], env={"COLUMNS": "1000"})
+        assert result.exit_code == 1
+        assert sorted(x["path"] for x in json.loads(result.output)) == expected
+
+    def test_killed_worker(self, tmp_path: Path) -> None:
+        queue = tmp_path / "queue"
+        WorkQueue(queue).create([File(Path(f"{i}.sql")) for i in range(3)], [1, 1, 1])
+        script = (
+            "import sys, time\n"
+            "from pathlib import Path\n"
+            "from queryguard.workqueue import WorkQueue\n"
+            "next(WorkQueue(Path(sys.argv[1]), 'killed').claim())\n"
+            "print(flush=True)\n"
+            "time.sleep(60)\n"
+        )
+        worker = subprocess.Popen([sys.executable, "-c", script, str(queue)], stdout=subprocess.PIPE)  # noqa: S603
+        assert worker.stdout and worker.stdout.readline()
+        worker.kill()
+        worker.wait()
+        assert os.listdir(queue / "claimed") == ["00000000.killed"]
+
+        other = WorkQueue(queue, "other", 0.5)
+        with pytest.raises(click.ClickException, match="3 of 3 items have no result$"):
+            other.results()
+
+        time.sleep(1)
+        with pytest.raises(click.ClickException, match="1 claims expired"):
+            other.results()
+
+        for name, file in other.claim():
+            other.finish(name, file)
+
+        assert other.claimed == 3
+        assert other.reclaimed == 1
+        assert sorted(file.path for file in other.results()) == [Path(f"{i}.sql") for i in range(3)]
+
+    def test_finalize_unfinished(self, tmp_path: Path) -> None:
+        WorkQueue(tmp_path / "queue").create([File(Path("a.sql"))], [1])
+        result = CliRunner().invoke(cli, ["finalize", str(tmp_path / "queue")])
+        assert result.exit_code == 1
+        assert "isn't finished" in result.output